@@ -0,0 +1,61 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+
+# ================================================================
+#  AJUSTE DA BUSCA APROXIMADA (pgvector) POR CONSULTA
+#
+# Os índices HNSW de chat_messages/produtos_ia (migração 0005) trocam
+# exatidão por velocidade: hnsw.ef_search é o tamanho da lista de
+# candidatos — maior = recall maior e consulta mais lenta. Precisa
+# ser >= LIMIT da consulta. ivfflat.probes vale para bancos onde o
+# índice for IVFFlat.
+#
+# set_config(..., true) = SET LOCAL: vale só até o fim da transação
+# da consulta — a conexão volta limpa para o pool.
+# ================================================================
+PERFIS_BUSCA = {
+    # RAG: memória das conversas, filtrada por vendedor
+    "rag": {
+        "ef_search": int(os.getenv("RAG_HNSW_EF_SEARCH", "80")),
+        "probes": int(os.getenv("RAG_IVFFLAT_PROBES", "10")),
+    },
+    # recomendação de produtos por similaridade
+    "produtos": {
+        "ef_search": int(os.getenv("PRODUTOS_HNSW_EF_SEARCH", "40")),
+        "probes": int(os.getenv("PRODUTOS_IVFFLAT_PROBES", "10")),
+    },
+}
+
+# pgvector >= 0.8: com filtro no WHERE (ex.: vendedor_id), continua
+# varrendo o índice até achar LIMIT linhas. Valores: relaxed_order |
+# strict_order. Vazio = não mexe (versões antigas não têm o parâmetro).
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "")
+
+_SQL_AJUSTE = (
+    "SELECT set_config('hnsw.ef_search', :ef_search, true), "
+    "set_config('ivfflat.probes', :probes, true)"
+)
+
+SQL_AJUSTE = text(_SQL_AJUSTE)
+SQL_AJUSTE_ITERATIVO = text(_SQL_AJUSTE + ", set_config('hnsw.iterative_scan', :iterativo, true)")
+
+
+def _comando(perfil: str):
+    config = PERFIS_BUSCA[perfil]
+    params = {"ef_search": str(config["ef_search"]), "probes": str(config["probes"])}
+
+    if HNSW_ITERATIVE_SCAN:
+        return SQL_AJUSTE_ITERATIVO, {**params, "iterativo": HNSW_ITERATIVE_SCAN}
+
+    return SQL_AJUSTE, params
+
+
+def ajustar_busca_vetorial(db: Session, perfil: str):
+    """Roda antes do ORDER BY embedding <#> ..., na mesma transação."""
+    db.execute(*_comando(perfil))
+
+
+async def ajustar_busca_vetorial_async(db: AsyncSession, perfil: str):
+    await db.execute(*_comando(perfil))
@@ -0,0 +1,93 @@
+from sqlalchemy import event
+import numpy as np
+from pgvector import Vector
+from pgvector.psycopg2 import register_vector as registrar_psycopg2
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+YELLOW = "\033[93m"
+RESET  = "\033[0m"
+
+def log_warn(msg):    print(f"{YELLOW}[CODEC-VETORES][WARN]{RESET} {msg}")
+
+
+# ================================================================
+#  CODEC DO TIPO vector (pgvector) NAS ENGINES DO BANCO IA
+#
+# asyncpg: formato binário — o vetor vai e volta como float4[] (4
+# bytes por dimensão), sem montar nem interpretar "[0.012345,...]".
+# psycopg2: o protocolo do driver é só texto; o adapter do pgvector
+# formata ndarray no envio e o resultado chega como Vector.
+#
+# Parâmetros: passe np.ndarray direto (vetor_float32). Resultados:
+# Vector — use matriz_float32 para juntar vários numa matriz.
+# ================================================================
+def _codificar(valor) -> bytes:
+    # o tipo Vector do SQLAlchemy (ORM) já entrega o texto "[...]"
+    if isinstance(valor, str):
+        valor = Vector.from_text(valor)
+    elif not isinstance(valor, Vector):
+        valor = Vector(np.asarray(valor, dtype=np.float32))
+    return valor.to_binary()
+
+
+async def _registrar_asyncpg(conn):
+    try:
+        await conn.set_type_codec(
+            "vector",
+            schema="public",
+            encoder=_codificar,
+            decoder=Vector.from_binary,
+            format="binary",
+        )
+    except ValueError as e:
+        # extensão ainda não criada neste banco
+        log_warn(f"Tipo vector indisponível (asyncpg): {e}")
+
+
+def registrar_codec_vetores(engine_sync, engine_async):
+    """Registra o codec em toda conexão nova das duas engines."""
+
+    @event.listens_for(engine_sync, "connect")
+    def _conectar_sync(dbapi_connection, connection_record):
+        try:
+            registrar_psycopg2(dbapi_connection)
+        except Exception as e:
+            log_warn(f"Tipo vector indisponível (psycopg2): {e}")
+        finally:
+            # a consulta ao pg_type abriu uma transação
+            dbapi_connection.rollback()
+
+    @event.listens_for(engine_async.sync_engine, "connect")
+    def _conectar_async(dbapi_connection, connection_record):
+        dbapi_connection.run_async(_registrar_asyncpg)
+
+
+# ================================================================
+#  CONVERSÕES
+# ================================================================
+def vetor_float32(embedding, normalizar: bool = False) -> np.ndarray:
+    """Parâmetro de consulta: float32 contíguo (opcionalmente unitário)."""
+    v = np.ascontiguousarray(embedding, dtype=np.float32)
+    if normalizar:
+        norma = np.linalg.norm(v)
+        if norma:
+            v = v / norma
+    return v
+
+
+def _como_array(valor) -> np.ndarray:
+    if isinstance(valor, Vector):
+        return valor.to_numpy()
+    if isinstance(valor, str):
+        return np.fromstring(valor[1:-1], sep=",", dtype=np.float32)
+    return np.asarray(valor, dtype=np.float32)
+
+
+def matriz_float32(valores) -> np.ndarray:
+    """Embeddings lidos do banco (Vector, texto ou lista) → matriz N × dim."""
+    valores = list(valores)
+    if not valores:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack([_como_array(v) for v in valores]).astype(np.float32, copy=False)
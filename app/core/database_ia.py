@@ -1,8 +1,12 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
 
+from app.core.codec_vetores import registrar_codec_vetores
+
 load_dotenv()
 
 DATABASE_URL_IA = os.getenv("DATABASE_URL_IA")
@@ -31,6 +35,26 @@ SessionIA = sessionmaker(
     expire_on_commit=False       # evita reconsultas desnecessárias
 )
 
+# ================================================================
+#  ENGINE ASSÍNCRONA (asyncpg) — caminho do /assistente/chat
+# ================================================================
+engine_ia_async = create_async_engine(
+    make_url(DATABASE_URL_IA).set(drivername="postgresql+asyncpg"),
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_IA_ASYNC_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("DB_IA_ASYNC_MAX_OVERFLOW", "20")),
+)
+
+# tipo vector: binário no asyncpg, ndarray direto nos parâmetros
+registrar_codec_vetores(engine_ia, engine_ia_async)
+
+SessionIAAsync = async_sessionmaker(
+    bind=engine_ia_async,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base para models
 BaseIA = declarative_base()
 
@@ -44,3 +68,8 @@ def get_db_ia():
         yield db
     finally:
         db.close()
+
+
+async def get_db_ia_async():
+    async with SessionIAAsync() as db:
+        yield db
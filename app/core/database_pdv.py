@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 import os
@@ -11,6 +13,14 @@ engine_pdv = create_engine(DATABASE_URL_SISTEMA)
 
 SessionPDV = sessionmaker(autocommit=False, autoflush=False, bind=engine_pdv)
 
+# Engine assíncrona (asyncpg) — usada pelo agente SQL no caminho async do chat
+engine_pdv_async = create_async_engine(
+    make_url(DATABASE_URL_SISTEMA).set(drivername="postgresql+asyncpg"),
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_PDV_ASYNC_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_PDV_ASYNC_MAX_OVERFLOW", "10")),
+)
+
 BasePDV = declarative_base()
 
 def get_db_pdv():
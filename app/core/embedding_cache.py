@@ -0,0 +1,265 @@
+import os
+import threading
+import traceback
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import xxhash
+from sqlalchemy import text
+
+from app.core.database_ia import engine_ia
+
+# =====================================================
+#  ANSI COLORS
+# =====================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):  print(f"{BLUE}[EMB-CACHE][INFO]{RESET} {msg}")
+def log_warn(msg):  print(f"{YELLOW}[EMB-CACHE][WARN]{RESET} {msg}")
+def log_error(msg): print(f"{RED}[EMB-CACHE][ERRO]{RESET} {msg}")
+
+
+# =====================================================
+#  CONFIGURAÇÃO (via .env)
+# =====================================================
+CACHE_MAX_ITENS = int(os.getenv("EMBEDDING_CACHE_MAX_ITENS", "10000"))
+CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64"))
+CACHE_PERSISTENTE = os.getenv("EMBEDDING_CACHE_PERSISTENTE", "1") == "1"
+
+
+# =====================================================
+#  CHAVE DE CONTEÚDO (modelo + texto normalizado)
+# =====================================================
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza o texto antes de gerar o embedding:
+    Unicode NFC + espaços colapsados. O mesmo texto normalizado
+    é o que vai para a API, então a chave é fiel ao conteúdo.
+    """
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+def chave_embedding(modelo: str, texto_normalizado: str) -> str:
+    return xxhash.xxh3_128_hexdigest(f"{modelo}\x1f{texto_normalizado}".encode("utf-8"))
+
+
+# =====================================================
+#  CACHE EM DOIS NÍVEIS: LRU EM MEMÓRIA + TABELA NO BANCO IA
+# =====================================================
+class CacheEmbeddings:
+
+    def __init__(self, max_itens: int, max_bytes: int, persistente: bool):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.persistente = persistente
+
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits_memoria = 0
+        self.hits_persistente = 0
+        self.misses = 0
+        self.erros_persistente = 0
+
+    # -------------------------------------------------
+    # Nível 1 — memória
+    # -------------------------------------------------
+    def _guardar_memoria(self, chave: str, vetor: np.ndarray):
+        with self._lock:
+            antigo = self._lru.pop(chave, None)
+            if antigo is not None:
+                self._bytes -= antigo.nbytes
+
+            self._lru[chave] = vetor
+            self._bytes += vetor.nbytes
+
+            while self._lru and (len(self._lru) > self.max_itens or self._bytes > self.max_bytes):
+                _, removido = self._lru.popitem(last=False)
+                self._bytes -= removido.nbytes
+
+    # -------------------------------------------------
+    # Consulta
+    # -------------------------------------------------
+    def obter(self, chave: str) -> np.ndarray | None:
+        with self._lock:
+            vetor = self._lru.get(chave)
+            if vetor is not None:
+                self._lru.move_to_end(chave)
+                self.hits_memoria += 1
+                return vetor
+
+        vetor = self._obter_persistente(chave)
+
+        with self._lock:
+            if vetor is None:
+                self.misses += 1
+                return None
+            self.hits_persistente += 1
+
+        self._guardar_memoria(chave, vetor)
+        return vetor
+
+    # -------------------------------------------------
+    # Gravação
+    # -------------------------------------------------
+    def guardar(self, chave: str, modelo: str, vetor) -> None:
+        vetor = np.asarray(vetor, dtype=np.float32)
+        self._guardar_memoria(chave, vetor)
+
+        if not self.persistente:
+            return
+
+        try:
+            with engine_ia.begin() as conn:
+                conn.execute(
+                    text("""
+                        INSERT INTO embeddings_cache (chave, modelo, dimensoes, vetor)
+                        VALUES (:chave, :modelo, :dimensoes, :vetor)
+                        ON CONFLICT (chave) DO NOTHING
+                    """),
+                    {
+                        "chave": chave,
+                        "modelo": modelo,
+                        "dimensoes": int(vetor.shape[0]),
+                        "vetor": vetor.tobytes(),
+                    }
+                )
+        except Exception:
+            self.erros_persistente += 1
+            log_error("Falha ao gravar embedding no cache persistente:")
+            print(RED + traceback.format_exc() + RESET)
+
+    # -------------------------------------------------
+    # Versões em lote (usadas pelo pipeline de sync)
+    # -------------------------------------------------
+    def obter_varios(self, chaves: list[str]) -> dict[str, np.ndarray]:
+        encontrados: dict[str, np.ndarray] = {}
+        faltantes: list[str] = []
+
+        with self._lock:
+            for chave in chaves:
+                vetor = self._lru.get(chave)
+                if vetor is not None:
+                    self._lru.move_to_end(chave)
+                    encontrados[chave] = vetor
+                else:
+                    faltantes.append(chave)
+            self.hits_memoria += len(encontrados)
+
+        do_banco = self._obter_varios_persistente(faltantes)
+        for chave, vetor in do_banco.items():
+            self._guardar_memoria(chave, vetor)
+        encontrados.update(do_banco)
+
+        with self._lock:
+            self.hits_persistente += len(do_banco)
+            self.misses += len(faltantes) - len(do_banco)
+
+        return encontrados
+
+    def guardar_varios(self, modelo: str, itens: list[tuple[str, object]]) -> None:
+        if not itens:
+            return
+
+        registros = []
+        for chave, vetor in itens:
+            vetor = np.asarray(vetor, dtype=np.float32)
+            self._guardar_memoria(chave, vetor)
+            registros.append({
+                "chave": chave,
+                "modelo": modelo,
+                "dimensoes": int(vetor.shape[0]),
+                "vetor": vetor.tobytes(),
+            })
+
+        if not self.persistente:
+            return
+
+        try:
+            with engine_ia.begin() as conn:
+                conn.execute(
+                    text("""
+                        INSERT INTO embeddings_cache (chave, modelo, dimensoes, vetor)
+                        VALUES (:chave, :modelo, :dimensoes, :vetor)
+                        ON CONFLICT (chave) DO NOTHING
+                    """),
+                    registros
+                )
+        except Exception:
+            self.erros_persistente += 1
+            log_error("Falha ao gravar lote no cache persistente:")
+            print(RED + traceback.format_exc() + RESET)
+
+    # -------------------------------------------------
+    # Nível 2 — banco IA
+    # -------------------------------------------------
+    def _obter_varios_persistente(self, chaves: list[str]) -> dict[str, np.ndarray]:
+        if not self.persistente or not chaves:
+            return {}
+
+        try:
+            with engine_ia.connect() as conn:
+                rows = conn.execute(
+                    text("SELECT chave, vetor FROM embeddings_cache WHERE chave = ANY(:chaves)"),
+                    {"chaves": chaves}
+                ).fetchall()
+        except Exception as e:
+            self.erros_persistente += 1
+            log_warn(f"Cache persistente indisponível: {e}")
+            return {}
+
+        return {
+            r.chave: np.frombuffer(bytes(r.vetor), dtype=np.float32)
+            for r in rows
+        }
+
+    def _obter_persistente(self, chave: str) -> np.ndarray | None:
+        if not self.persistente:
+            return None
+
+        try:
+            with engine_ia.connect() as conn:
+                row = conn.execute(
+                    text("SELECT vetor FROM embeddings_cache WHERE chave = :chave"),
+                    {"chave": chave}
+                ).fetchone()
+        except Exception as e:
+            self.erros_persistente += 1
+            log_warn(f"Cache persistente indisponível: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        return np.frombuffer(bytes(row.vetor), dtype=np.float32)
+
+    # -------------------------------------------------
+    # Métricas
+    # -------------------------------------------------
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_persistente + self.misses
+            hits = self.hits_memoria + self.hits_persistente
+            return {
+                "itens_memoria": len(self._lru),
+                "bytes_memoria": self._bytes,
+                "hits_memoria": self.hits_memoria,
+                "hits_persistente": self.hits_persistente,
+                "misses": self.misses,
+                "erros_persistente": self.erros_persistente,
+                "taxa_hit": round(hits / consultas, 4) if consultas else 0.0,
+            }
+
+
+# Instância única (compartilhada pelo processo)
+cache_embeddings = CacheEmbeddings(
+    max_itens=CACHE_MAX_ITENS,
+    max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+    persistente=CACHE_PERSISTENTE,
+)
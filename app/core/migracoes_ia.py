@@ -0,0 +1,343 @@
+from sqlalchemy import text
+
+from app.core.database_ia import engine_ia
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[MIGRACOES][INFO]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[MIGRACOES][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[MIGRACOES][ERRO]{RESET} {msg}")
+
+
+# Chave do advisory lock — impede que vários workers do uvicorn
+# apliquem as mesmas migrações ao mesmo tempo.
+LOCK_MIGRACOES = 7_231_001
+
+
+# ================================================================
+#  MIGRAÇÕES DO BANCO IA (em ordem — nunca reordenar/editar)
+#
+# SQL em texto → roda numa transação. Lista de comandos → roda fora
+# de transação, um por vez (necessário para CREATE INDEX CONCURRENTLY,
+# que não bloqueia escritas). Esses comandos precisam ser idempotentes:
+# se um falhar, a migração inteira roda de novo na próxima subida.
+# ================================================================
+MIGRACOES = [
+    (
+        "0001_embeddings_cache",
+        """
+        CREATE TABLE IF NOT EXISTS embeddings_cache (
+            chave      TEXT PRIMARY KEY,
+            modelo     TEXT NOT NULL,
+            dimensoes  INTEGER NOT NULL,
+            vetor      BYTEA NOT NULL,
+            criado_em  TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """,
+    ),
+    (
+        "0002_produtos_ia_fingerprint",
+        """
+        ALTER TABLE produtos_ia
+            ADD COLUMN IF NOT EXISTS fingerprint TEXT,
+            ADD COLUMN IF NOT EXISTS texto_hash  TEXT;
+        """,
+    ),
+    (
+        "0003_fila_jobs_ia",
+        """
+        CREATE TABLE IF NOT EXISTS fila_jobs_ia (
+            id                  BIGSERIAL PRIMARY KEY,
+            tipo                TEXT NOT NULL,
+            chave_idempotencia  TEXT NOT NULL UNIQUE,
+            payload             JSONB NOT NULL,
+            status              TEXT NOT NULL DEFAULT 'pendente',
+            tentativas          INTEGER NOT NULL DEFAULT 0,
+            max_tentativas      INTEGER NOT NULL DEFAULT 5,
+            ultimo_erro         TEXT,
+            disponivel_em       TIMESTAMP NOT NULL DEFAULT NOW(),
+            criado_em           TIMESTAMP NOT NULL DEFAULT NOW(),
+            iniciado_em         TIMESTAMP,
+            concluido_em        TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS ix_fila_jobs_ia_pendentes
+            ON fila_jobs_ia (disponivel_em, id)
+            WHERE status = 'pendente';
+
+        CREATE INDEX IF NOT EXISTS ix_fila_jobs_ia_abertos
+            ON fila_jobs_ia (status, criado_em)
+            WHERE status <> 'concluido';
+        """,
+    ),
+    (
+        "0004_templates_sql_ia",
+        """
+        CREATE TABLE IF NOT EXISTS templates_sql_ia (
+            id                BIGSERIAL PRIMARY KEY,
+            intent            TEXT NOT NULL,
+            sql_hash          TEXT NOT NULL UNIQUE,
+            sql_text          TEXT NOT NULL,
+            pergunta_exemplo  TEXT,
+            status            TEXT NOT NULL DEFAULT 'pendente',   -- pendente | aprovado | rejeitado
+            ocorrencias       INTEGER NOT NULL DEFAULT 1,
+            criado_em         TIMESTAMP NOT NULL DEFAULT NOW(),
+            ultimo_uso        TIMESTAMP NOT NULL DEFAULT NOW(),
+            revisado_em       TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS ix_templates_sql_ia_status
+            ON templates_sql_ia (status, intent);
+        """,
+    ),
+    (
+        # index=True nas colunas Vector criava um btree (inútil para
+        # ORDER BY embedding <#> ...). HNSW com vector_ip_ops = operador
+        # <#> usado pelo RAG e pelos recomendadores. Um índice inválido
+        # de uma tentativa anterior interrompida é recriado.
+        "0005_indices_hnsw_embeddings",
+        [
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_chat_messages_embedding",
+            "DROP INDEX CONCURRENTLY IF EXISTS ix_produtos_ia_embedding",
+            """
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = 'ix_chat_messages_embedding_hnsw' AND NOT i.indisvalid
+                ) THEN
+                    DROP INDEX ix_chat_messages_embedding_hnsw;
+                END IF;
+                IF EXISTS (
+                    SELECT 1 FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = 'ix_produtos_ia_embedding_hnsw' AND NOT i.indisvalid
+                ) THEN
+                    DROP INDEX ix_produtos_ia_embedding_hnsw;
+                END IF;
+            END $$
+            """,
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_messages_embedding_hnsw
+                ON chat_messages USING hnsw (embedding vector_ip_ops)
+                WITH (m = 16, ef_construction = 64)
+            """,
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_produtos_ia_embedding_hnsw
+                ON produtos_ia USING hnsw (embedding vector_ip_ops)
+                WITH (m = 16, ef_construction = 64)
+            """,
+            "ANALYZE chat_messages",
+            "ANALYZE produtos_ia",
+        ],
+    ),
+    (
+        # perfis de armazenamento de vetores já preenchidos e indexados
+        # por tabela (ver app/core/perfil_vetores.py)
+        "0006_perfil_vetores_ia",
+        """
+        CREATE TABLE IF NOT EXISTS perfil_vetores_ia (
+            tabela      TEXT NOT NULL,
+            assinatura  TEXT NOT NULL,        -- ex.: halfvec512, bit1536
+            pronto_em   TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (tabela, assinatura)
+        );
+        """,
+    ),
+    (
+        # registro de sessões do chat (ver kernel/sessoes.py) + histórico
+        # por sessão sem varrer as mensagens do vendedor
+        "0007_sessoes_chat",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS sessoes_chat (
+                session_id        TEXT PRIMARY KEY,
+                vendedor_id       INTEGER NOT NULL,
+                iniciada_em       TIMESTAMP NOT NULL DEFAULT NOW(),
+                ultima_atividade  TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_sessoes_chat_vendedor
+                ON sessoes_chat (vendedor_id, ultima_atividade DESC)
+            """,
+            # sessões que já existem continuam valendo (se ainda ativas)
+            """
+            INSERT INTO sessoes_chat (session_id, vendedor_id, iniciada_em, ultima_atividade)
+            SELECT session_id, MIN(vendedor_id), MIN(created_at), MAX(created_at)
+            FROM chat_messages
+            WHERE session_id IS NOT NULL AND vendedor_id IS NOT NULL
+            GROUP BY session_id
+            ON CONFLICT (session_id) DO NOTHING
+            """,
+            """
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = 'ix_chat_messages_sessao' AND NOT i.indisvalid
+                ) THEN
+                    DROP INDEX ix_chat_messages_sessao;
+                END IF;
+            END $$
+            """,
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_messages_sessao
+                ON chat_messages (session_id, created_at)
+            """,
+            "ANALYZE sessoes_chat",
+        ],
+    ),
+    (
+        # memória da sessão (ver kernel/memoria_sessao.py): resumo
+        # acumulado das mensagens antigas + lembranças por janela de tempo
+        "0008_memoria_sessao",
+        [
+            """
+            ALTER TABLE sessoes_chat
+                ADD COLUMN IF NOT EXISTS resumo         TEXT,
+                ADD COLUMN IF NOT EXISTS resumo_ate_id  INTEGER,   -- última mensagem já resumida
+                ADD COLUMN IF NOT EXISTS resumo_em      TIMESTAMP
+            """,
+            """
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = 'ix_chat_messages_vendedor_recentes' AND NOT i.indisvalid
+                ) THEN
+                    DROP INDEX ix_chat_messages_vendedor_recentes;
+                END IF;
+            END $$
+            """,
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chat_messages_vendedor_recentes
+                ON chat_messages (vendedor_id, created_at)
+            """,
+            "ANALYZE chat_messages",
+        ],
+    ),
+    (
+        # jobs de sincronização PDV → IA (ver pipeline/jobs_sync.py):
+        # qualquer worker consulta o status e reaproveita o job aberto
+        "0009_jobs_sync_ia",
+        """
+        CREATE TABLE IF NOT EXISTS jobs_sync_ia (
+            id             TEXT PRIMARY KEY,
+            status         TEXT NOT NULL DEFAULT 'pendente',   -- pendente | executando | concluido | erro
+            fase           TEXT,                               -- clientes | produtos
+            total_fase     INTEGER NOT NULL DEFAULT 0,
+            feitos_fase    INTEGER NOT NULL DEFAULT 0,
+            feitos_total   INTEGER NOT NULL DEFAULT 0,
+            resultado      JSONB,
+            erro           TEXT,
+            criado_em      TIMESTAMP NOT NULL DEFAULT NOW(),
+            inicio_fase    TIMESTAMP,
+            atualizado_em  TIMESTAMP NOT NULL DEFAULT NOW(),   -- último sinal de vida do job
+            fim            TIMESTAMP
+        );
+
+        CREATE INDEX IF NOT EXISTS ix_jobs_sync_ia_abertos
+            ON jobs_sync_ia (criado_em)
+            WHERE status IN ('pendente', 'executando');
+        """,
+    ),
+]
+
+
+# ================================================================
+#  COMANDOS FORA DE TRANSAÇÃO (CREATE INDEX CONCURRENTLY etc.)
+# ================================================================
+def executar_fora_de_transacao(conn, comandos: list[str]):
+    """
+    Roda os comandos em AUTOCOMMIT na própria conexão e a devolve no
+    isolamento padrão. O SQLAlchemy só deixa trocar o isolamento sem
+    transação aberta — mesmo em AUTOCOMMIT o execute() inicia uma, por
+    isso o commit antes de cada troca.
+    """
+    if conn.in_transaction():
+        conn.commit()
+
+    conn.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        for comando in comandos:
+            conn.execute(text(comando))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execution_options(isolation_level=conn.default_isolation_level)
+
+
+# ================================================================
+#  APLICAÇÃO DAS MIGRAÇÕES PENDENTES
+# ================================================================
+def aplicar_migracoes() -> list[str]:
+    """
+    Aplica, em ordem, as migrações ainda não registradas em
+    schema_migracoes_ia. Cada migração roda na sua própria transação
+    (ou, se for uma lista de comandos, em autocommit). Retorna os nomes
+    das migrações aplicadas nesta chamada.
+    """
+    novas = []
+
+    with engine_ia.connect() as conn:
+        # lock de sessão: sobrevive aos commits de cada migração
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": LOCK_MIGRACOES})
+        conn.commit()
+
+        try:
+            with conn.begin():
+                conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS schema_migracoes_ia (
+                        nome        TEXT PRIMARY KEY,
+                        aplicada_em TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                """))
+
+                aplicadas = {
+                    r.nome for r in conn.execute(text("SELECT nome FROM schema_migracoes_ia"))
+                }
+
+            for nome, sql in MIGRACOES:
+                if nome in aplicadas:
+                    continue
+
+                log_info(f"Aplicando migração {nome}...")
+
+                if isinstance(sql, list):
+                    # mesma conexão (é ela que segura o advisory lock)
+                    executar_fora_de_transacao(conn, sql)
+
+                    with conn.begin():
+                        conn.execute(
+                            text("INSERT INTO schema_migracoes_ia (nome) VALUES (:nome)"),
+                            {"nome": nome}
+                        )
+                else:
+                    with conn.begin():
+                        conn.execute(text(sql))
+                        conn.execute(
+                            text("INSERT INTO schema_migracoes_ia (nome) VALUES (:nome)"),
+                            {"nome": nome}
+                        )
+
+                log_success(f"Migração {nome} aplicada.")
+                novas.append(nome)
+
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_MIGRACOES})
+            conn.commit()
+
+    return novas
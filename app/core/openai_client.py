@@ -1,8 +1,17 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, RateLimitError
 import os
+import asyncio
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import numpy as np
 
+from app.core.embedding_cache import cache_embeddings, chave_embedding, normalizar_texto
+from app.core.rate_limiter import LimitadorTaxa
+from app.core.tokens import estimar_tokens, truncar_para_tokens
+
 load_dotenv()
 
 # =====================================================
@@ -15,6 +24,31 @@ if not api_key:
 
 client = OpenAI(api_key=api_key)
 
+# Cliente assíncrono — caminho async do /assistente/chat
+client_async = AsyncOpenAI(api_key=api_key)
+
+MODELO_EMBEDDING = "text-embedding-3-small"
+DIMENSOES_EMBEDDING = 1536
+
+# Limites de um request de embeddings (margem sobre os limites da API:
+# 2048 entradas, 8191 tokens por entrada, 300k tokens por request)
+LOTE_MAX_ITENS = int(os.getenv("EMBEDDING_LOTE_MAX_ITENS", "2048"))
+LOTE_MAX_TOKENS = int(os.getenv("EMBEDDING_LOTE_MAX_TOKENS", "250000"))
+LOTE_MAX_BYTES = int(os.getenv("EMBEDDING_LOTE_MAX_BYTES", "2000000"))
+MAX_TOKENS_POR_TEXTO = 8000
+
+# Concorrência + cota da conta (requests/min e tokens/min de embeddings)
+EMBEDDING_PARALELISMO = int(os.getenv("EMBEDDING_PARALELISMO", "4"))
+EMBEDDING_RPM = float(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = float(os.getenv("EMBEDDING_TPM", "1000000"))
+EMBEDDING_MAX_TENTATIVAS = int(os.getenv("EMBEDDING_MAX_TENTATIVAS", "6"))
+
+# Limitador compartilhado por todas as threads do processo
+limitador_embeddings = LimitadorTaxa(rpm=EMBEDDING_RPM, tpm=EMBEDDING_TPM)
+
+# No caminho em lote o backoff de 429 é nosso (respeitando o limitador)
+client_lote = client.with_options(max_retries=0)
+
 
 # =====================================================
 #  FUNÇÃO PARA GERAR EMBEDDINGS (normalizados)
@@ -27,12 +61,20 @@ def gerar_embedding(texto: str):
 
     if not texto or not texto.strip():
         # Retorna vetor zero quando texto é vazio para não quebrar o RAG
-        return [0.0] * 1536
+        return [0.0] * DIMENSOES_EMBEDDING
+
+    texto_norm = normalizar_texto(texto)
+    chave = chave_embedding(MODELO_EMBEDDING, texto_norm)
+
+    # Cache (memória → banco IA) antes de ir à API
+    vetor_cache = cache_embeddings.obter(chave)
+    if vetor_cache is not None:
+        return vetor_cache.tolist()
 
     try:
         resposta = client.embeddings.create(
-            model="text-embedding-3-small",
-            input=texto.strip()
+            model=MODELO_EMBEDDING,
+            input=texto_norm
         )
 
         vetor = np.array(resposta.data[0].embedding, dtype=float)
@@ -41,12 +83,199 @@ def gerar_embedding(texto: str):
         # Normaliza (evita divisão por zero)
         vetor_norm = vetor / norma if norma != 0 else vetor
 
+        # Só entra no cache o que veio da API (nunca o vetor zero de erro)
+        cache_embeddings.guardar(chave, MODELO_EMBEDDING, vetor_norm)
+
         return vetor_norm.tolist()
 
     except Exception as e:
         print("❌ Erro ao gerar embedding:", e)
         # Evitar quebra total caso a API falhe
-        return [0.0] * 1536
+        return [0.0] * DIMENSOES_EMBEDDING
+
+
+# =====================================================
+#  VERSÃO ASSÍNCRONA (AsyncOpenAI)
+# =====================================================
+async def gerar_embedding_async(texto: str):
+    """
+    Igual a gerar_embedding, sem bloquear o event loop: a chamada à API
+    usa AsyncOpenAI e o cache (que pode ir ao banco) roda numa thread.
+    """
+
+    if not texto or not texto.strip():
+        return [0.0] * DIMENSOES_EMBEDDING
+
+    texto_norm = normalizar_texto(texto)
+    chave = chave_embedding(MODELO_EMBEDDING, texto_norm)
+
+    vetor_cache = await asyncio.to_thread(cache_embeddings.obter, chave)
+    if vetor_cache is not None:
+        return vetor_cache.tolist()
+
+    try:
+        resposta = await client_async.embeddings.create(
+            model=MODELO_EMBEDDING,
+            input=texto_norm
+        )
+
+        vetor = np.array(resposta.data[0].embedding, dtype=float)
+        norma = np.linalg.norm(vetor)
+        vetor_norm = vetor / norma if norma != 0 else vetor
+
+        await asyncio.to_thread(cache_embeddings.guardar, chave, MODELO_EMBEDDING, vetor_norm)
+
+        return vetor_norm.tolist()
+
+    except Exception as e:
+        print("❌ Erro ao gerar embedding:", e)
+        return [0.0] * DIMENSOES_EMBEDDING
+
+
+# =====================================================
+#  EMBEDDINGS EM LOTE (pipeline de sincronização)
+# =====================================================
+def montar_lotes(textos: list[str], max_itens: int = LOTE_MAX_ITENS) -> list[list[int]]:
+    """
+    Agrupa os índices de `textos` em lotes que respeitam o número
+    máximo de entradas, o orçamento de tokens e o tamanho do request.
+    """
+    lotes: list[list[int]] = []
+    atual: list[int] = []
+    tokens_atual = 0
+    bytes_atual = 0
+
+    for i, texto in enumerate(textos):
+        tokens = estimar_tokens(texto)
+        tamanho = len(texto.encode("utf-8"))
+
+        if atual and (
+            len(atual) >= max_itens
+            or tokens_atual + tokens > LOTE_MAX_TOKENS
+            or bytes_atual + tamanho > LOTE_MAX_BYTES
+        ):
+            lotes.append(atual)
+            atual, tokens_atual, bytes_atual = [], 0, 0
+
+        atual.append(i)
+        tokens_atual += tokens
+        bytes_atual += tamanho
+
+    if atual:
+        lotes.append(atual)
+
+    return lotes
+
+
+def _normalizar_matriz(vetores) -> np.ndarray:
+    matriz = np.array(vetores, dtype=float)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def _retry_after(erro: RateLimitError) -> float | None:
+    try:
+        return float(erro.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _requisitar_lote(entradas: list[str]):
+    """
+    Um request de embeddings respeitando o limitador RPM/TPM, com
+    backoff exponencial (com jitter) em 429.
+    """
+    tokens = sum(estimar_tokens(t) for t in entradas)
+
+    for tentativa in range(1, EMBEDDING_MAX_TENTATIVAS + 1):
+        limitador_embeddings.adquirir(tokens)
+
+        try:
+            return client_lote.embeddings.create(
+                model=MODELO_EMBEDDING,
+                input=entradas
+            )
+
+        except RateLimitError as e:
+            if tentativa == EMBEDDING_MAX_TENTATIVAS:
+                raise
+
+            espera = _retry_after(e) or min(60.0, 2 ** tentativa) * (0.5 + random.random() / 2)
+            print(f"⚠️ 429 em embeddings (tentativa {tentativa}) — aguardando {espera:.1f}s")
+            time.sleep(espera)
+
+
+def gerar_embeddings_lote(textos: list[str], paralelismo: int | None = None) -> list[list[float]]:
+    """
+    Versão em lote de gerar_embedding: mesma ordem de entrada, mesmos
+    vetores normalizados e o mesmo cache. Textos repetidos são enviados
+    uma única vez. Diferente de gerar_embedding, erros da API são
+    propagados — quem sincroniza precisa saber que o lote falhou.
+
+    Até `paralelismo` requests ficam em voo ao mesmo tempo
+    (padrão EMBEDDING_PARALELISMO), limitados por RPM/TPM.
+    """
+    paralelismo = paralelismo or EMBEDDING_PARALELISMO
+    resultado: list[list[float] | None] = [None] * len(textos)
+
+    # 1) Normalização + chaves (texto vazio → vetor zero, como no unitário)
+    chaves: dict[str, str] = {}
+    posicoes: dict[str, list[int]] = {}
+
+    for i, texto in enumerate(textos):
+        if not texto or not texto.strip():
+            resultado[i] = [0.0] * DIMENSOES_EMBEDDING
+            continue
+
+        texto_norm = truncar_para_tokens(normalizar_texto(texto), MAX_TOKENS_POR_TEXTO)
+        chave = chave_embedding(MODELO_EMBEDDING, texto_norm)
+        chaves[chave] = texto_norm
+        posicoes.setdefault(chave, []).append(i)
+
+    # 2) Cache
+    em_cache = cache_embeddings.obter_varios(list(chaves))
+    for chave, vetor in em_cache.items():
+        lista = vetor.tolist()
+        for i in posicoes[chave]:
+            resultado[i] = lista
+
+    # 3) API — apenas o que faltou, em lotes
+    faltantes = [c for c in chaves if c not in em_cache]
+    textos_faltantes = [chaves[c] for c in faltantes]
+
+    if not faltantes:
+        return resultado
+
+    # lotes menores quando há poucos textos, para ocupar os workers
+    max_itens = min(LOTE_MAX_ITENS, math.ceil(len(faltantes) / paralelismo))
+    lotes = montar_lotes(textos_faltantes, max_itens=max_itens)
+
+    with ThreadPoolExecutor(max_workers=min(paralelismo, len(lotes))) as pool:
+        futuros = [
+            pool.submit(_requisitar_lote, [textos_faltantes[j] for j in lote])
+            for lote in lotes
+        ]
+
+        # resultados consumidos na ordem dos lotes (não na de chegada)
+        for lote, futuro in zip(lotes, futuros):
+            resposta = futuro.result()
+
+            # a API devolve `index` relativo ao input — não confiar na ordem
+            dados = sorted(resposta.data, key=lambda d: d.index)
+            matriz = _normalizar_matriz([d.embedding for d in dados])
+
+            novos = []
+            for j, vetor in zip(lote, matriz):
+                chave = faltantes[j]
+                lista = vetor.tolist()
+                for i in posicoes[chave]:
+                    resultado[i] = lista
+                novos.append((chave, vetor))
+
+            cache_embeddings.guardar_varios(MODELO_EMBEDDING, novos)
+
+    return resultado
 
 
 # =====================================================
@@ -58,3 +287,7 @@ def get_client():
     Útil para abstrair implementações futuras.
     """
     return client
+
+
+def get_client_async():
+    return client_async
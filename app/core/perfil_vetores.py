@@ -0,0 +1,328 @@
+import functools
+import os
+import threading
+import time
+import traceback
+
+from sqlalchemy import text
+
+from app.core.database_ia import engine_ia
+from app.core.migracoes_ia import executar_fora_de_transacao
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[PERFIL-VETORES][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[PERFIL-VETORES][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[PERFIL-VETORES][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[PERFIL-VETORES][ERRO]{RESET} {msg}")
+
+
+# ================================================================
+#  PERFIL DE ARMAZENAMENTO DOS EMBEDDINGS (via .env)
+#
+# `embedding vector(1536)` continua sendo a fonte (e a reordenação
+# exata). O perfil acrescenta colunas derivadas dele, no próprio
+# Postgres, usadas na primeira passada da busca:
+#
+#   VETOR_DIMENSOES=512  → os primeiros 512 valores renormalizados.
+#       É o mesmo que o parâmetro `dimensions` do text-embedding-3
+#       faz na API — derivando daqui não precisa re-embeddar nada e
+#       trocar de perfil não perde o vetor completo.
+#   VETOR_TIPO=halfvec   → meia precisão (2 bytes por dimensão)
+#   VETOR_BINARIO=1      → no lugar da coluna compacta, 1 bit por
+#       dimensão (binary_quantize) e distância de Hamming
+#
+# A primeira passada traz VETOR_FATOR_CANDIDATOS × k candidatos, que
+# são reordenados pelo vetor completo.
+#
+# Padrão (1536, vector, sem binário) = comportamento original.
+# Requer pgvector >= 0.7 (halfvec, subvector, l2_normalize, bit).
+# ================================================================
+DIMENSOES_COMPLETAS = 1536
+
+VETOR_DIMENSOES = int(os.getenv("VETOR_DIMENSOES", str(DIMENSOES_COMPLETAS)))
+VETOR_TIPO = os.getenv("VETOR_TIPO", "vector")
+VETOR_BINARIO = os.getenv("VETOR_BINARIO", "0") == "1"
+
+# candidatos da primeira passada = k × fator (hnsw.ef_search >= isso)
+VETOR_FATOR_CANDIDATOS = int(os.getenv("VETOR_FATOR_CANDIDATOS", "8"))
+
+# linhas por UPDATE no preenchimento das colunas novas
+VETOR_BACKFILL_LOTE = int(os.getenv("VETOR_BACKFILL_LOTE", "2000"))
+
+if VETOR_TIPO not in ("vector", "halfvec"):
+    raise ValueError(f"❌ VETOR_TIPO inválido: {VETOR_TIPO} (use vector ou halfvec)")
+if not 0 < VETOR_DIMENSOES <= DIMENSOES_COMPLETAS:
+    raise ValueError(f"❌ VETOR_DIMENSOES inválido: {VETOR_DIMENSOES}")
+
+TABELAS_VETORIAIS = ("chat_messages", "produtos_ia")
+
+# Advisory lock no banco IA: um worker prepara o perfil por vez
+LOCK_PERFIL_VETORES = 7_231_004
+
+# tabelas prontas são relidas a cada N segundos até todas ficarem
+RECARGA_PRONTAS_SEGUNDOS = 30
+
+
+# ================================================================
+#  COLUNAS E EXPRESSÕES DO PERFIL
+# ================================================================
+def perfil_padrao() -> bool:
+    return VETOR_DIMENSOES == DIMENSOES_COMPLETAS and VETOR_TIPO == "vector" and not VETOR_BINARIO
+
+
+def assinatura() -> str:
+    return f"bit{VETOR_DIMENSOES}" if VETOR_BINARIO else f"{VETOR_TIPO}{VETOR_DIMENSOES}"
+
+
+def coluna_compacta() -> str | None:
+    if VETOR_BINARIO or (VETOR_DIMENSOES == DIMENSOES_COMPLETAS and VETOR_TIPO == "vector"):
+        return None
+    return f"embedding_{'h' if VETOR_TIPO == 'halfvec' else 'v'}{VETOR_DIMENSOES}"
+
+
+def coluna_binaria() -> str | None:
+    return f"embedding_bq{VETOR_DIMENSOES}" if VETOR_BINARIO else None
+
+
+def _reduzida(fonte: str) -> str:
+    if VETOR_DIMENSOES == DIMENSOES_COMPLETAS:
+        return fonte
+    return f"l2_normalize(subvector({fonte}, 1, {VETOR_DIMENSOES}))"
+
+
+def expr_compacta(fonte: str) -> str:
+    return f"({_reduzida(fonte)})::{VETOR_TIPO}({VETOR_DIMENSOES})"
+
+
+def expr_binaria(fonte: str) -> str:
+    return f"binary_quantize({_reduzida(fonte)})::bit({VETOR_DIMENSOES})"
+
+
+def colunas_derivadas() -> list[tuple[str, str, str, str]]:
+    """[(coluna, tipo, expressão sobre `embedding`, opclass do HNSW)]"""
+    colunas = []
+    if col := coluna_compacta():
+        colunas.append((col, f"{VETOR_TIPO}({VETOR_DIMENSOES})", expr_compacta("{}"), f"{VETOR_TIPO}_ip_ops"))
+    if col := coluna_binaria():
+        colunas.append((col, f"bit({VETOR_DIMENSOES})", expr_binaria("{}"), "bit_hamming_ops"))
+    return colunas
+
+
+# ================================================================
+# 🏗️ PREPARAÇÃO (colunas + trigger + backfill + índices)
+# ================================================================
+def _preparar_tabela(conn, tabela: str):
+    derivadas = colunas_derivadas()
+
+    # 1) colunas + trigger (linhas novas já chegam preenchidas)
+    with conn.begin():
+        for col, tipo, _, _ in derivadas:
+            conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS {col} {tipo}"))
+
+        atribuicoes = "".join(
+            f"NEW.{col} := {expr.format('NEW.embedding')}; " for col, _, expr, _ in derivadas
+        )
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION preencher_vetores_{tabela}() RETURNS trigger AS $$
+            BEGIN
+                {atribuicoes}RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS tg_vetores_{tabela} ON {tabela}"))
+        conn.execute(text(f"""
+            CREATE TRIGGER tg_vetores_{tabela}
+            BEFORE INSERT OR UPDATE OF embedding ON {tabela}
+            FOR EACH ROW EXECUTE FUNCTION preencher_vetores_{tabela}()
+        """))
+
+    # 2) backfill por faixas de id (uma transação curta por lote)
+    faltando = " OR ".join(f"{col} IS NULL" for col, _, _, _ in derivadas)
+    sets = ", ".join(f"{col} = {expr.format('embedding')}" for col, _, expr, _ in derivadas)
+    ultimo, total = 0, 0
+
+    while True:
+        with conn.begin():
+            fim = conn.execute(text(f"""
+                SELECT MAX(id) FROM (
+                    SELECT id FROM {tabela} WHERE id > :ultimo ORDER BY id LIMIT :lote
+                ) AS faixa
+            """), {"ultimo": ultimo, "lote": VETOR_BACKFILL_LOTE}).scalar()
+
+            if fim is None:
+                break
+
+            total += conn.execute(text(f"""
+                UPDATE {tabela} SET {sets}
+                WHERE id > :ultimo AND id <= :fim
+                  AND embedding IS NOT NULL AND ({faltando})
+            """), {"ultimo": ultimo, "fim": fim}).rowcount
+
+        ultimo = fim
+
+    log_info(f"{tabela}: {total} linhas preenchidas para o perfil {assinatura()}.")
+
+    # 3) índices HNSW das colunas novas, sem bloquear escritas
+    executar_fora_de_transacao(conn, [
+        *(
+            f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{tabela}_{col}_hnsw
+            ON {tabela} USING hnsw ({col} {opclass})
+            """
+            for col, _, _, opclass in derivadas
+        ),
+        f"ANALYZE {tabela}",
+    ])
+
+    with conn.begin():
+        conn.execute(text("""
+            INSERT INTO perfil_vetores_ia (tabela, assinatura) VALUES (:tabela, :assinatura)
+            ON CONFLICT DO NOTHING
+        """), {"tabela": tabela, "assinatura": assinatura()})
+
+
+def preparar_perfil_vetores():
+    """
+    Deixa as tabelas vetoriais no perfil configurado. Idempotente: o
+    que já existe é mantido e o backfill só toca linhas sem valor.
+    Colunas de perfis anteriores ficam (podem ser removidas à mão).
+    """
+    if perfil_padrao():
+        return
+
+    with engine_ia.connect() as conn:
+        obtido = conn.execute(
+            text("SELECT pg_try_advisory_lock(:k)"), {"k": LOCK_PERFIL_VETORES}
+        ).scalar()
+        conn.commit()
+
+        if not obtido:
+            log_info("Perfil de vetores sendo preparado por outro processo.")
+            return
+
+        try:
+            for tabela in TABELAS_VETORIAIS:
+                log_info(f"Preparando {tabela} para o perfil {assinatura()}...")
+                _preparar_tabela(conn, tabela)
+                log_success(f"{tabela} pronta no perfil {assinatura()}.")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_PERFIL_VETORES})
+            conn.commit()
+
+    recarregar_prontas()
+
+
+def preparar_perfil_em_background():
+    if perfil_padrao():
+        return
+
+    def rodar():
+        try:
+            preparar_perfil_vetores()
+        except Exception:
+            log_error("Falha ao preparar o perfil de vetores — buscas seguem no vetor completo:")
+            print(RED + traceback.format_exc() + RESET)
+
+    threading.Thread(target=rodar, daemon=True, name="perfil-vetores").start()
+
+
+# ================================================================
+# 🚦 TABELAS PRONTAS (backfill + índices concluídos)
+#
+# Enquanto uma tabela não está pronta, as buscas nela usam o vetor
+# completo — uma coluna derivada pela metade perderia vizinhos.
+# ================================================================
+_prontas: set[str] = set()
+_ultima_recarga = 0.0
+_recarregando = False
+
+
+def recarregar_prontas():
+    global _prontas, _recarregando
+
+    try:
+        with engine_ia.connect() as conn:
+            _prontas = {
+                r.tabela for r in conn.execute(
+                    text("SELECT tabela FROM perfil_vetores_ia WHERE assinatura = :a"),
+                    {"a": assinatura()}
+                )
+            }
+    except Exception as e:
+        log_warn(f"Não foi possível ler perfil_vetores_ia: {e}")
+    finally:
+        _recarregando = False
+
+
+def perfil_ativo(tabela: str) -> bool:
+    global _ultima_recarga, _recarregando
+
+    if perfil_padrao():
+        return False
+
+    if (
+        tabela not in _prontas
+        and not _recarregando
+        and time.monotonic() - _ultima_recarga >= RECARGA_PRONTAS_SEGUNDOS
+    ):
+        _ultima_recarga = time.monotonic()
+        _recarregando = True
+        threading.Thread(target=recarregar_prontas, daemon=True, name="perfil-vetores-prontas").start()
+
+    return tabela in _prontas
+
+
+# ================================================================
+# 🔎 CONSULTA DE VIZINHOS (k mais próximos por <#>)
+# ================================================================
+@functools.lru_cache(maxsize=None)
+def _sql_vizinhos(tabela: str, colunas: str, filtro: str, score: str, extras: str, perfil: bool):
+    emb = "CAST(:emb AS vector)"
+    where = f"WHERE {filtro}" if filtro else ""
+    final = f"{colunas}, (1 - (embedding <#> {emb})) AS {score}{extras}"
+
+    if not perfil:
+        return text(f"""
+            SELECT {final}
+            FROM {tabela}
+            {where}
+            ORDER BY embedding <#> {emb}
+            LIMIT :k
+        """)
+
+    if VETOR_BINARIO:
+        primeira = f"{coluna_binaria()} <~> {expr_binaria(emb)}"
+    else:
+        primeira = f"{coluna_compacta()} <#> {expr_compacta(emb)}"
+
+    return text(f"""
+        WITH candidatos AS (
+            SELECT {colunas}, embedding
+            FROM {tabela}
+            {where}
+            ORDER BY {primeira}
+            LIMIT :k * {VETOR_FATOR_CANDIDATOS}
+        )
+        SELECT {final}
+        FROM candidatos
+        ORDER BY embedding <#> {emb}
+        LIMIT :k
+    """)
+
+
+def sql_vizinhos(tabela: str, colunas: str, filtro: str = "", score: str = "score", extras: str = ""):
+    """
+    SELECT `colunas` + score (1 - <#>) dos :k vizinhos de :emb. Com o
+    perfil ativo na tabela: primeira passada na coluna compacta/binária
+    e reordenação exata pelo vetor completo. `extras` (ex.: ", 'x' AS
+    motivo") vão só no SELECT final.
+    """
+    return _sql_vizinhos(tabela, colunas, filtro, score, extras, perfil_ativo(tabela))
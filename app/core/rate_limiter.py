@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+# =====================================================
+#  TOKEN BUCKET (thread-safe)
+# =====================================================
+class TokenBucket:
+    """
+    Balde com `capacidade` fichas que reabastece `por_minuto` fichas
+    por minuto. adquirir() bloqueia até haver fichas suficientes.
+    """
+
+    def __init__(self, por_minuto: float, capacidade: float | None = None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade or por_minuto
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def adquirir(self, quantidade: float = 1.0):
+        # um pedido maior que o balde nunca caberia — limita à capacidade
+        quantidade = min(quantidade, self.capacidade)
+
+        while True:
+            with self._lock:
+                self._reabastecer()
+                if self._fichas >= quantidade:
+                    self._fichas -= quantidade
+                    return
+                espera = (quantidade - self._fichas) / self.taxa
+
+            time.sleep(espera)
+
+
+# =====================================================
+#  LIMITADOR RPM + TPM (compartilhado entre threads)
+# =====================================================
+class LimitadorTaxa:
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def adquirir(self, tokens: int):
+        self.requests.adquirir(1)
+        self.tokens.adquirir(tokens)
@@ -0,0 +1,76 @@
+"""
+Aplica as migrações do banco IA duas vezes seguidas e confere o
+resultado. Use um banco de TESTE (Postgres + pgvector):
+
+    DATABASE_URL_IA=postgresql://.../ia_scratch python -m app.core.test_migracoes
+
+- 1ª chamada: todas as migrações pendentes aplicadas e registradas
+- 2ª chamada: nada a aplicar (as de lista, com CREATE INDEX
+  CONCURRENTLY, também ficaram registradas)
+- Índices criados fora de transação estão válidos
+"""
+
+import sys
+
+from sqlalchemy import text
+
+from app.core.database_ia import BaseIA, engine_ia
+from app.core.migracoes_ia import MIGRACOES, aplicar_migracoes
+import app.modules.assistente.models.model  # noqa: F401 — registra as tabelas em BaseIA.metadata
+
+INDICES = [
+    "ix_chat_messages_embedding_hnsw",
+    "ix_produtos_ia_embedding_hnsw",
+    "ix_chat_messages_sessao",
+    "ix_chat_messages_vendedor_recentes",
+]
+
+
+def main():
+    print("\n🔍 Testando migrações do banco IA...\n")
+
+    # banco vazio: as tabelas base vêm dos models (como no dump de produção)
+    with engine_ia.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    BaseIA.metadata.create_all(engine_ia)
+
+    primeira = aplicar_migracoes()
+    segunda = aplicar_migracoes()
+
+    with engine_ia.connect() as conn:
+        registradas = {r.nome for r in conn.execute(text("SELECT nome FROM schema_migracoes_ia"))}
+        validos = [
+            r.relname for r in conn.execute(text("""
+                SELECT c.relname FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = ANY(:nomes) AND i.indisvalid
+            """), {"nomes": INDICES})
+        ]
+        faltando_indices = sorted(set(INDICES) - set(validos))
+
+    faltando = [nome for nome, _ in MIGRACOES if nome not in registradas]
+
+    print("====================================")
+    print(f"📌 1ª chamada aplicou: {primeira or '(nada — banco já migrado)'}")
+    print(f"📌 2ª chamada aplicou: {segunda or '(nada)'}")
+
+    erros = []
+    if faltando:
+        erros.append(f"migrações não registradas: {faltando}")
+    if segunda:
+        erros.append(f"a 2ª chamada reaplicou: {segunda}")
+    if faltando_indices:
+        erros.append(f"índices ausentes ou inválidos: {faltando_indices}")
+
+    if erros:
+        for e in erros:
+            print(f"❌ {e}")
+        print("====================================")
+        sys.exit(1)
+
+    print(f"🟢 OK — {len(registradas)} migrações registradas, índices válidos.")
+    print("====================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import re
+
+# =====================================================
+#  TOKENIZADOR APROXIMADO (local, sem dependências)
+# =====================================================
+# Aproximação do BPE da OpenAI: cada palavra/pontuação conta
+# 1 token a cada 4 caracteres (arredondando para cima). Para
+# português isso fica um pouco ACIMA da contagem real, o que é
+# o lado seguro para respeitar limites de API e orçamentos.
+_PEDACOS = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimar_tokens(texto: str) -> int:
+    if not texto:
+        return 0
+
+    return sum(
+        1 + (len(p) - 1) // 4
+        for p in _PEDACOS.findall(texto)
+    )
+
+
+def truncar_para_tokens(texto: str, max_tokens: int) -> str:
+    """
+    Corta o texto (proporcionalmente) até caber em max_tokens.
+    """
+    tokens = estimar_tokens(texto)
+
+    while tokens > max_tokens:
+        texto = texto[: int(len(texto) * max_tokens / tokens * 0.95)]
+        tokens = estimar_tokens(texto)
+
+    return texto
@@ -4,6 +4,12 @@ from sqlalchemy import text
 # Engines dos dois bancos
 from app.core.database_pdv import engine_pdv
 from app.core.database_ia import engine_ia
+from app.core.migracoes_ia import aplicar_migracoes
+from app.core.perfil_vetores import preparar_perfil_em_background
+from app.modules.assistente.pipeline.fila_jobs import iniciar_workers, parar_workers
+from app.modules.assistente.kernel.roteador_intencao import aquecer_centroides
+from app.modules.assistente.kernel.agent_sql import preparar_agentes_sql
+from app.modules.assistente.kernel.indice_produtos import preparar_indice_produtos
 
 # CORS
 from fastapi.middleware.cors import CORSMiddleware
@@ -30,6 +36,39 @@ app.add_middleware(
     allow_headers=["*"],        # Authorization, Content-Type, etc.
 )
 
+# ======================================================
+# STARTUP – MIGRAÇÕES DO BANCO IA + WORKERS DA FILA + AGENTE SQL + ÍNDICE DE PRODUTOS
+# ======================================================
+@app.on_event("startup")
+def preparar_banco_ia():
+    try:
+        aplicar_migracoes()
+    except Exception as e:
+        print("❌ [STARTUP] Falha ao aplicar migrações do banco IA:", e)
+
+    # perfil de armazenamento dos vetores (colunas derivadas + backfill)
+    preparar_perfil_em_background()
+
+    # pós-resposta do chat (gravação da resposta, sugestivo)
+    iniciar_workers()
+
+    # centróides do roteador de intenção (em background)
+    aquecer_centroides()
+
+    # agentes SQL do processo (catálogo do esquema PDV gerado uma vez)
+    try:
+        preparar_agentes_sql()
+    except Exception as e:
+        print("❌ [STARTUP] Falha ao preparar o agente SQL:", e)
+
+    # índice de produtos em mmap (constrói em background se não existir)
+    preparar_indice_produtos()
+
+
+@app.on_event("shutdown")
+def encerrar_workers():
+    parar_workers()
+
 # ======================================================
 # IMPORTS E INCLUSÃO DE ROUTERS (após o CORS)
 # ======================================================
@@ -1,132 +1,445 @@
 # app/modules/assistente/kernel/agent_hibrido.py
 
-from app.modules.assistente.kernel.agent_sql import criar_agente_sql
-from app.core.openai_client import client
+import asyncio
+import os
+import time
+
+from app.modules.assistente.kernel.agent_sql import obter_agente_sql, obter_agente_sql_async
+from app.modules.assistente.kernel.cache_respostas import (
+    CACHE_RESPOSTAS_ATIVO,
+    assinatura_pergunta,
+    cache_respostas,
+    calcular_impressao,
+    conferir_sync,
+    conferir_sync_async,
+)
+from app.modules.assistente.kernel.contexto import ContextoRequisicao
+from app.modules.assistente.kernel.guardas_sql import executar_sql_protegida, executar_sql_protegida_async
+from app.modules.assistente.kernel.prompt_final import montar_mensagens
+from app.modules.assistente.kernel.roteador_intencao import classificar_intencao
+from app.core.openai_client import client, client_async
+
+# Timeouts (segundos) das etapas paralelas do caminho async
+TIMEOUT_RAG = float(os.getenv("HIBRIDO_TIMEOUT_RAG", "5"))
+TIMEOUT_SQL = float(os.getenv("HIBRIDO_TIMEOUT_SQL", "20"))
+
+
+# ================================================================
+# 🧩 PARTES COMPARTILHADAS (versões sync e async)
+# ================================================================
+def intent_e_cliente(sql_result: dict):
+    """(intent, cliente_nome) resolvidos pelo agente SQL, se ele teve sucesso."""
+    if not sql_result.get("success"):
+        print(f"\033[93m🟠 [HÍBRIDO][SQL] SQL retornou erro. Continuando...\033[0m")
+        return None, None
+
+    return sql_result.get("intent"), sql_result.get("cliente_nome")
+
+
+def base_do_cache(sql_result: dict) -> dict | None:
+    """SQL executada + parâmetros + impressão das linhas (só respostas com dados do PDV)."""
+    rows = sql_result.get("rows")
+    sql = sql_result.get("sql_executada")
+    if not (sql_result.get("success") and sql and isinstance(rows, list)):
+        return None
+
+    params = sql_result.get("params") or {}
+    return {
+        "sql": sql,
+        "params": params,
+        "impressao": calcular_impressao(sql, params, sql_result.get("colunas") or [], rows),
+    }
+
+
+# ================================================================
+# 💾 CACHE DE RESPOSTAS — antes do RAG e do agente SQL
+#
+# Pergunta parecida (mesma assinatura) já respondida: roda só a SQL
+# guardada na entrada; se as linhas não mudaram, a resposta vale e
+# RAG, agente SQL e LLM são dispensados.
+# ================================================================
+def _usa_cache(contexto: ContextoRequisicao | None) -> bool:
+    return (
+        CACHE_RESPOSTAS_ATIVO and contexto is not None and contexto.embedding is not None
+        and contexto.rota is not None and "sql" in contexto.rota["etapas"]
+    )
+
+
+def _candidata(contexto: ContextoRequisicao):
+    contexto.geracao_cache = cache_respostas.geracao
+    return cache_respostas.candidata(
+        contexto.vendedor_id, contexto.embedding, assinatura_pergunta(contexto.mensagem)
+    )
+
+
+def _hit(contexto: ContextoRequisicao, resposta: str | None) -> str | None:
+    if resposta is not None:
+        print("\033[92m🟢 [HÍBRIDO][CACHE-HIT] Resposta servida do cache (agente SQL e LLM dispensados).\033[0m")
+    return resposta
+
+
+def resposta_do_cache(contexto: ContextoRequisicao | None) -> str | None:
+    if not _usa_cache(contexto):
+        return None
+
+    inicio = time.perf_counter()
+    resposta = None
+    try:
+        conferir_sync()
+        entrada = _candidata(contexto)
+        if entrada is not None:
+            rows, execucao = executar_sql_protegida(entrada.sql, entrada.params, verificar_plano=False)
+            resposta = cache_respostas.confirmar(
+                contexto.vendedor_id, entrada,
+                calcular_impressao(entrada.sql, entrada.params, execucao["colunas"], rows)
+            )
+    except Exception as e:
+        print(f"\033[93m🟠 [HÍBRIDO][CACHE] Cache de respostas indisponível: {e}\033[0m")
+    finally:
+        contexto.marcar("cache_ms", inicio)
+
+    return _hit(contexto, resposta)
+
+
+async def resposta_do_cache_async(contexto: ContextoRequisicao) -> str | None:
+    if not _usa_cache(contexto):
+        return None
+
+    inicio = time.perf_counter()
+    resposta = None
+    try:
+        await conferir_sync_async()
+        entrada = _candidata(contexto)
+        if entrada is not None:
+            rows, execucao = await executar_sql_protegida_async(entrada.sql, entrada.params, verificar_plano=False)
+            resposta = cache_respostas.confirmar(
+                contexto.vendedor_id, entrada,
+                calcular_impressao(entrada.sql, entrada.params, execucao["colunas"], rows)
+            )
+    except Exception as e:
+        print(f"\033[93m🟠 [HÍBRIDO-ASYNC][CACHE] Cache de respostas indisponível: {e}\033[0m")
+    finally:
+        contexto.marcar("cache_ms", inicio)
+
+    return _hit(contexto, resposta)
+
+
+def guardar_no_cache(contexto: ContextoRequisicao | None, resposta_final: str):
+    if _usa_cache(contexto) and contexto.base_cache is not None and contexto.geracao_cache is not None:
+        cache_respostas.guardar(
+            contexto.vendedor_id, contexto.embedding, resposta_final, contexto.base_cache,
+            assinatura_pergunta(contexto.mensagem), contexto.geracao_cache
+        )
+
+
+def resultado_sql_dispensado(intent: str) -> dict:
+    # intenção que não consulta o PDV (saudação, pergunta geral)
+    return {
+        "success": True,
+        "intent": intent,
+        "cliente_nome": None,
+        "rows": "(consulta ao sistema não necessária para esta pergunta)",
+    }
 
 
 # ================================================================
 # 🔵 AGENTE HÍBRIDO — RAG + SQL + LLM (com logs ANSI)
 # ================================================================
-def agente_hibrido(db_ia, vendedor_id: int, pergunta: str, recuperar_contexto_rag):
+def agente_hibrido(db_ia, vendedor_id: int, pergunta: str, recuperar_contexto_rag, contexto=None):
 
     print("\n\033[94m==============================================================")
     print("🔵 [HÍBRIDO][INIT] Iniciando agente híbrido")
     print(f"🔵 [HÍBRIDO][INPUT] Pergunta: {pergunta}")
     print("==============================================================\033[0m")
 
+    # ============================================================
+    # 0) Roteador de intenção (local) — decide as etapas
+    # ============================================================
+    rota = classificar_intencao(pergunta, contexto.embedding if contexto is not None else None)
+    if contexto is not None:
+        contexto.rota = rota
+
+    print(f"\033[94m🔵 [HÍBRIDO][ROTA] {rota['intent']} via {rota['fonte']} → etapas {sorted(rota['etapas'])}\033[0m")
+
+    # pergunta parecida já respondida com os mesmos dados do PDV
+    resposta_final = resposta_do_cache(contexto)
+    if resposta_final is not None:
+        return resposta_final
+
     # ============================================================
     # 1) RAG
     # ============================================================
-    print("\n\033[95m🟣 [HÍBRIDO][RAG] Executando RAG...\033[0m")
+    if "rag" not in rota["etapas"]:
+        contexto_rag = "(não necessário)"
 
-    try:
-        contexto_rag = recuperar_contexto_rag(db_ia, vendedor_id, pergunta)
-        print(f"\033[95m🟣 [HÍBRIDO][RAG-OK] Contexto retornado:\033[0m\n{contexto_rag}")
+    else:
+        print("\n\033[95m🟣 [HÍBRIDO][RAG] Executando RAG...\033[0m")
 
-    except Exception as e:
-        print(f"\033[91m❌ [HÍBRIDO][RAG-ERRO] Falha ao gerar contexto RAG: {e}\033[0m")
-        contexto_rag = "(erro ao gerar contexto RAG)"
+        try:
+            contexto_rag = recuperar_contexto_rag(db_ia, vendedor_id, pergunta, contexto=contexto)
+            print(f"\033[95m🟣 [HÍBRIDO][RAG-OK] Contexto retornado:\033[0m\n{contexto_rag}")
+
+        except Exception as e:
+            print(f"\033[91m❌ [HÍBRIDO][RAG-ERRO] Falha ao gerar contexto RAG: {e}\033[0m")
+            contexto_rag = "(erro ao gerar contexto RAG)"
 
     # ============================================================
     # 2) SQL Agent
     # ============================================================
-    print("\n\033[93m🟠 [HÍBRIDO][SQL] Chamando SQL Agent...\033[0m")
+    agente_sql = None
 
-    try:
-        agente_sql = criar_agente_sql()
-    except Exception as e:
-        print(f"\033[91m❌ [HÍBRIDO][SQL-ERRO] Falha ao inicializar SQL Agent: {e}\033[0m")
-        agente_sql = None
+    if "sql" not in rota["etapas"]:
+        sql_result = resultado_sql_dispensado(rota["intent"])
 
-    sql_result = {"success": False, "error": "Agente SQL indisponível"}
+    else:
+        print("\n\033[93m🟠 [HÍBRIDO][SQL] Chamando SQL Agent...\033[0m")
+
+        try:
+            agente_sql = obter_agente_sql()
+        except Exception as e:
+            print(f"\033[91m❌ [HÍBRIDO][SQL-ERRO] Falha ao inicializar SQL Agent: {e}\033[0m")
+
+        sql_result = {"success": False, "error": "Agente SQL indisponível"}
 
     if agente_sql:
         try:
-            sql_result = agente_sql(pergunta)
+            sql_result = agente_sql(pergunta, intent=rota["intent"])
             print(f"\033[93m🟠 [HÍBRIDO][SQL-OK] Resultado bruto:\033[0m {sql_result}")
         except Exception as e:
             print(f"\033[91m❌ [HÍBRIDO][SQL-EXEC-ERRO] {e}\033[0m")
             sql_result = {"success": False, "error": str(e)}
 
+    intent, cliente_nome = intent_e_cliente(sql_result)
+
+    if contexto is not None:
+        contexto.intent, contexto.cliente_nome = intent, cliente_nome
+        contexto.base_cache = base_do_cache(sql_result)
+
     # ============================================================
-    # 2.1 Normalização dos dados SQL
+    # 3) Construção do prompt final (orçamento de tokens por seção)
     # ============================================================
-    if not sql_result.get("success"):
-        print(f"\033[93m🟠 [HÍBRIDO][SQL] SQL retornou erro. Continuando...\033[0m")
+    print("\n\033[94m🟦 [HÍBRIDO][PROMPT] Construindo prompt final...\033[0m")
 
-        intent = None
-        cliente_nome = None
-        dados_sql = f"(ERRO SQL) {sql_result.get('error')}"
+    mensagens = montar_mensagens(contexto_rag, sql_result, pergunta, contexto=contexto)
 
-    else:
-        intent = sql_result.get("intent")
-        cliente_nome = sql_result.get("cliente_nome")
-        rows = sql_result.get("rows")
+    # ============================================================
+    # 4) Execução do LLM
+    # ============================================================
+    print("\n\033[92m🟢 [HÍBRIDO][LLM] Chamando modelo LLM...\033[0m")
 
-        if isinstance(rows, str):
-            dados_sql = rows
+    try:
+        resposta_llm = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=mensagens
+        )
 
-        elif isinstance(rows, list):
-            dados_sql = "\n".join(
-                " | ".join(str(col) for col in linha)
-                for linha in rows
-            )
+        resposta_final = resposta_llm.choices[0].message.content
+        print("\033[92m🟢 [HÍBRIDO][LLM-OK] Resposta gerada com sucesso.\033[0m")
+        guardar_no_cache(contexto, resposta_final)
 
-        else:
-            dados_sql = "(nenhum dado retornado)"
+    except Exception as e:
+        print(f"\033[91m❌ [HÍBRIDO][LLM-ERRO] Falha ao chamar modelo LLM: {e}\033[0m")
+        resposta_final = "Ocorreu um erro ao gerar a resposta do assistente."
 
-    print("\n\033[93m🟠 [HÍBRIDO][SQL-FORMATADO] Dados SQL normalizados:\033[0m")
-    print(dados_sql)
+    print("\n\033[92m🏁 [HÍBRIDO][FIM] Finalizado.\033[0m")
 
-    # ============================================================
-    # 3) Construção do prompt final
-    # ============================================================
-    print("\n\033[94m🟦 [HÍBRIDO][PROMPT] Construindo prompt final...\033[0m")
+    return resposta_final
 
-    prompt = f"""
-Você é um assistente especializado em vendedores de PDV.
 
-===================== CONTEXTO RAG =====================
-{contexto_rag}
+# ================================================================
+# 🔵 AGENTE HÍBRIDO ASSÍNCRONO — RAG ‖ SQL em paralelo, depois LLM
+# ================================================================
+def rotear(contexto: ContextoRequisicao) -> dict:
+    """Roteador de intenção (local, sem I/O) — decide as etapas."""
+    inicio = time.perf_counter()
+    rota = contexto.rota = classificar_intencao(contexto.mensagem, contexto.embedding)
+    contexto.marcar("roteador_ms", inicio)
 
-===================== INTENÇÃO DETECTADA ==============
-{intent}
+    print(f"\033[94m🔵 [HÍBRIDO-ASYNC][ROTA] {rota['intent']} via {rota['fonte']} → etapas {sorted(rota['etapas'])}\033[0m")
+    return rota
 
-===================== CLIENTE DETECTADO ===============
-{cliente_nome}
 
-===================== DADOS DO SISTEMA (SQL) ==========
-{dados_sql}
+async def preparar_prompt_async(db_ia, contexto: ContextoRequisicao, recuperar_contexto_rag) -> list[dict]:
+    """
+    RAG e agente SQL não dependem um do outro: rodam em paralelo, cada um
+    com seu timeout e o mesmo fallback da versão síncrona. Os tempos de
+    cada etapa (ms) são gravados em `contexto.tempos`. Retorna as
+    mensagens do LLM final (prompt_final.montar_mensagens).
+    """
+    vendedor_id, pergunta = contexto.vendedor_id, contexto.mensagem
 
-===================== PERGUNTA ORIGINAL ===============
-{pergunta}
+    print(f"\n\033[94m🔵 [HÍBRIDO-ASYNC][INIT] Pergunta: {pergunta}\033[0m")
 
-===================== REGRAS ==========================
-- Priorize sempre dados SQL.
-- Use RAG apenas como memória contextual.
-- Não invente informações.
-- Não exponha SQL, tabelas, colunas ou consultas internas.
-- Responda sempre de maneira simples, útil e objetiva.
-"""
+    # 0) Roteador (se o agente ainda não rodou para consultar o cache)
+    rota = contexto.rota or rotear(contexto)
 
-    # ============================================================
-    # 4) Execução do LLM
-    # ============================================================
-    print("\n\033[92m🟢 [HÍBRIDO][LLM] Chamando modelo LLM...\033[0m")
+    # 1) RAG
+    async def etapa_rag():
+        if "rag" not in rota["etapas"]:
+            return "(não necessário)"
 
+        inicio = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                recuperar_contexto_rag(db_ia, vendedor_id, pergunta, contexto=contexto),
+                TIMEOUT_RAG
+            )
+        except asyncio.TimeoutError:
+            print(f"\033[91m❌ [HÍBRIDO-ASYNC][RAG-TIMEOUT] RAG passou de {TIMEOUT_RAG}s\033[0m")
+            # a consulta cancelada pode deixar a transação da sessão suja
+            try:
+                await db_ia.rollback()
+            except Exception:
+                pass
+            return "(erro ao gerar contexto RAG)"
+        except Exception as e:
+            print(f"\033[91m❌ [HÍBRIDO-ASYNC][RAG-ERRO] Falha ao gerar contexto RAG: {e}\033[0m")
+            return "(erro ao gerar contexto RAG)"
+        finally:
+            contexto.marcar("rag_ms", inicio)
+
+    # 2) SQL Agent
+    async def etapa_sql():
+        if "sql" not in rota["etapas"]:
+            return resultado_sql_dispensado(rota["intent"])
+
+        inicio = time.perf_counter()
+        try:
+            agente_sql = obter_agente_sql_async()
+        except Exception as e:
+            print(f"\033[91m❌ [HÍBRIDO-ASYNC][SQL-ERRO] Falha ao inicializar SQL Agent: {e}\033[0m")
+            contexto.marcar("sql_ms", inicio)
+            return {"success": False, "error": "Agente SQL indisponível"}
+
+        try:
+            return await asyncio.wait_for(agente_sql(pergunta, intent=rota["intent"]), TIMEOUT_SQL)
+        except asyncio.TimeoutError:
+            print(f"\033[91m❌ [HÍBRIDO-ASYNC][SQL-TIMEOUT] SQL passou de {TIMEOUT_SQL}s\033[0m")
+            return {"success": False, "error": f"Tempo limite do agente SQL ({TIMEOUT_SQL}s) excedido"}
+        except Exception as e:
+            print(f"\033[91m❌ [HÍBRIDO-ASYNC][SQL-EXEC-ERRO] {e}\033[0m")
+            return {"success": False, "error": str(e)}
+        finally:
+            contexto.marcar("sql_ms", inicio)
+
+    inicio = time.perf_counter()
+    contexto_rag, sql_result = await asyncio.gather(etapa_rag(), etapa_sql())
+    contexto.marcar("paralelo_ms", inicio)
+
+    contexto.intent, contexto.cliente_nome = intent_e_cliente(sql_result)
+    contexto.base_cache = base_do_cache(sql_result)
+
+    # 3) Prompt final
+    return montar_mensagens(contexto_rag, sql_result, pergunta, contexto=contexto)
+
+
+async def agente_hibrido_async(
+    db_ia,
+    vendedor_id: int,
+    pergunta: str,
+    recuperar_contexto_rag,
+    contexto: ContextoRequisicao | None = None
+):
+    contexto = contexto or ContextoRequisicao(vendedor_id, pergunta)
+    inicio_total = time.perf_counter()
+
+    rotear(contexto)
+    resposta_final = await resposta_do_cache_async(contexto)
+    if resposta_final is not None:
+        contexto.marcar("hibrido_ms", inicio_total)
+        return resposta_final
+
+    mensagens = await preparar_prompt_async(db_ia, contexto, recuperar_contexto_rag)
+
+    # 4) LLM
+    inicio = time.perf_counter()
     try:
-        resposta_llm = client.chat.completions.create(
+        resposta_llm = await client_async.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
+            messages=mensagens
         )
 
         resposta_final = resposta_llm.choices[0].message.content
-        print("\033[92m🟢 [HÍBRIDO][LLM-OK] Resposta gerada com sucesso.\033[0m")
+        print("\033[92m🟢 [HÍBRIDO-ASYNC][LLM-OK] Resposta gerada com sucesso.\033[0m")
+        guardar_no_cache(contexto, resposta_final)
 
     except Exception as e:
-        print(f"\033[91m❌ [HÍBRIDO][LLM-ERRO] Falha ao chamar modelo LLM: {e}\033[0m")
+        print(f"\033[91m❌ [HÍBRIDO-ASYNC][LLM-ERRO] Falha ao chamar modelo LLM: {e}\033[0m")
         resposta_final = "Ocorreu um erro ao gerar a resposta do assistente."
 
-    print("\n\033[92m🏁 [HÍBRIDO][FIM] Finalizado.\033[0m")
+    contexto.marcar("llm_ms", inicio)
+    contexto.marcar("hibrido_ms", inicio_total)
+
+    print(f"\033[92m🏁 [HÍBRIDO-ASYNC][FIM] Tempos: {contexto.tempos}\033[0m")
 
     return resposta_final
+
+
+# ================================================================
+# 📡 AGENTE HÍBRIDO EM STREAMING — mesmo prompt, LLM token a token
+# ================================================================
+async def agente_hibrido_stream_async(
+    db_ia,
+    vendedor_id: int,
+    pergunta: str,
+    recuperar_contexto_rag,
+    contexto: ContextoRequisicao | None = None
+):
+    """
+    Gerador assíncrono com os pedaços de texto da resposta final, na
+    ordem em que o modelo os produz. Em caso de erro do LLM, emite a
+    mesma mensagem de fallback da versão sem streaming.
+    `contexto.tempos["ttft_ms"]` mede do início até o primeiro pedaço.
+    """
+    contexto = contexto or ContextoRequisicao(vendedor_id, pergunta)
+    inicio_total = time.perf_counter()
+
+    rotear(contexto)
+    resposta_cache = await resposta_do_cache_async(contexto)
+    if resposta_cache is not None:
+        contexto.marcar("ttft_ms", inicio_total)
+        contexto.marcar("hibrido_ms", inicio_total)
+        yield resposta_cache
+        return
+
+    mensagens = await preparar_prompt_async(db_ia, contexto, recuperar_contexto_rag)
+
+    inicio = time.perf_counter()
+    emitiu = False
+    partes: list[str] = []
+    try:
+        stream = await client_async.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=mensagens,
+            stream=True
+        )
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+
+            pedaco = chunk.choices[0].delta.content
+            if not pedaco:
+                continue
+
+            if not emitiu:
+                contexto.marcar("ttft_ms", inicio_total)
+                emitiu = True
+
+            partes.append(pedaco)
+            yield pedaco
+
+        print("\033[92m🟢 [HÍBRIDO-STREAM][LLM-OK] Stream concluído.\033[0m")
+        # só respostas completas (o cliente não desconectou no meio)
+        guardar_no_cache(contexto, "".join(partes))
+
+    except Exception as e:
+        print(f"\033[91m❌ [HÍBRIDO-STREAM][LLM-ERRO] Falha no stream do LLM: {e}\033[0m")
+        if not emitiu:
+            contexto.marcar("ttft_ms", inicio_total)
+            yield "Ocorreu um erro ao gerar a resposta do assistente."
+
+    contexto.marcar("llm_ms", inicio)
+    contexto.marcar("hibrido_ms", inicio_total)
+
+    print(f"\033[92m🏁 [HÍBRIDO-STREAM][FIM] Tempos: {contexto.tempos}\033[0m")
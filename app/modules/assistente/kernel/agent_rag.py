@@ -1,9 +1,20 @@
 # app/modules/assistente/kernel/agent_rag.py
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 import numpy as np
-from app.core.openai_client import gerar_embedding
+from app.core.codec_vetores import vetor_float32
+from app.core.busca_vetorial import ajustar_busca_vetorial, ajustar_busca_vetorial_async
+from app.core.openai_client import gerar_embedding, gerar_embedding_async
+from app.modules.assistente.kernel.memoria_sessao import (
+    SEM_CONTEXTO,
+    SQL_SESSAO,
+    job_resumo,
+    montar_memoria,
+    parametros_lembrancas,
+    parametros_sessao,
+    sql_lembrancas,
+)
 
 # ================================================================
 # ANSI COLORS
@@ -15,10 +26,34 @@ BLUE   = "\033[94m"
 PURPLE = "\033[95m"
 RESET  = "\033[0m"
 
+def _embedding_e_vetor(contexto, emb) -> np.ndarray:
+    """
+    Reaproveita o vetor normalizado (float32) guardado no contexto da
+    requisição; na primeira vez, calcula e guarda.
+    """
+    if contexto is None:
+        return vetor_float32(emb, normalizar=True)
+
+    if contexto.embedding_vetor is None:
+        contexto.embedding_vetor = vetor_float32(emb, normalizar=True)
+
+    return contexto.embedding_vetor
+
+
+def _montar_contexto(rows_sessao, rows_lembrancas, contexto) -> str:
+    """Memória da sessão + lembranças; agenda o resumo se a sessão acumulou mensagens."""
+    if contexto is not None:
+        job = job_resumo(contexto, rows_sessao)
+        if job:
+            contexto.jobs_pos_resposta.append(job)
+
+    return montar_memoria(rows_sessao, rows_lembrancas)
+
+
 # ================================================================
-# 🟪 RAG — Recuperação via pgvector (com logs coloridos)
+# 🟪 RAG — memória da sessão + recuperação via pgvector (com logs coloridos)
 # ================================================================
-def recuperar_contexto_rag(db_ia: Session, vendedor_id: int, pergunta: str, k: int = 5):
+def recuperar_contexto_rag(db_ia: Session, vendedor_id: int, pergunta: str, k: int = 5, contexto=None):
 
     print(f"\n{PURPLE}==========================================================")
     print("🟪 [RAG][INIT] Recuperação RAG iniciada")
@@ -28,60 +63,122 @@ def recuperar_contexto_rag(db_ia: Session, vendedor_id: int, pergunta: str, k: i
     # ============================================================
     # 1) Embedding
     # ============================================================
-    print(PURPLE + "🟪 [RAG][STEP1] Gerando embedding..." + RESET)
-    try:
-        emb = np.array(gerar_embedding(pergunta), dtype=float)
-        print(PURPLE + "🟪 [RAG][STEP1-OK] Embedding gerado." + RESET)
-    except Exception as e:
-        print(f"{RED}❌ [RAG][STEP1-ERRO] Falha ao gerar embedding: {e}{RESET}")
-        return "Nenhum contexto encontrado."
+    if contexto is not None and contexto.embedding is not None:
+        emb = contexto.embedding
+        print(PURPLE + "🟪 [RAG][STEP1] Embedding reaproveitado do contexto." + RESET)
+    else:
+        print(PURPLE + "🟪 [RAG][STEP1] Gerando embedding..." + RESET)
+        try:
+            emb = gerar_embedding(pergunta)
+            print(PURPLE + "🟪 [RAG][STEP1-OK] Embedding gerado." + RESET)
+        except Exception as e:
+            print(f"{RED}❌ [RAG][STEP1-ERRO] Falha ao gerar embedding: {e}{RESET}")
+            return "Nenhum contexto encontrado."
 
     # Normalização
-    norm = np.linalg.norm(emb)
-    emb_norm = emb / norm if norm else emb
-    literal = "[" + ",".join(f"{x:.6f}" for x in emb_norm) + "]"
+    vetor = _embedding_e_vetor(contexto, emb)
 
     print(PURPLE + "🟪 [RAG][STEP2] Embedding normalizado." + RESET)
 
     # ============================================================
     # 2) Consulta pgvector
     # ============================================================
-    print(PURPLE + "🟪 [RAG][STEP3] Consultando pgvector..." + RESET)
+    print(PURPLE + "🟪 [RAG][STEP3] Consultando memória da sessão e pgvector..." + RESET)
     try:
+        rows_sessao = []
+        if contexto is not None and contexto.session_id:
+            rows_sessao = db_ia.execute(SQL_SESSAO, parametros_sessao(contexto)).fetchall()
+
+        ajustar_busca_vetorial(db_ia, "rag")
         rows = db_ia.execute(
-            text("""
-                SELECT message, (1 - (embedding <#> :emb)) AS similarity
-                FROM chat_messages
-                WHERE vendedor_id = :vid
-                ORDER BY embedding <#> :emb
-                LIMIT :k;
-            """),
-            {"emb": literal, "vid": vendedor_id, "k": k}
+            sql_lembrancas(),
+            parametros_lembrancas(vendedor_id, vetor, k, contexto)
         ).fetchall()
 
         print(PURPLE + "🟪 [RAG][STEP3-OK] Consulta concluída." + RESET)
 
     except Exception as e:
         print(f"{RED}❌ [RAG][STEP3-ERRO] Erro ao consultar pgvector: {e}{RESET}")
-        return "Nenhum contexto encontrado."
-
-    if not rows:
-        print(f"{YELLOW}🟡 [RAG][INFO] Nenhum contexto encontrado.{RESET}")
+        # a consulta que falhou deixa a transação abortada: o resto da
+        # requisição (resposta, sugestivo, jobs) usa a mesma sessão
+        try:
+            db_ia.rollback()
+        except Exception:
+            pass
         return "Nenhum contexto encontrado."
 
     # ============================================================
-    # 3) Construção final do contexto
+    # 3) Construção final do contexto (orçamento da seção RAG)
     # ============================================================
     print(PURPLE + "🟪 [RAG][STEP4] Processando resultados..." + RESET)
     try:
-        contexto = "\n".join(
-            f"- ({round(r.similarity, 3)}) {r.message}"
-            for r in rows
-        )
-        print(GREEN + "🟢 [RAG][OK] Contexto gerado com sucesso." + RESET)
+        texto = _montar_contexto(rows_sessao, rows, contexto)
 
     except Exception as e:
         print(f"{RED}❌ [RAG][STEP4-ERRO] Falha ao montar contexto: {e}{RESET}")
         return "Nenhum contexto encontrado."
 
-    return contexto
+    if texto == SEM_CONTEXTO:
+        print(f"{YELLOW}🟡 [RAG][INFO] Nenhum contexto encontrado.{RESET}")
+    else:
+        print(GREEN + "🟢 [RAG][OK] Contexto gerado com sucesso." + RESET)
+
+    return texto
+
+
+# ================================================================
+# 🟪 RAG — versão assíncrona (AsyncSession + AsyncOpenAI)
+# ================================================================
+async def recuperar_contexto_rag_async(
+    db_ia: AsyncSession,
+    vendedor_id: int,
+    pergunta: str,
+    k: int = 5,
+    contexto=None
+):
+
+    print(f"{PURPLE}🟪 [RAG-ASYNC][INIT] vendedor_id={vendedor_id} | pergunta={pergunta}{RESET}")
+
+    if contexto is not None and contexto.embedding is not None:
+        emb = contexto.embedding
+    else:
+        try:
+            emb = await gerar_embedding_async(pergunta)
+        except Exception as e:
+            print(f"{RED}❌ [RAG-ASYNC][STEP1-ERRO] Falha ao gerar embedding: {e}{RESET}")
+            return "Nenhum contexto encontrado."
+
+    vetor = _embedding_e_vetor(contexto, emb)
+
+    try:
+        rows_sessao = []
+        if contexto is not None and contexto.session_id:
+            rows_sessao = (await db_ia.execute(SQL_SESSAO, parametros_sessao(contexto))).fetchall()
+
+        await ajustar_busca_vetorial_async(db_ia, "rag")
+        rows = (await db_ia.execute(
+            sql_lembrancas(),
+            parametros_lembrancas(vendedor_id, vetor, k, contexto)
+        )).fetchall()
+
+    except Exception as e:
+        print(f"{RED}❌ [RAG-ASYNC][STEP3-ERRO] Erro ao consultar pgvector: {e}{RESET}")
+        try:
+            await db_ia.rollback()
+        except Exception:
+            pass
+        return "Nenhum contexto encontrado."
+
+    try:
+        texto = _montar_contexto(rows_sessao, rows, contexto)
+
+    except Exception as e:
+        print(f"{RED}❌ [RAG-ASYNC][STEP4-ERRO] Falha ao montar contexto: {e}{RESET}")
+        return "Nenhum contexto encontrado."
+
+    if texto == SEM_CONTEXTO:
+        print(f"{YELLOW}🟡 [RAG-ASYNC][INFO] Nenhum contexto encontrado.{RESET}")
+    else:
+        print(GREEN + "🟢 [RAG-ASYNC][OK] Contexto gerado com sucesso." + RESET)
+
+    return texto
@@ -1,9 +1,23 @@
 # app/modules/assistente/kernel/agent_sql.py
 
-from sqlalchemy import text
+from pydantic import ValidationError
+import asyncio
+import os
+import threading
 import traceback
-from app.core.openai_client import client
+from app.core.openai_client import client, client_async
 from app.core.database_pdv import engine_pdv
+from app.modules.assistente.kernel.catalogo_esquema import carregar_catalogo
+from app.modules.assistente.kernel.guardas_sql import (
+    executar_sql_protegida,
+    executar_sql_protegida_async,
+)
+from app.modules.assistente.kernel.templates_sql import (
+    atualizar_aprovados,
+    escolher_template,
+    registrar_sql_gerada,
+)
+from app.modules.assistente.schemas.schema import RespostaAgenteSQL
 
 # ============================================================
 #  ANSI COLORS
@@ -22,18 +36,228 @@ def log_success(msg):  print(f"{GREEN}[SQL][OK]{RESET} {msg}")
 def log_error(msg):    print(f"{RED}[SQL][ERRO]{RESET} {msg}")
 
 
+# ==================================================================
+#   PARTES COMPARTILHADAS (versões sync e async do agente)
+# ==================================================================
+def extrair_nome_cliente(pergunta: str) -> str:
+    return (
+        pergunta.lower()
+        .replace("dados de", "")
+        .replace("informações de", "")
+        .replace("compras de", "")
+        .replace("cliente", "")
+        .replace("compra", "")
+        .strip()
+    )
+
+
+# Tentativas extras só quando a resposta não passa na validação do schema
+SQL_LLM_MAX_CORRECOES = int(os.getenv("SQL_LLM_MAX_CORRECOES", "2"))
+
+INTENCOES = [
+    "dados_cliente",
+    "compras_cliente",
+    "endereco_cliente",
+    "telefones_cliente",
+    "produtos_cliente",
+    "status_pedido",
+    "dados_loja",
+    "outra",
+]
+
+# Structured Outputs: o modelo é obrigado a responder neste formato
+FORMATO_RESPOSTA_SQL = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "resposta_agente_sql",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["intent", "parametros", "sql", "confianca"],
+            "properties": {
+                "intent": {"type": "string", "enum": INTENCOES},
+                "parametros": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["cliente_nome", "cliente_id", "pedido_id"],
+                    "properties": {
+                        "cliente_nome": {"type": ["string", "null"]},
+                        "cliente_id": {"type": ["integer", "null"]},
+                        "pedido_id": {"type": ["integer", "null"]},
+                    },
+                },
+                "sql": {"type": "string"},
+                "confianca": {"type": "number"},
+            },
+        },
+    },
+}
+
+
+def prompt_sistema_sql(catalogo: str) -> str:
+    """
+    Parte fixa do prompt (instruções + esquema): montada uma vez por
+    agente e sempre idêntica no início da requisição, então a OpenAI
+    reaproveita o prefixo em cache entre perguntas.
+    """
+    return f"""Você é um especialista em SQL para um banco de PDV (PostgreSQL).
+Para a pergunta do vendedor, responda em JSON com:
+- intent: a intenção principal ({", ".join(INTENCOES)})
+- parametros: cliente_nome, cliente_id e pedido_id citados na pergunta (null se ausentes)
+- sql: UMA consulta PostgreSQL válida, somente leitura, SEM SELECT * (liste as colunas)
+- confianca: de 0 a 1, o quanto a SQL responde a pergunta
+
+Use só as tabelas e colunas abaixo. Faça os JOINs pelas chaves estrangeiras
+(→) e filtre por colunas com índice; em tabelas grandes, use LIMIT.
+
+{catalogo}"""
+
+
+def prompt_sql_estruturado(pergunta: str, intent_sugerida: str | None, nome_detectado: str) -> str:
+    return f"""Pergunta: "{pergunta}"
+Intenção sugerida: {intent_sugerida or "(não definida)"}
+Cliente identificado (heurística): {nome_detectado}"""
+
+
+def ler_resposta_sql(conteudo: str) -> RespostaAgenteSQL:
+    # ValidationError (JSON inválido ou fora do schema) → nova tentativa
+    return RespostaAgenteSQL.model_validate_json(conteudo)
+
+
+def parametros_da_resposta(resposta: RespostaAgenteSQL) -> dict:
+    p = resposta.parametros
+    return {"nome": p.cliente_nome, "cliente_id": p.cliente_id, "pedido_id": p.pedido_id}
+
+
+def _mensagens_correcao(mensagens: list, conteudo: str, erro: ValidationError) -> list:
+    return mensagens + [
+        {"role": "assistant", "content": conteudo},
+        {"role": "user", "content": f"A resposta não passou na validação:\n{erro}\nCorrija e responda de novo no mesmo formato JSON."},
+    ]
+
+
+def gerar_sql_estruturada(prompt_sistema: str, pergunta: str, intent: str | None, nome_detectado: str) -> RespostaAgenteSQL:
+    mensagens = [
+        {"role": "system", "content": prompt_sistema},
+        {"role": "user", "content": prompt_sql_estruturado(pergunta, intent, nome_detectado)},
+    ]
+
+    for tentativa in range(SQL_LLM_MAX_CORRECOES + 1):
+        resp = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=mensagens,
+            response_format=FORMATO_RESPOSTA_SQL
+        )
+        conteudo = resp.choices[0].message.content or ""
+
+        try:
+            return ler_resposta_sql(conteudo)
+        except ValidationError as e:
+            log_warn(f"[SQL][SCHEMA] Resposta inválida (tentativa {tentativa + 1}): {e.errors()[0]['msg']}")
+            if tentativa == SQL_LLM_MAX_CORRECOES:
+                raise
+            mensagens = _mensagens_correcao(mensagens, conteudo, e)
+
+
+async def gerar_sql_estruturada_async(prompt_sistema: str, pergunta: str, intent: str | None, nome_detectado: str) -> RespostaAgenteSQL:
+    mensagens = [
+        {"role": "system", "content": prompt_sistema},
+        {"role": "user", "content": prompt_sql_estruturado(pergunta, intent, nome_detectado)},
+    ]
+
+    for tentativa in range(SQL_LLM_MAX_CORRECOES + 1):
+        resp = await client_async.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=mensagens,
+            response_format=FORMATO_RESPOSTA_SQL
+        )
+        conteudo = resp.choices[0].message.content or ""
+
+        try:
+            return ler_resposta_sql(conteudo)
+        except ValidationError as e:
+            log_warn(f"[SQL-ASYNC][SCHEMA] Resposta inválida (tentativa {tentativa + 1}): {e.errors()[0]['msg']}")
+            if tentativa == SQL_LLM_MAX_CORRECOES:
+                raise
+            mensagens = _mensagens_correcao(mensagens, conteudo, e)
+
+
+def resultado_template(intent: str, template: dict, nome_detectado: str, rows: list, execucao: dict) -> dict:
+    return {
+        "success": True,
+        "intent": intent,
+        "cliente_nome": template["nome_cliente"] or nome_detectado,
+        "sql_text": template["sql"],
+        "sql_executada": execucao["sql"],
+        "fonte_sql": f"template:{template['nome']}",
+        "truncado": execucao["truncado"],
+        "colunas": execucao["colunas"],
+        "params": template["params"],
+        "rows": rows,
+    }
+
+
+def executar_template(intent: str, template: dict, nome_detectado: str) -> dict:
+    log_info(f"[SQL][TEMPLATE] {template['nome']} params={template['params']}")
+
+    # consulta revisada: sem EXPLAIN, mas com as demais guardas
+    try:
+        rows, execucao = executar_sql_protegida(template["sql"], template["params"], verificar_plano=False)
+        log_success("[SQL][EXEC-OK] Resultado retornado (template).")
+    except Exception as e:
+        log_error(f"Erro no template {template['nome']}: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    return resultado_template(intent, template, nome_detectado, rows, execucao)
+
+
+async def executar_template_async(intent: str, template: dict, nome_detectado: str) -> dict:
+    log_info(f"[SQL-ASYNC][TEMPLATE] {template['nome']} params={template['params']}")
+
+    try:
+        rows, execucao = await executar_sql_protegida_async(
+            template["sql"], template["params"], verificar_plano=False
+        )
+        log_success("[SQL-ASYNC][EXEC-OK] Resultado retornado (template).")
+    except Exception as e:
+        log_error(f"Erro no template {template['nome']}: {e}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    return resultado_template(intent, template, nome_detectado, rows, execucao)
+
+
+def confirmar_vazio(resultado: dict) -> bool:
+    """
+    Template escolhido só com parâmetros da regex e sem linhas: o nome
+    pode ter saído errado — o LLM confere antes de responder "nada".
+    """
+    return resultado["success"] and not resultado["rows"]
+
+
+def mesmo_template(a: dict | None, b: dict) -> bool:
+    return a is not None and a["nome"] == b["nome"] and a["params"] == b["params"]
+
+
 # ==================================================================
 #   SQL AGENT — cria uma função callable
 # ==================================================================
-def criar_agente_sql():
+def criar_agente_sql(catalogo: str | None = None):
 
     log_info("Inicializando SQL Agent")
+    prompt_sistema = prompt_sistema_sql(catalogo or carregar_catalogo())
     log_info(f"Conectando ao PDV: {engine_pdv.url}")
 
     # ==================================================================
     #  FUNÇÃO INTERNA — o verdadeiro agente SQL
     # ==================================================================
-    def agente_sql(pergunta: str):
+    def agente_sql(pergunta: str, intent: str | None = None):
 
         print("\n" + BLUE + "--------------------------------------------------------")
         print(f"[SQL][CALL] Pergunta recebida: {pergunta}")
@@ -43,114 +267,89 @@ def criar_agente_sql():
             # ==================================================================
             # 1) Extrair nome do cliente
             # ==================================================================
-            nome_detectado = (
-                pergunta.lower()
-                .replace("dados de", "")
-                .replace("informações de", "")
-                .replace("compras de", "")
-                .replace("cliente", "")
-                .replace("compra", "")
-                .strip()
-            )
+            nome_detectado = extrair_nome_cliente(pergunta)
 
             if nome_detectado:
                 log_warn(f"[SQL][NOME] Nome detectado via heurística: {nome_detectado}")
 
             # ==================================================================
-            # 2) Intent via LLM
+            # 2) Catálogo de templates — intenção do roteador + parâmetros
+            #    por regex; sem LLM quando a pergunta se encaixa
             # ==================================================================
-            intent_prompt = f"""
-Você é um especialista em SQL para um banco de PDV.
-Com base na pergunta do vendedor, responda apenas com a intenção principal:
-
-Pergunta: "{pergunta}"
-
-Intenções possíveis:
-- dados_cliente
-- compras_cliente
-- endereco_cliente
-- telefones_cliente
-- produtos_cliente
-- status_pedido
-
-Responda apenas com UMA palavra da lista acima.
-"""
-
-            intent_resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": intent_prompt}]
-            )
-            intent = intent_resp.choices[0].message.content.strip()
+            atualizar_aprovados()
+            template = escolher_template(intent, pergunta)
+            resposta_llm = None
+            tentado = None
+
+            if template:
+                resultado = executar_template(intent, template, nome_detectado)
+                if not confirmar_vazio(resultado):
+                    return resultado
 
-            log_info(f"[SQL][INTENÇÃO] {intent}")
+                log_warn("[SQL][TEMPLATE] Nenhuma linha com os parâmetros da regex — conferindo com o LLM.")
+                tentado, template = template, None
 
             # ==================================================================
-            # 3) Gerar SQL via LLM
+            # 3) Senão, UMA chamada estruturada: intenção + parâmetros + SQL
             # ==================================================================
-            sql_prompt = f"""
-Gere uma consulta SQL **válida para PostgreSQL**, SEM usar SELECT *.
-
-NUNCA use blocos Markdown.
-NÃO use ```sql ou ```.
+            if not template:
+                resposta_llm = gerar_sql_estruturada(prompt_sistema, pergunta, intent, nome_detectado)
+                intent = intent or resposta_llm.intent
 
-Pergunta: "{pergunta}"
-Intenção: {intent}
-Cliente identificado: {nome_detectado}
+                log_info(f"[SQL][LLM] intent={resposta_llm.intent} confiança={resposta_llm.confianca}")
 
-Tabelas disponíveis:
-- cliente(id, nome, cpf, email, numero, telefone, endereco_id, complemento)
-- pedido(id, data_pedido, id_cliente, status)
-- itens_pedido(id, id_pedido, id_produto, quantidade, valor_venda, desconto)
-- produto(id, nome, descricao, preco, categoria_id)
+                # parâmetros extraídos pelo LLM podem completar um template
+                # (depois de um template vazio, só os do LLM valem)
+                template = escolher_template(
+                    intent, pergunta, parametros_da_resposta(resposta_llm), usar_regex=tentado is None
+                )
 
-Responda SOMENTE com a SQL pura.
-"""
-
-            sql_resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": sql_prompt}]
-            )
-
-            sql_text = sql_resp.choices[0].message.content.strip()
+            # ==================================================================
+            # 4) Template (consulta revisada)
+            # ==================================================================
+            if template:
+                if mesmo_template(tentado, template):
+                    # o LLM confirmou os parâmetros: o resultado vazio vale
+                    return resultado
+                return executar_template(intent, template, nome_detectado)
 
             # ==================================================================
-            # 4) Remover ``` e lixo do modelo (CORREÇÃO CRÍTICA)
+            # 5) SQL gerada pelo LLM (já validada pelo schema)
             # ==================================================================
-            sql_text = (
-                sql_text.replace("```sql", "")
-                        .replace("```", "")
-                        .strip()
-            )
+            sql_text = resposta_llm.sql
 
-            log_success("[SQL][GERAR-OK] SQL gerada limpa:")
+            log_success("[SQL][GERAR-OK] SQL gerada:")
             print(sql_text)
 
-            # Anti SELECT *
-            if "select *" in sql_text.lower():
-                raise Exception("SELECT * proibido.")
-
             # ==================================================================
-            # 5) Executar SQL no Postgres
+            # 6) Executar SQL no Postgres (somente leitura, timeout,
+            #    EXPLAIN antes e no máximo SQL_MAX_LINHAS linhas)
             # ==================================================================
-            with engine_pdv.connect() as conn:
-                try:
-                    log_info("[SQL][EXEC] Executando SQL...")
-                    result = conn.execute(text(sql_text)).fetchall()
-                    log_success("[SQL][EXEC-OK] Resultado retornado.")
-                except Exception as e:
-                    log_error(f"Erro no SQL: {e}")
-                    return {
-                        "success": False,
-                        "error": str(e)
-                    }
-
-            rows = [tuple(r) for r in result] if result else []
+            try:
+                log_info("[SQL][EXEC] Executando SQL...")
+                rows, execucao = executar_sql_protegida(sql_text)
+                log_success(f"[SQL][EXEC-OK] Resultado retornado (custo {execucao['custo']}).")
+            except Exception as e:
+                log_error(f"Erro no SQL: {e}")
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+
+            # SQL que funcionou vira candidata a template (revisão manual)
+            registrar_sql_gerada(intent, pergunta, sql_text)
 
             return {
                 "success": True,
                 "intent": intent,
-                "cliente_nome": nome_detectado,
+                "cliente_nome": resposta_llm.parametros.cliente_nome or nome_detectado,
                 "sql_text": sql_text,
+                "sql_executada": execucao["sql"],
+                "fonte_sql": "llm",
+                "confianca": resposta_llm.confianca,
+                "truncado": execucao["truncado"],
+                "colunas": execucao["colunas"],
+                "params": {},
                 "rows": rows
             }
 
@@ -164,3 +363,130 @@ Responda SOMENTE com a SQL pura.
             }
 
     return agente_sql
+
+
+# ==================================================================
+#   SQL AGENT ASSÍNCRONO — AsyncOpenAI + engine_pdv_async
+# ==================================================================
+# registros de SQL gerada em andamento (fora do caminho da resposta)
+_registros_pendentes: set[asyncio.Task] = set()
+
+
+def criar_agente_sql_async(catalogo: str | None = None):
+
+    log_info("Inicializando SQL Agent (async)")
+    prompt_sistema = prompt_sistema_sql(catalogo or carregar_catalogo())
+
+    async def agente_sql(pergunta: str, intent: str | None = None):
+
+        print(BLUE + f"[SQL-ASYNC][CALL] Pergunta recebida: {pergunta}" + RESET)
+
+        try:
+            nome_detectado = extrair_nome_cliente(pergunta)
+
+            atualizar_aprovados()
+            template = escolher_template(intent, pergunta)
+            resposta_llm = None
+            tentado = None
+
+            if template:
+                resultado = await executar_template_async(intent, template, nome_detectado)
+                if not confirmar_vazio(resultado):
+                    return resultado
+
+                log_warn("[SQL-ASYNC][TEMPLATE] Nenhuma linha com os parâmetros da regex — conferindo com o LLM.")
+                tentado, template = template, None
+
+            if not template:
+                resposta_llm = await gerar_sql_estruturada_async(prompt_sistema, pergunta, intent, nome_detectado)
+                intent = intent or resposta_llm.intent
+
+                log_info(f"[SQL-ASYNC][LLM] intent={resposta_llm.intent} confiança={resposta_llm.confianca}")
+
+                template = escolher_template(
+                    intent, pergunta, parametros_da_resposta(resposta_llm), usar_regex=tentado is None
+                )
+
+            log_info(f"[SQL-ASYNC][INTENÇÃO] {intent}")
+
+            if template:
+                if mesmo_template(tentado, template):
+                    return resultado
+                return await executar_template_async(intent, template, nome_detectado)
+
+            sql_text = resposta_llm.sql
+
+            log_success("[SQL-ASYNC][GERAR-OK] SQL gerada:")
+            print(sql_text)
+
+            try:
+                rows, execucao = await executar_sql_protegida_async(sql_text)
+                log_success(f"[SQL-ASYNC][EXEC-OK] Resultado retornado (custo {execucao['custo']}).")
+            except Exception as e:
+                log_error(f"Erro no SQL: {e}")
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+
+            tarefa = asyncio.create_task(
+                asyncio.to_thread(registrar_sql_gerada, intent, pergunta, sql_text)
+            )
+            _registros_pendentes.add(tarefa)
+            tarefa.add_done_callback(_registros_pendentes.discard)
+
+            return {
+                "success": True,
+                "intent": intent,
+                "cliente_nome": resposta_llm.parametros.cliente_nome or nome_detectado,
+                "sql_text": sql_text,
+                "sql_executada": execucao["sql"],
+                "fonte_sql": "llm",
+                "confianca": resposta_llm.confianca,
+                "truncado": execucao["truncado"],
+                "colunas": execucao["colunas"],
+                "params": {},
+                "rows": rows
+            }
+
+        except Exception as e:
+            log_error(f"Erro inesperado no agente SQL (async): {e}")
+            print(RED + traceback.format_exc() + RESET)
+
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    return agente_sql
+
+
+# ==================================================================
+#   INSTÂNCIAS DO PROCESSO (criadas no startup, reusadas por requisição)
+# ==================================================================
+_agente_sql = None
+_agente_sql_async = None
+_lock_agentes = threading.Lock()
+
+
+def preparar_agentes_sql():
+    """Gera o catálogo uma vez e cria os dois agentes com o mesmo prefixo."""
+    global _agente_sql, _agente_sql_async
+
+    with _lock_agentes:
+        if _agente_sql is None or _agente_sql_async is None:
+            catalogo = carregar_catalogo()
+            _agente_sql = criar_agente_sql(catalogo)
+            _agente_sql_async = criar_agente_sql_async(catalogo)
+
+
+def obter_agente_sql():
+    if _agente_sql is None:
+        preparar_agentes_sql()
+    return _agente_sql
+
+
+def obter_agente_sql_async():
+    if _agente_sql_async is None:
+        preparar_agentes_sql()
+    return _agente_sql_async
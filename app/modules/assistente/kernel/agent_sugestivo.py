@@ -36,6 +36,10 @@ def log_error(msg):    print(f"{RED}[SUGESTIVO][ERRO]{RESET} {msg}")
 # 🚀 AGENTE SUGESTIVO — com recomendador híbrido integrado
 # ====================================================================
 class SugestivoService:
+    """
+    Os registros só fazem add + flush: quem chama decide o commit
+    (processar_resposta_sugestiva grava tudo numa transação só).
+    """
 
     # -------------------------------------------------------------
     # 1) Registrar Interação
@@ -55,27 +59,19 @@ class SugestivoService:
             log_error("chat_message_id ausente — ignorando interação.")
             return None
 
-        try:
-            interacao = InteracaoCliente(
-                chat_message_id=chat_message_id,
-                cliente_id=cliente_id,
-                vendedor_id=vendedor_id,
-                tipo=tipo or "indefinido",
-                detalhe=detalhe or "",
-            )
-
-            db.add(interacao)
-            db.commit()
-            db.refresh(interacao)
+        interacao = InteracaoCliente(
+            chat_message_id=chat_message_id,
+            cliente_id=cliente_id,
+            vendedor_id=vendedor_id,
+            tipo=tipo or "indefinido",
+            detalhe=detalhe or "",
+        )
 
-            log_ok(f"Interação registrada (ID={interacao.id})")
-            return interacao
+        db.add(interacao)
+        db.flush()
 
-        except Exception:
-            db.rollback()
-            log_error("Falha ao registrar interação")
-            print(RED + traceback.format_exc() + RESET)
-            return None
+        log_ok(f"Interação registrada (ID={interacao.id})")
+        return interacao
 
     # -------------------------------------------------------------
     # 2) Registrar Preferência
@@ -95,27 +91,19 @@ class SugestivoService:
             log_warn("cliente_id=None → preferência ignorada.")
             return None
 
-        try:
-            pref = PreferenciaCliente(
-                cliente_id=cliente_id,
-                chave=chave,
-                valor=valor,
-                fonte=fonte,
-                peso=peso
-            )
-
-            db.add(pref)
-            db.commit()
-            db.refresh(pref)
+        pref = PreferenciaCliente(
+            cliente_id=cliente_id,
+            chave=chave,
+            valor=valor,
+            fonte=fonte,
+            peso=peso
+        )
 
-            log_ok(f"Preferência registrada (ID={pref.id})")
-            return pref
+        db.add(pref)
+        db.flush()
 
-        except Exception:
-            db.rollback()
-            log_error("Erro ao registrar preferência")
-            print(RED + traceback.format_exc() + RESET)
-            return None
+        log_ok(f"Preferência registrada (ID={pref.id})")
+        return pref
 
     # -------------------------------------------------------------
     # 3) Registrar Recomendação
@@ -131,27 +119,19 @@ class SugestivoService:
     ):
         log_info(f"Registrando recomendação (produto_id={produto_id})...")
 
-        try:
-            rec = RecomendacaoRegistrada(
-                cliente_id=cliente_id,
-                vendedor_id=vendedor_id,
-                produto_id=produto_id,
-                motivo=motivo[:500],
-                score=score,
-            )
-
-            db.add(rec)
-            db.commit()
-            db.refresh(rec)
+        rec = RecomendacaoRegistrada(
+            cliente_id=cliente_id,
+            vendedor_id=vendedor_id,
+            produto_id=produto_id,
+            motivo=motivo[:500],
+            score=score,
+        )
 
-            log_ok(f"Recomendação salva (ID={rec.id})")
-            return rec
+        db.add(rec)
+        db.flush()
 
-        except Exception:
-            db.rollback()
-            log_error("Erro ao registrar recomendação")
-            print(RED + traceback.format_exc() + RESET)
-            return None
+        log_ok(f"Recomendação salva (ID={rec.id})")
+        return rec
 
 
 # ====================================================================
@@ -163,27 +143,23 @@ def processar_resposta_sugestiva(
     pergunta: str,
     resposta_llm: str,
     chat_message_id: int,
-    cliente_id: int | None
+    cliente_id: int | None,
+    commit: bool = True
 ):
+    """
+    Grava preferência, recomendações e, por último, a interação
+    "resposta_llm" — que é a marca de idempotência do job "sugestivo" —
+    numa transação só. Erros sobem para quem chamou.
+
+    commit=False: não faz commit (a fila conclui o job no mesmo commit).
+    """
     log_info("Executando pós-processamento sugestivo...")
 
     servico = SugestivoService()
 
     try:
         # ---------------------------------------------------------
-        # 1) Registrar interação da resposta
-        # ---------------------------------------------------------
-        servico.registrar_interacao(
-            db=db_ia,
-            chat_message_id=chat_message_id,
-            cliente_id=cliente_id,
-            vendedor_id=vendedor_id,
-            tipo="resposta_llm",
-            detalhe=pergunta
-        )
-
-        # ---------------------------------------------------------
-        # 2) Registrar preferência detectada na resposta
+        # 1) Registrar preferência detectada na resposta
         # ---------------------------------------------------------
         if "gost" in resposta_llm.lower() or "prefere" in resposta_llm.lower():
             servico.registrar_preferencia(
@@ -194,7 +170,7 @@ def processar_resposta_sugestiva(
             )
 
         # ---------------------------------------------------------
-        # 3) Identificar intenção de recomendação
+        # 2) Identificar intenção de recomendação
         # ---------------------------------------------------------
         gatilhos = [
             "recomende", "sugira", "indique", "recomendações",
@@ -224,8 +200,26 @@ def processar_resposta_sugestiva(
                     score=float(rec.score) if hasattr(rec, "score") else 0.5
                 )
 
+        # ---------------------------------------------------------
+        # 3) Registrar interação da resposta — por último
+        # ---------------------------------------------------------
+        servico.registrar_interacao(
+            db=db_ia,
+            chat_message_id=chat_message_id,
+            cliente_id=cliente_id,
+            vendedor_id=vendedor_id,
+            tipo="resposta_llm",
+            detalhe=pergunta
+        )
+
+        if commit:
+            db_ia.commit()
+
         log_ok("Agente Sugestivo finalizado com sucesso.")
 
     except Exception:
+        if commit:
+            db_ia.rollback()
         log_error("Falha geral no agente sugestivo:")
-        print(RED + traceback.format_exc() + RESET)
\ No newline at end of file
+        print(RED + traceback.format_exc() + RESET)
+        raise
@@ -0,0 +1,292 @@
+# app/modules/assistente/kernel/cache_respostas.py
+
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import xxhash
+from sqlalchemy import text
+
+from app.core.database_ia import engine_ia, engine_ia_async
+from app.modules.assistente.kernel.templates_sql import MESES, extrair_parametros
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[CACHE-RESP][INFO]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+CACHE_RESPOSTAS_ATIVO = os.getenv("CACHE_RESPOSTAS_ATIVO", "1") == "1"
+CACHE_RESPOSTAS_MIN_SIMILARIDADE = float(os.getenv("CACHE_RESPOSTAS_MIN_SIMILARIDADE", "0.95"))
+CACHE_RESPOSTAS_TTL_SEGUNDOS = int(os.getenv("CACHE_RESPOSTAS_TTL_SEGUNDOS", "600"))
+CACHE_RESPOSTAS_MAX_POR_VENDEDOR = int(os.getenv("CACHE_RESPOSTAS_MAX_POR_VENDEDOR", "200"))
+
+# de quanto em quanto tempo cada worker confere se terminou um sync
+# PDV → IA (em qualquer worker) — se sim, esvazia o próprio cache
+CACHE_RESPOSTAS_VERIFICAR_SYNC_SEGUNDOS = float(os.getenv("CACHE_RESPOSTAS_VERIFICAR_SYNC_SEGUNDOS", "5"))
+
+
+# ================================================================
+# 🔑 ASSINATURA DA PERGUNTA (o que o embedding não distingue)
+#
+# "pedido 123" × "pedido 124", "vendas de hoje" × "vendas de ontem"
+# ficam acima do limiar de similaridade, mas pedem outra consulta.
+# Só é candidata uma entrada com a mesma assinatura: parâmetros
+# extraídos, números e termos de período iguais.
+# ================================================================
+TERMOS_PERIODO = MESES | {
+    "hoje", "ontem", "anteontem", "amanhã", "amanha", "dia", "semana", "mês", "mes",
+    "ano", "trimestre", "semestre", "passado", "passada", "anterior", "atual",
+    "este", "esta", "esse", "essa", "neste", "nesta", "nesse", "nessa",
+    "último", "última", "ultimo", "ultima", "últimos", "últimas", "próximo", "próxima",
+}
+
+PADRAO_PALAVRAS = re.compile(r"[\wÀ-ÿ]+")
+
+
+def assinatura_pergunta(pergunta: str) -> str:
+    palavras = [p.lower() for p in PADRAO_PALAVRAS.findall(pergunta)]
+    parametros = extrair_parametros(pergunta)
+    if "nome" in parametros:
+        parametros["nome"] = parametros["nome"].lower()
+
+    return repr((
+        sorted(parametros.items()),
+        sorted({p for p in palavras if p.isdigit()}),
+        sorted({p for p in palavras if p in TERMOS_PERIODO}),
+    ))
+
+
+# ================================================================
+# 🧬 IMPRESSÃO DOS DADOS (em que dados do PDV a resposta se baseou)
+#
+# Hash da SQL executada, dos parâmetros e das linhas devolvidas. No
+# hit, só a SQL guardada roda de novo (sem agente SQL, sem LLM): se as
+# linhas são as mesmas, a resposta continua valendo.
+# ================================================================
+def calcular_impressao(sql: str, params: dict | None, colunas: list[str], rows: list) -> str:
+    h = xxhash.xxh3_64()
+    h.update(sql.encode("utf-8"))
+    h.update(b"\0" + repr(sorted((params or {}).items())).encode("utf-8"))
+    h.update(b"\0" + repr(colunas).encode("utf-8"))
+    for r in rows:
+        h.update(b"\0" + repr(tuple(r)).encode("utf-8"))
+    return h.hexdigest()
+
+
+# ================================================================
+# 💾 CACHE (em memória, por vendedor)
+# ================================================================
+class _Entrada:
+
+    def __init__(self, vetor: np.ndarray, resposta: str, sql: str, params: dict, assinatura: str, impressao: str):
+        self.vetor = vetor
+        self.resposta = resposta
+        self.sql = sql
+        self.params = params
+        self.assinatura = assinatura
+        self.impressao = impressao
+        self.criado = time.monotonic()
+
+
+def _normalizar(embedding) -> np.ndarray | None:
+    v = np.asarray(embedding, dtype=np.float32)
+    norma = np.linalg.norm(v)
+    return v / norma if norma else None
+
+
+class CacheRespostas:
+
+    def __init__(self, limiar: float, ttl: float, max_por_vendedor: int):
+        self.limiar = limiar
+        self.ttl = ttl
+        self.max_por_vendedor = max_por_vendedor
+
+        self._entradas: dict[int, list[_Entrada]] = {}
+        self._matrizes: dict[int, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+        # muda a cada invalidação: respostas que começaram antes dela
+        # não entram no cache (ver guardar)
+        self.geracao = 0
+
+        # fim do último sync PDV → IA visto por este processo
+        self._ultimo_sync = None
+        self._sync_conferido_em = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.dados_mudaram = 0
+        self.expiradas = 0
+        self.guardadas = 0
+        self.invalidacoes = 0
+
+    # -------------------------------------------------
+    # Estrutura por vendedor
+    # -------------------------------------------------
+    def _reconstruir(self, vendedor_id: int):
+        entradas = self._entradas.get(vendedor_id)
+        if entradas:
+            self._matrizes[vendedor_id] = np.vstack([e.vetor for e in entradas])
+        else:
+            self._entradas.pop(vendedor_id, None)
+            self._matrizes.pop(vendedor_id, None)
+
+    def _remover(self, vendedor_id: int, entrada: _Entrada):
+        with self._lock:
+            entradas = self._entradas.get(vendedor_id, [])
+            if entrada in entradas:
+                entradas.remove(entrada)
+                self._reconstruir(vendedor_id)
+
+    # -------------------------------------------------
+    # Interface
+    # -------------------------------------------------
+    def candidata(self, vendedor_id: int, embedding, assinatura: str) -> _Entrada | None:
+        """
+        Entrada da pergunta mais parecida (cosseno >= limiar) com a mesma
+        assinatura, dentro do TTL. A resposta só vale depois de confirmar().
+        """
+        v = _normalizar(embedding)
+        entrada = None
+
+        with self._lock:
+            entradas = self._entradas.get(vendedor_id)
+            if v is not None and entradas:
+                sims = np.where(
+                    [e.assinatura == assinatura for e in entradas],
+                    self._matrizes[vendedor_id] @ v,
+                    -1.0,
+                )
+                i = int(np.argmax(sims))
+                if sims[i] >= self.limiar:
+                    entrada = entradas[i]
+
+        if entrada is None:
+            self.misses += 1
+            return None
+
+        if time.monotonic() - entrada.criado > self.ttl:
+            self.expiradas += 1
+            self.misses += 1
+            self._remover(vendedor_id, entrada)
+            return None
+
+        return entrada
+
+    def confirmar(self, vendedor_id: int, entrada: _Entrada, impressao: str) -> str | None:
+        """`impressao`: da SQL da entrada rodada agora."""
+        if impressao != entrada.impressao:
+            self.dados_mudaram += 1
+            self.misses += 1
+            self._remover(vendedor_id, entrada)
+            return None
+
+        self.hits += 1
+        return entrada.resposta
+
+    def guardar(
+        self,
+        vendedor_id: int,
+        embedding,
+        resposta: str,
+        base: dict,
+        assinatura: str,
+        geracao: int
+    ):
+        """
+        `base`: {"sql", "params", "impressao"} da resposta;
+        `geracao`: valor de self.geracao lido antes de gerar a resposta.
+        """
+        v = _normalizar(embedding)
+        if v is None:
+            return
+
+        with self._lock:
+            if geracao != self.geracao:
+                return
+
+            entradas = self._entradas.setdefault(vendedor_id, [])
+            entradas.append(_Entrada(v, resposta, base["sql"], base["params"], assinatura, base["impressao"]))
+            del entradas[:-self.max_por_vendedor]
+            self._reconstruir(vendedor_id)
+            self.guardadas += 1
+
+    def invalidar(self, vendedor_id: int | None = None):
+        with self._lock:
+            if vendedor_id is None:
+                self._entradas.clear()
+                self._matrizes.clear()
+            else:
+                self._entradas.pop(vendedor_id, None)
+                self._matrizes.pop(vendedor_id, None)
+            self.geracao += 1
+            self.invalidacoes += 1
+
+        log_info("Cache de respostas invalidado" + (f" (vendedor {vendedor_id})." if vendedor_id else "."))
+
+    # -------------------------------------------------
+    # Sync PDV → IA em qualquer worker (jobs_sync_ia)
+    # -------------------------------------------------
+    def precisa_conferir_sync(self) -> bool:
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._sync_conferido_em < CACHE_RESPOSTAS_VERIFICAR_SYNC_SEGUNDOS:
+                return False
+            self._sync_conferido_em = agora
+            return True
+
+    def registrar_sync(self, ultimo_sync):
+        anterior, self._ultimo_sync = self._ultimo_sync, ultimo_sync
+        if anterior is not None and ultimo_sync != anterior:
+            self.invalidar()
+
+    def estatisticas(self) -> dict:
+        consultas = self.hits + self.misses
+        with self._lock:
+            itens = sum(len(e) for e in self._entradas.values())
+
+        return {
+            "ativo": CACHE_RESPOSTAS_ATIVO,
+            "itens": itens,
+            "vendedores": len(self._entradas),
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_hit": round(self.hits / consultas, 4) if consultas else None,
+            "dados_mudaram": self.dados_mudaram,
+            "expiradas": self.expiradas,
+            "guardadas": self.guardadas,
+            "invalidacoes": self.invalidacoes,
+            "limiar": self.limiar,
+            "ttl_segundos": self.ttl,
+        }
+
+
+cache_respostas = CacheRespostas(
+    limiar=CACHE_RESPOSTAS_MIN_SIMILARIDADE,
+    ttl=CACHE_RESPOSTAS_TTL_SEGUNDOS,
+    max_por_vendedor=CACHE_RESPOSTAS_MAX_POR_VENDEDOR,
+)
+
+
+SQL_ULTIMO_SYNC = text("SELECT MAX(fim) FROM jobs_sync_ia WHERE status = 'concluido'")
+
+
+def conferir_sync():
+    if cache_respostas.precisa_conferir_sync():
+        with engine_ia.connect() as conn:
+            cache_respostas.registrar_sync(conn.execute(SQL_ULTIMO_SYNC).scalar())
+
+
+async def conferir_sync_async():
+    if cache_respostas.precisa_conferir_sync():
+        async with engine_ia_async.connect() as conn:
+            cache_respostas.registrar_sync((await conn.execute(SQL_ULTIMO_SYNC)).scalar())
@@ -0,0 +1,183 @@
+# app/modules/assistente/kernel/catalogo_esquema.py
+
+import traceback
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.core.database_pdv import BasePDV, engine_pdv
+import app.modules.pdv.models  # noqa: F401 — registra as tabelas em BasePDV.metadata
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[ESQUEMA][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[ESQUEMA][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[ESQUEMA][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[ESQUEMA][ERRO]{RESET} {msg}")
+
+
+# tabelas que o LLM não deve consultar (usuario tem hash de senha)
+TABELAS_OCULTAS = {"usuario"}
+
+
+# ================================================================
+# SQL — estatísticas do Postgres (baratas: só catálogo, sem varrer)
+# ================================================================
+SQL_LINHAS_ESTIMADAS = text("""
+    SELECT c.relname AS tabela, c.reltuples::BIGINT AS linhas
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema()
+      AND c.relkind = 'r'
+      AND c.relname = ANY(:tabelas)
+""")
+
+SQL_INDICES = text("""
+    SELECT t.relname AS tabela,
+           ix.indisunique AS unico,
+           array_agg(a.attname ORDER BY k.ord) AS colunas
+    FROM pg_index ix
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    CROSS JOIN LATERAL unnest(ix.indkey) WITH ORDINALITY AS k(attnum, ord)
+    JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+    WHERE n.nspname = current_schema()
+      AND t.relname = ANY(:tabelas)
+    GROUP BY t.relname, ix.indexrelid, ix.indisunique
+""")
+
+
+# ================================================================
+# 🔎 INTROSPECÇÃO
+# ================================================================
+def _tabelas():
+    return [
+        t for nome, t in sorted(BasePDV.metadata.tables.items())
+        if nome not in TABELAS_OCULTAS
+    ]
+
+
+def _indices_do_modelo(tabela) -> list[tuple[tuple[str, ...], bool]]:
+    return [
+        (tuple(c.name for c in ix.columns), bool(ix.unique))
+        for ix in tabela.indexes
+    ]
+
+
+def _indices_relevantes(tabela, indices: list) -> list[tuple[tuple[str, ...], bool]]:
+    """
+    Tira o índice da PK (já marcada na coluna) e duplicatas — ex.:
+    `index=True` numa coluna primary_key cria um segundo índice em id.
+    """
+    pk = tuple(c.name for c in tabela.primary_key.columns)
+    por_colunas: dict[tuple, bool] = {}
+
+    for cols, unico in indices:
+        if cols != pk:
+            por_colunas[cols] = por_colunas.get(cols, False) or unico
+
+    return sorted(por_colunas.items())
+
+
+def _estatisticas_do_banco(nomes: list[str]) -> tuple[dict, dict]:
+    """
+    Linhas estimadas (reltuples, atualizado pelo ANALYZE/autovacuum) e
+    índices reais de cada tabela. Banco fora → ({}, {}) e o catálogo
+    usa só o que está declarado nos modelos.
+    """
+    try:
+        with engine_pdv.connect() as conn:
+            linhas = {
+                r.tabela: r.linhas
+                for r in conn.execute(SQL_LINHAS_ESTIMADAS, {"tabelas": nomes})
+            }
+            indices: dict[str, list] = {}
+            for r in conn.execute(SQL_INDICES, {"tabelas": nomes}):
+                indices.setdefault(r.tabela, []).append((tuple(r.colunas), r.unico))
+
+        return linhas, indices
+
+    except Exception as e:
+        log_warn(f"Sem estatísticas do banco PDV (usando só os modelos): {e}")
+        return {}, {}
+
+
+# ================================================================
+# 📝 DESCRIÇÃO COMPACTA (vai no prefixo fixo do prompt do agente SQL)
+# ================================================================
+def _formatar_linhas(n: int | None) -> str:
+    if n is None or n < 0:      # -1 = tabela nunca analisada
+        return ""
+    if n >= 1_000_000:
+        return f" (~{n / 1_000_000:.1f}M linhas)"
+    if n >= 1_000:
+        return f" (~{n / 1_000:.0f}k linhas)"
+    return f" (~{n} linhas)"
+
+
+def _formatar_coluna(coluna) -> str:
+    tipo = (
+        coluna.type.compile(dialect=postgresql.dialect())
+        .lower()
+        .replace(" without time zone", "")
+    )
+    partes = [coluna.name, tipo]
+
+    if coluna.primary_key:
+        partes.append("PK")
+    for fk in coluna.foreign_keys:
+        partes.append(f"→ {fk.target_fullname}")
+
+    return " ".join(partes)
+
+
+def descrever_esquema() -> str:
+    """
+    Uma tabela por bloco:
+
+        cliente (~12k linhas)
+          id integer PK, nome varchar(100), ..., endereco_id integer → endereco.id
+          índices: (nome)
+
+    Colunas e chaves estrangeiras vêm de BasePDV.metadata (não divergem
+    dos modelos); linhas e índices, do Postgres quando disponível.
+    """
+    tabelas = _tabelas()
+    linhas, indices_banco = _estatisticas_do_banco([t.name for t in tabelas])
+
+    blocos = []
+    for t in tabelas:
+        colunas = ", ".join(_formatar_coluna(c) for c in t.columns)
+
+        indices = _indices_relevantes(t, indices_banco.get(t.name) or _indices_do_modelo(t))
+        indices_txt = ", ".join(
+            f"({', '.join(cols)})" + (" único" if unico else "")
+            for cols, unico in indices
+        )
+
+        blocos.append(
+            f"{t.name}{_formatar_linhas(linhas.get(t.name))}\n"
+            f"  {colunas}\n"
+            f"  índices: {indices_txt or 'só a PK'}"
+        )
+
+    return "\n".join(blocos)
+
+
+def carregar_catalogo() -> str:
+    try:
+        catalogo = descrever_esquema()
+        log_success(f"Catálogo do PDV gerado ({len(_tabelas())} tabelas, {len(catalogo)} caracteres).")
+        return catalogo
+
+    except Exception:
+        log_error("Falha ao gerar o catálogo do esquema PDV:")
+        print(RED + traceback.format_exc() + RESET)
+        raise
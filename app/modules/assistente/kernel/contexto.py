@@ -0,0 +1,63 @@
+# app/modules/assistente/kernel/contexto.py
+
+import time
+
+import numpy as np
+
+
+# ================================================================
+# 🧳 CONTEXTO DA REQUISIÇÃO (artefatos compartilhados entre etapas)
+# ================================================================
+class ContextoRequisicao:
+    """
+    Criado uma vez por mensagem e repassado service → agente híbrido →
+    RAG / SQL / sugestivo. Cada etapa grava aqui o que produziu para
+    que as seguintes não recalculem (ex.: o embedding da mensagem,
+    gerado para gravar em chat_messages, é o mesmo usado no RAG).
+    """
+
+    def __init__(self, vendedor_id: int, mensagem: str, cliente_id: int | None = None):
+        self.vendedor_id = vendedor_id
+        self.mensagem = mensagem
+        self.cliente_id = cliente_id
+
+        self.session_id: str | None = None
+        self.chat_message_id: int | None = None
+
+        # embedding da mensagem (lista de floats, como vem da API) e sua
+        # forma normalizada float32 para o pgvector, preenchida pelo RAG
+        self.embedding: list[float] | None = None
+        self.embedding_vetor: np.ndarray | None = None
+
+        # decisão do roteador de intenção: {"intent", "fonte", "confianca", "etapas"}
+        self.rota: dict | None = None
+
+        # resolvidos pelo agente SQL
+        self.intent: str | None = None
+        self.cliente_nome: str | None = None
+
+        # cache de respostas: {"sql", "params", "impressao"} dos dados do
+        # PDV em que a resposta se baseou (None = não vai para o cache) e
+        # geração do cache lida na consulta
+        self.base_cache: dict | None = None
+        self.geracao_cache: int | None = None
+
+        # jobs da fila enfileirados junto com o pós-resposta
+        # [(tipo, chave_idempotencia, payload)] — ex.: resumo da sessão
+        self.jobs_pos_resposta: list[tuple[str, str, dict]] = []
+
+        # tokens (estimados) por seção do prompt final
+        self.tokens_prompt: dict[str, int] = {}
+
+        # ms por etapa
+        self.tempos: dict[str, float] = {}
+        self._inicio = time.perf_counter()
+
+    # -------------------------------------------------------------
+    # Tempos
+    # -------------------------------------------------------------
+    def marcar(self, etapa: str, inicio: float):
+        self.tempos[etapa] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    def decorrido_ms(self) -> float:
+        return round((time.perf_counter() - self._inicio) * 1000, 1)
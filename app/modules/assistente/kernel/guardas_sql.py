@@ -0,0 +1,256 @@
+# app/modules/assistente/kernel/guardas_sql.py
+
+import json
+import os
+import threading
+from collections import deque
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.database_pdv import engine_pdv, engine_pdv_async
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[GUARDA-SQL][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[GUARDA-SQL][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[GUARDA-SQL][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[GUARDA-SQL][ERRO]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", "5000"))
+
+# limites sobre a estimativa do EXPLAIN (unidades de custo do planner)
+SQL_MAX_CUSTO = float(os.getenv("SQL_MAX_CUSTO", "50000"))
+SQL_MAX_LINHAS_ESTIMADAS = int(os.getenv("SQL_MAX_LINHAS_ESTIMADAS", "100000"))
+
+# linhas que chegam ao agente (o resto nem sai do Postgres)
+SQL_MAX_LINHAS = int(os.getenv("SQL_MAX_LINHAS", "200"))
+
+# query_canceled — inclui o estouro do statement_timeout
+SQLSTATE_CANCELADA = "57014"
+
+
+class SQLRejeitada(Exception):
+    """A consulta não roda: mais de um comando ou plano estimado acima dos limites."""
+
+
+# ================================================================
+# 📊 MÉTRICAS
+# ================================================================
+class _Contadores:
+
+    def __init__(self):
+        self.executadas = 0
+        self.reescritas = 0
+        self.rejeitadas = 0
+        self.timeouts = 0
+        self.truncadas = 0
+        self.erros = 0
+        self.custos = deque(maxlen=500)
+        self._lock = threading.Lock()
+
+    def contar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def registrar_custo(self, custo: float):
+        with self._lock:
+            self.custos.append(custo)
+
+
+_contadores = _Contadores()
+
+
+def metricas_guardas_sql() -> dict:
+    with _contadores._lock:
+        custos = sorted(_contadores.custos)
+
+    def pct(p: float):
+        return round(custos[min(len(custos) - 1, int(p * len(custos)))], 1) if custos else None
+
+    return {
+        "executadas": _contadores.executadas,
+        "reescritas": _contadores.reescritas,
+        "rejeitadas": _contadores.rejeitadas,
+        "timeouts": _contadores.timeouts,
+        "truncadas": _contadores.truncadas,
+        "erros": _contadores.erros,
+        "custo_p50": pct(0.5),
+        "custo_p95": pct(0.95),
+        "custo_max": round(custos[-1], 1) if custos else None,
+        "limites": {
+            "statement_timeout_ms": SQL_STATEMENT_TIMEOUT_MS,
+            "max_custo": SQL_MAX_CUSTO,
+            "max_linhas_estimadas": SQL_MAX_LINHAS_ESTIMADAS,
+            "max_linhas": SQL_MAX_LINHAS,
+        },
+    }
+
+
+# ================================================================
+# 🛡️ TRANSAÇÃO PROTEGIDA + VERIFICAÇÃO DO PLANO
+# ================================================================
+# primeiro comando da transação: somente leitura + tempo máximo
+# (SET LOCAL vale só até o fim desta transação — a conexão volta
+# limpa para o pool)
+SQL_SOMENTE_LEITURA = text("SET TRANSACTION READ ONLY")
+SQL_TIMEOUT = text(f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}")
+
+
+def _um_comando(sql: str) -> str:
+    # com vários comandos o psycopg2 roda todos (até dentro do EXPLAIN):
+    # um "; COMMIT; ..." encerraria a transação somente leitura
+    sql = sql.strip().rstrip(";").strip()
+    if ";" in sql:
+        _contadores.contar("rejeitadas")
+        raise SQLRejeitada("Consulta rejeitada: só é aceito um comando (sem ';')")
+    return sql
+
+
+def _limitar(sql: str) -> str:
+    return f"SELECT * FROM (\n{sql}\n) AS consulta_limitada LIMIT {SQL_MAX_LINHAS + 1}"
+
+
+def _estimativa(plano_json) -> tuple[float, float]:
+    plano = plano_json if isinstance(plano_json, list) else json.loads(plano_json)
+    raiz = plano[0]["Plan"]
+    return float(raiz["Total Cost"]), float(raiz["Plan Rows"])
+
+
+def _acima_dos_limites(custo: float, linhas: float) -> bool:
+    return custo > SQL_MAX_CUSTO or linhas > SQL_MAX_LINHAS_ESTIMADAS
+
+
+def _rejeitar(custo: float, linhas: float):
+    _contadores.contar("rejeitadas")
+    raise SQLRejeitada(
+        f"Consulta rejeitada: custo estimado {custo:.0f} (máx {SQL_MAX_CUSTO:.0f}), "
+        f"~{linhas:.0f} linhas (máx {SQL_MAX_LINHAS_ESTIMADAS})"
+    )
+
+
+def _foi_timeout(e: DBAPIError) -> bool:
+    orig = getattr(e, "orig", None)
+    return SQLSTATE_CANCELADA in (getattr(orig, "pgcode", None), getattr(orig, "sqlstate", None))
+
+
+def _resultado(sql: str, rows: list, colunas: list[str], custo: float | None, reescrita: bool) -> tuple[list, dict]:
+    truncado = len(rows) > SQL_MAX_LINHAS
+    if truncado:
+        _contadores.contar("truncadas")
+        rows = rows[:SQL_MAX_LINHAS]
+
+    _contadores.contar("executadas")
+    return [tuple(r) for r in rows], {
+        "sql": sql,             # a que rodou (com o LIMIT, se reescrita)
+        "colunas": colunas,
+        "custo": custo,
+        "reescrita": reescrita,
+        "truncado": truncado,
+    }
+
+
+def executar_sql_protegida(sql: str, params: dict | None = None, verificar_plano: bool = True) -> tuple[list, dict]:
+    """
+    Executa `sql` no PDV numa transação somente leitura com
+    statement_timeout. Com `verificar_plano`, roda EXPLAIN antes: se a
+    estimativa passa dos limites, mede de novo com LIMIT por fora (o
+    planner pode trocar por um plano que para cedo) e só recusa
+    (SQLRejeitada) se o custo continuar alto. Mais de um comando
+    também é recusado (SQLRejeitada), antes de qualquer EXPLAIN.
+    Lê no máximo SQL_MAX_LINHAS (cursor no servidor + fetchmany).
+
+    Retorna (rows, {"sql", "colunas", "custo", "reescrita", "truncado"}).
+    """
+    sql = _um_comando(sql)
+    params = params or {}
+    custo, reescrita = None, False
+
+    try:
+        with engine_pdv.connect() as conn:
+            with conn.begin():
+                conn.execute(SQL_SOMENTE_LEITURA)
+                conn.execute(SQL_TIMEOUT)
+
+                if verificar_plano:
+                    custo, linhas = _estimativa(
+                        conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+                    )
+
+                    if _acima_dos_limites(custo, linhas):
+                        sql = _limitar(sql)
+                        custo, linhas = _estimativa(
+                            conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+                        )
+                        if custo > SQL_MAX_CUSTO:
+                            _rejeitar(custo, linhas)
+
+                        reescrita = True
+                        _contadores.contar("reescritas")
+                        log_warn(f"Estimativa alta — executando com LIMIT (custo {custo:.0f}).")
+
+                    _contadores.registrar_custo(custo)
+
+                result = conn.execution_options(stream_results=True).execute(text(sql), params)
+                colunas = list(result.keys())
+                rows = result.fetchmany(SQL_MAX_LINHAS + 1)
+                result.close()
+
+        return _resultado(sql, rows, colunas, custo, reescrita)
+
+    except DBAPIError as e:
+        _contadores.contar("timeouts" if _foi_timeout(e) else "erros")
+        raise
+
+
+async def executar_sql_protegida_async(sql: str, params: dict | None = None, verificar_plano: bool = True) -> tuple[list, dict]:
+    sql = _um_comando(sql)
+    params = params or {}
+    custo, reescrita = None, False
+
+    try:
+        async with engine_pdv_async.connect() as conn:
+            async with conn.begin():
+                await conn.execute(SQL_SOMENTE_LEITURA)
+                await conn.execute(SQL_TIMEOUT)
+
+                if verificar_plano:
+                    custo, linhas = _estimativa(
+                        (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params)).scalar()
+                    )
+
+                    if _acima_dos_limites(custo, linhas):
+                        sql = _limitar(sql)
+                        custo, linhas = _estimativa(
+                            (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params)).scalar()
+                        )
+                        if custo > SQL_MAX_CUSTO:
+                            _rejeitar(custo, linhas)
+
+                        reescrita = True
+                        _contadores.contar("reescritas")
+                        log_warn(f"Estimativa alta — executando com LIMIT (custo {custo:.0f}).")
+
+                    _contadores.registrar_custo(custo)
+
+                result = await conn.stream(text(sql), params)
+                colunas = list(result.keys())
+                rows = await result.fetchmany(SQL_MAX_LINHAS + 1)
+                await result.close()
+
+        return _resultado(sql, rows, colunas, custo, reescrita)
+
+    except DBAPIError as e:
+        _contadores.contar("timeouts" if _foi_timeout(e) else "erros")
+        raise
@@ -0,0 +1,314 @@
+# app/modules/assistente/kernel/indice_produtos.py
+
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import func, literal_column, select, text
+
+from app.core.codec_vetores import matriz_float32
+from app.core.database_ia import engine_ia
+from app.modules.assistente.models.model import ProdutoIA
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[INDICE-PRODUTOS][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[INDICE-PRODUTOS][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[INDICE-PRODUTOS][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[INDICE-PRODUTOS][ERRO]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+INDICE_PRODUTOS_ATIVO = os.getenv("INDICE_PRODUTOS_ATIVO", "1") == "1"
+
+# diretório compartilhado pelos workers do uvicorn (mesma máquina)
+INDICE_PRODUTOS_DIR = os.getenv(
+    "INDICE_PRODUTOS_DIR",
+    os.path.join(tempfile.gettempdir(), "pdv_assistente_indice"),
+)
+
+# de quanto em quanto tempo cada worker confere se há versão nova
+INDICE_PRODUTOS_VERIFICAR_SEGUNDOS = float(os.getenv("INDICE_PRODUTOS_VERIFICAR_SEGUNDOS", "2"))
+
+# Advisory lock no banco IA: um worker reconstrói por vez
+LOCK_INDICE_PRODUTOS = 7_231_003
+
+ARQUIVO_ATUAL = "atual.json"
+
+# mesmos campos (e score) da consulta em produtos_ia:
+# score = 1 - (embedding <#> q) = 1 + produto interno
+ProdutoSimilar = namedtuple("ProdutoSimilar", "id nome descricao preco score motivo")
+
+
+# ================================================================
+# 🏗️ CONSTRUÇÃO (após o sync — um worker grava, todos leem)
+#
+# Arquivos de uma versão, no INDICE_PRODUTOS_DIR:
+#   produtos-<versao>.npy       matriz float32 (N × dim), via mmap
+#   produtos-<versao>-ids.npy   id de cada linha
+#   produtos-<versao>.json      nome/descrição/preço de cada linha
+# e atual.json aponta para a versão publicada (troca atômica com
+# os.replace — quem está lendo a versão anterior não é afetado).
+# ================================================================
+def _caminho(nome: str) -> str:
+    return os.path.join(INDICE_PRODUTOS_DIR, nome)
+
+
+def _gravar_json(nome: str, dados: dict):
+    tmp = _caminho(f".{nome}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+    os.replace(tmp, _caminho(nome))
+
+
+def _limpar_versoes_antigas(manter: set[str]):
+    for nome in os.listdir(INDICE_PRODUTOS_DIR):
+        if nome.startswith("produtos-") and nome.split(".")[0].replace("-ids", "") not in manter:
+            try:
+                os.remove(_caminho(nome))
+            except OSError:
+                pass    # ainda aberto por outro processo (Windows)
+
+
+def construir_indice_produtos() -> dict | None:
+    """
+    Lê produtos_ia (com embedding) numa única transação e publica uma
+    versão nova. Retorna o atual.json publicado, ou None se outro
+    processo já está construindo.
+    """
+    os.makedirs(INDICE_PRODUTOS_DIR, exist_ok=True)
+    t = ProdutoIA.__table__
+    dim = ProdutoIA.embedding.type.dim
+    inicio = time.perf_counter()
+
+    with engine_ia.connect() as lock_conn:
+        obtido = lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:k)"), {"k": LOCK_INDICE_PRODUTOS}
+        ).scalar()
+        lock_conn.commit()
+
+        if not obtido:
+            log_warn("Índice de produtos já em construção em outro processo.")
+            return None
+
+        try:
+            anterior = _ler_atual()
+            versao = f"{time.time_ns()}-{os.getpid()}"
+
+            with engine_ia.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+                n = conn.execute(
+                    select(func.count()).select_from(t).where(t.c.embedding.is_not(None))
+                ).scalar()
+
+                if not n:
+                    log_warn("produtos_ia sem embeddings — índice não publicado.")
+                    return None
+
+                matriz = np.lib.format.open_memmap(
+                    _caminho(f"produtos-{versao}.npy"), mode="w+", dtype=np.float32, shape=(n, dim)
+                )
+                ids = np.empty(n, dtype=np.int64)
+                meta = {"nome": [], "descricao": [], "preco": []}
+
+                # coluna crua (sem o result_processor do tipo Vector, que
+                # converteria cada vetor em lista de floats)
+                result = conn.execution_options(stream_results=True, yield_per=2000).execute(
+                    select(t.c.id, t.c.nome, t.c.descricao, t.c.preco, literal_column("embedding"))
+                    .where(t.c.embedding.is_not(None))
+                    .order_by(t.c.id)
+                )
+                i = 0
+                for parte in result.partitions():
+                    matriz[i:i + len(parte)] = matriz_float32(r.embedding for r in parte)
+                    for r in parte:
+                        ids[i] = r.id
+                        meta["nome"].append(r.nome)
+                        meta["descricao"].append(r.descricao)
+                        meta["preco"].append(None if r.preco is None else str(r.preco))
+                        i += 1
+
+            matriz.flush()
+            del matriz
+            np.save(_caminho(f"produtos-{versao}-ids.npy"), ids)
+            _gravar_json(f"produtos-{versao}.json", meta)
+
+            atual = {"versao": versao, "linhas": int(n), "dim": dim, "criado_em": time.time()}
+            _gravar_json(ARQUIVO_ATUAL, atual)
+
+            # a versão anterior fica até a próxima troca (workers que
+            # ainda não recarregaram continuam lendo dela)
+            _limpar_versoes_antigas({f"produtos-{versao}"} | (
+                {f"produtos-{anterior['versao']}"} if anterior else set()
+            ))
+
+            log_success(
+                f"Índice de produtos publicado: {n} vetores × {dim} "
+                f"em {time.perf_counter() - inicio:.1f}s (versão {versao})."
+            )
+            return atual
+
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_INDICE_PRODUTOS})
+            lock_conn.commit()
+
+
+def _ler_atual() -> dict | None:
+    try:
+        with open(_caminho(ARQUIVO_ATUAL), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ================================================================
+# 🔎 LEITURA + BUSCA EXATA (por processo)
+# ================================================================
+class _Versao:
+
+    def __init__(self, atual: dict):
+        versao = atual["versao"]
+        self.versao = versao
+        self.matriz = np.load(_caminho(f"produtos-{versao}.npy"), mmap_mode="r")
+        self.ids = np.load(_caminho(f"produtos-{versao}-ids.npy"))
+        with open(_caminho(f"produtos-{versao}.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.nomes = meta["nome"]
+        self.descricoes = meta["descricao"]
+        self.precos = [None if p is None else Decimal(p) for p in meta["preco"]]
+        self.posicoes = {int(i): p for p, i in enumerate(self.ids)}
+
+
+class IndiceProdutos:
+
+    def __init__(self):
+        self._versao: _Versao | None = None
+        self._mtime = None
+        self._ultima_verificacao = 0.0
+        self._lock = threading.Lock()
+
+        self.buscas = 0
+        self.recargas = 0
+
+    def _atual(self) -> _Versao | None:
+        """Versão carregada; recarrega se atual.json mudou (hot-swap)."""
+        agora = time.monotonic()
+        if agora - self._ultima_verificacao < INDICE_PRODUTOS_VERIFICAR_SEGUNDOS:
+            return self._versao
+
+        with self._lock:
+            self._ultima_verificacao = agora
+            try:
+                mtime = os.stat(_caminho(ARQUIVO_ATUAL)).st_mtime_ns
+            except OSError:
+                return self._versao
+
+            if mtime != self._mtime:
+                atual = _ler_atual()
+                if atual and (self._versao is None or atual["versao"] != self._versao.versao):
+                    try:
+                        self._versao = _Versao(atual)
+                        self.recargas += 1
+                        log_info(f"Índice de produtos carregado: versão {atual['versao']} ({atual['linhas']} vetores).")
+                    except Exception as e:
+                        log_warn(f"Falha ao abrir a versão {atual['versao']} do índice: {e}")
+                self._mtime = mtime
+
+        return self._versao
+
+    def disponivel(self) -> bool:
+        return INDICE_PRODUTOS_ATIVO and self._atual() is not None
+
+    def vetores(self, ids: list[int]) -> np.ndarray | None:
+        """Embeddings dos produtos (os que estão no índice), ou None sem índice."""
+        v = self._atual() if INDICE_PRODUTOS_ATIVO else None
+        if v is None:
+            return None
+
+        posicoes = [v.posicoes[i] for i in ids if i in v.posicoes]
+        return np.asarray(v.matriz[sorted(posicoes)])
+
+    def buscar(self, vetor, k: int, excluir: list[int] | None = None) -> list[ProdutoSimilar] | None:
+        """
+        Top-k exato por produto interno (mesma ordem de ORDER BY
+        embedding <#> q). None = índice indisponível (use o Postgres).
+        """
+        v = self._atual() if INDICE_PRODUTOS_ATIVO else None
+        if v is None:
+            return None
+
+        self.buscas += 1
+        sims = v.matriz @ np.asarray(vetor, dtype=np.float32)
+
+        if excluir:
+            fora = [v.posicoes[i] for i in excluir if i in v.posicoes]
+            sims[fora] = -np.inf
+            k = min(k, len(sims) - len(fora))
+        else:
+            k = min(k, len(sims))
+
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+
+        return [
+            ProdutoSimilar(
+                int(v.ids[p]), v.nomes[p], v.descricoes[p], v.precos[p],
+                1.0 + float(sims[p]), "similaridade_embeddings",
+            )
+            for p in top
+        ]
+
+    def estatisticas(self) -> dict:
+        v = self._versao
+        return {
+            "ativo": INDICE_PRODUTOS_ATIVO,
+            "versao": v.versao if v else None,
+            "linhas": len(v.ids) if v else 0,
+            "buscas": self.buscas,
+            "recargas": self.recargas,
+        }
+
+
+indice_produtos = IndiceProdutos()
+
+
+# ================================================================
+# ▶️ STARTUP / PÓS-SYNC
+# ================================================================
+def _construir_em_background():
+    try:
+        construir_indice_produtos()
+    except Exception:
+        log_error("Falha ao construir o índice de produtos:")
+        print(RED + traceback.format_exc() + RESET)
+
+
+def preparar_indice_produtos():
+    """
+    Startup: usa a versão publicada se existir; senão constrói em
+    background (até lá as buscas vão para o Postgres).
+    """
+    if not INDICE_PRODUTOS_ATIVO:
+        return
+
+    if indice_produtos.disponivel():
+        return
+
+    threading.Thread(target=_construir_em_background, daemon=True, name="indice-produtos").start()
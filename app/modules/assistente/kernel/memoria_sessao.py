@@ -0,0 +1,233 @@
+# app/modules/assistente/kernel/memoria_sessao.py
+
+import os
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.openai_client import client
+from app.core.perfil_vetores import sql_vizinhos
+from app.core.tokens import estimar_tokens, truncar_para_tokens
+from app.modules.assistente.kernel.prompt_final import PROMPT_TOKENS_RAG
+from app.modules.assistente.pipeline.fila_jobs import handler_fila
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[MEMORIA][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[MEMORIA][WARN]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+# últimas mensagens da sessão que entram por extenso
+MEMORIA_TURNOS = int(os.getenv("MEMORIA_TURNOS", "6"))
+
+# mensagens acumuladas fora dos turnos recentes que disparam um novo resumo
+MEMORIA_RESUMIR_A_CADA = int(os.getenv("MEMORIA_RESUMIR_A_CADA", "6"))
+
+# lembranças de outras sessões: só dos últimos N dias
+MEMORIA_JANELA_DIAS = int(os.getenv("MEMORIA_JANELA_DIAS", "30"))
+
+MEMORIA_TOKENS_RESUMO = int(os.getenv("MEMORIA_TOKENS_RESUMO", "250"))
+MEMORIA_TOKENS_POR_MENSAGEM = int(os.getenv("MEMORIA_TOKENS_POR_MENSAGEM", "150"))
+
+# teto de mensagens novas por rodada de resumo (o resto fica para a próxima)
+MEMORIA_RESUMO_MAX_MENSAGENS = int(os.getenv("MEMORIA_RESUMO_MAX_MENSAGENS", "40"))
+MEMORIA_MODELO_RESUMO = os.getenv("MEMORIA_MODELO_RESUMO", "gpt-4o-mini")
+
+SEM_CONTEXTO = "Nenhum contexto encontrado."
+
+
+# ================================================================
+# 🗄️ SQL
+# ================================================================
+# resumo + mensagens ainda não resumidas da sessão (mais novas primeiro),
+# sem a mensagem em andamento — índice (session_id, created_at)
+SQL_SESSAO = text("""
+    SELECT s.resumo, s.resumo_ate_id, m.sender, m.message
+    FROM sessoes_chat s
+    LEFT JOIN LATERAL (
+        SELECT id, sender, message, created_at
+        FROM chat_messages
+        WHERE session_id = s.session_id
+          AND id > COALESCE(s.resumo_ate_id, 0)
+          AND id <> :mid
+        ORDER BY created_at DESC, id DESC
+        LIMIT :limite
+    ) m ON TRUE
+    WHERE s.session_id = :sid
+    ORDER BY m.created_at DESC, m.id DESC
+""")
+
+
+def sql_lembrancas():
+    """
+    k mensagens parecidas do vendedor em OUTRAS sessões da janela de
+    tempo (a sessão atual já entra por turnos + resumo).
+    """
+    return sql_vizinhos(
+        "chat_messages", "message",
+        filtro=(
+            "vendedor_id = :vid"
+            " AND created_at > NOW() - make_interval(days => :dias)"
+            " AND session_id IS DISTINCT FROM :sid"
+        ),
+        score="similarity",
+    )
+
+
+def parametros_sessao(contexto) -> dict:
+    return {
+        "sid": contexto.session_id,
+        "mid": contexto.chat_message_id or 0,
+        "limite": MEMORIA_TURNOS + MEMORIA_RESUMIR_A_CADA,
+    }
+
+
+def parametros_lembrancas(vendedor_id: int, vetor, k: int, contexto=None) -> dict:
+    return {
+        "emb": vetor,
+        "vid": vendedor_id,
+        "k": k,
+        "dias": MEMORIA_JANELA_DIAS,
+        "sid": contexto.session_id if contexto is not None else None,
+    }
+
+
+# ================================================================
+# 🧱 MONTAGEM (dentro do orçamento da seção RAG)
+#
+# Prioridade: resumo (até MEMORIA_TOKENS_RESUMO) → turnos recentes,
+# do mais novo para o mais antigo → lembranças de outras sessões.
+# ================================================================
+def _caber(linhas: list[str], orcamento: int) -> tuple[list[str], int]:
+    escolhidas = []
+    for linha in linhas:
+        linha = truncar_para_tokens(linha, MEMORIA_TOKENS_POR_MENSAGEM)
+        custo = estimar_tokens(linha) + 1
+        if custo > orcamento:
+            break
+        escolhidas.append(linha)
+        orcamento -= custo
+    return escolhidas, orcamento
+
+
+def montar_memoria(rows_sessao, rows_lembrancas, orcamento: int = PROMPT_TOKENS_RAG) -> str:
+    secoes = []
+    resumo = rows_sessao[0].resumo if rows_sessao else None
+    turnos = [r for r in rows_sessao if r.message is not None][:MEMORIA_TURNOS]
+
+    if resumo:
+        resumo = truncar_para_tokens(resumo, min(MEMORIA_TOKENS_RESUMO, orcamento))
+        orcamento -= estimar_tokens(resumo) + 8
+        secoes.append(f"Resumo da conversa até aqui:\n{resumo}")
+
+    linhas, orcamento = _caber([f"- {r.sender}: {r.message}" for r in turnos], orcamento - 8)
+    if linhas:
+        secoes.append("Últimas mensagens desta conversa:\n" + "\n".join(reversed(linhas)))
+
+    linhas, _ = _caber(
+        [f"- ({round(r.similarity, 3)}) {r.message}" for r in rows_lembrancas], orcamento - 8
+    )
+    if linhas:
+        secoes.append("Conversas anteriores relacionadas:\n" + "\n".join(linhas))
+
+    return "\n\n".join(secoes) or SEM_CONTEXTO
+
+
+def job_resumo(contexto, rows_sessao) -> tuple[str, str, dict] | None:
+    """
+    Job "resumir_sessao" quando as mensagens fora dos turnos recentes
+    chegaram a MEMORIA_RESUMIR_A_CADA (a consulta veio cheia). A chave
+    inclui o ponto do resumo atual: um job por rodada.
+    """
+    if len(rows_sessao) < MEMORIA_TURNOS + MEMORIA_RESUMIR_A_CADA:
+        return None
+
+    ate = rows_sessao[0].resumo_ate_id or 0
+    return (
+        "resumir_sessao",
+        f"resumir_sessao:{contexto.session_id}:{ate}",
+        {"session_id": contexto.session_id},
+    )
+
+
+# ================================================================
+# 📝 RESUMO ACUMULADO (fila_jobs_ia — fora do caminho da resposta)
+# ================================================================
+SQL_ESTADO_RESUMO = text("""
+    SELECT resumo, resumo_ate_id FROM sessoes_chat WHERE session_id = :sid
+""")
+
+SQL_MENSAGENS_A_RESUMIR = text("""
+    SELECT id, sender, message
+    FROM chat_messages
+    WHERE session_id = :sid
+      AND id > COALESCE(:ate, 0)
+    ORDER BY created_at, id
+""")
+
+# só grava se ninguém resumiu a sessão enquanto o LLM respondia
+SQL_GRAVAR_RESUMO = text("""
+    UPDATE sessoes_chat
+    SET resumo = :resumo, resumo_ate_id = :novo_ate, resumo_em = NOW()
+    WHERE session_id = :sid
+      AND resumo_ate_id IS NOT DISTINCT FROM :ate
+""")
+
+INSTRUCOES_RESUMO = """Você mantém a memória de uma conversa entre um vendedor de PDV e o
+assistente. Atualize o resumo com as mensagens novas: clientes, produtos,
+valores, pedidos, preferências e pendências citados. Descarte
+cumprimentos e repetições. Escreva em português, em tópicos curtos,
+com no máximo {palavras} palavras. Responda só com o resumo."""
+
+
+@handler_fila("resumir_sessao")
+def _job_resumir_sessao(db_ia: Session, payload: dict):
+    sid = payload["session_id"]
+
+    estado = db_ia.execute(SQL_ESTADO_RESUMO, {"sid": sid}).fetchone()
+    if estado is None:
+        return
+
+    mensagens = db_ia.execute(SQL_MENSAGENS_A_RESUMIR, {"sid": sid, "ate": estado.resumo_ate_id}).fetchall()
+
+    # os turnos recentes continuam por extenso no prompt
+    mensagens = mensagens[:len(mensagens) - MEMORIA_TURNOS][:MEMORIA_RESUMO_MAX_MENSAGENS]
+    if not mensagens:
+        return
+
+    novas = "\n".join(
+        truncar_para_tokens(f"- {m.sender}: {m.message}", MEMORIA_TOKENS_POR_MENSAGEM)
+        for m in mensagens
+    )
+
+    resp = client.chat.completions.create(
+        model=MEMORIA_MODELO_RESUMO,
+        messages=[
+            {"role": "system", "content": INSTRUCOES_RESUMO.format(palavras=int(MEMORIA_TOKENS_RESUMO * 0.6))},
+            {"role": "user", "content": f"RESUMO ATUAL:\n{estado.resumo or '(vazio)'}\n\nMENSAGENS NOVAS:\n{novas}"},
+        ],
+        max_tokens=MEMORIA_TOKENS_RESUMO,
+        temperature=0,
+    )
+    resumo = truncar_para_tokens(resp.choices[0].message.content.strip(), MEMORIA_TOKENS_RESUMO)
+
+    # sem commit: o worker conclui o job no mesmo commit
+    gravado = db_ia.execute(SQL_GRAVAR_RESUMO, {
+        "sid": sid,
+        "resumo": resumo,
+        "novo_ate": mensagens[-1].id,
+        "ate": estado.resumo_ate_id,
+    }).rowcount
+
+    if gravado:
+        log_info(f"Resumo da sessão {sid} atualizado ({len(mensagens)} mensagens incorporadas).")
+    else:
+        log_warn(f"Resumo da sessão {sid} já foi atualizado por outro job — descartando.")
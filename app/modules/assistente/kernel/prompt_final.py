@@ -0,0 +1,219 @@
+# app/modules/assistente/kernel/prompt_final.py
+
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.core.tokens import estimar_tokens, truncar_para_tokens
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[PROMPT][INFO]{RESET} {msg}")
+
+
+# ================================================================
+# ORÇAMENTO DE TOKENS POR SEÇÃO (via .env)
+# ================================================================
+PROMPT_TOKENS_RAG = int(os.getenv("PROMPT_TOKENS_RAG", "1000"))
+PROMPT_TOKENS_SQL = int(os.getenv("PROMPT_TOKENS_SQL", "1500"))
+PROMPT_TOKENS_PERGUNTA = int(os.getenv("PROMPT_TOKENS_PERGUNTA", "300"))
+
+
+# ================================================================
+# 📌 INSTRUÇÕES FIXAS (mensagem de sistema — prefixo idêntico em
+# todas as requisições, reaproveitado pelo cache de prompt da OpenAI)
+# ================================================================
+INSTRUCOES_SISTEMA = """Você é um assistente especializado em vendedores de PDV.
+
+Você recebe, a cada pergunta, as seções CONTEXTO RAG (memória das
+conversas), INTENÇÃO DETECTADA, CLIENTE DETECTADO, DADOS DO SISTEMA (SQL)
+e PERGUNTA ORIGINAL.
+
+Regras:
+- Priorize sempre dados SQL.
+- Use RAG apenas como memória contextual.
+- Não invente informações.
+- Quando os dados vierem resumidos (totais, "e mais N linhas"), responda
+  com base no resumo e diga que há mais registros se for relevante.
+- Não exponha SQL, tabelas, colunas ou consultas internas.
+- Responda sempre de maneira simples, útil e objetiva."""
+
+TOKENS_SISTEMA = estimar_tokens(INSTRUCOES_SISTEMA)
+
+
+# ================================================================
+# 📉 COMPACTAÇÃO DAS LINHAS DO SQL
+# ================================================================
+def _numerica(coluna: str, valores: list) -> bool:
+    if coluna == "id" or coluna.endswith("_id") or coluna.startswith("id_"):
+        return False
+    presentes = [v for v in valores if v is not None]
+    return bool(presentes) and all(
+        isinstance(v, (int, float, Decimal)) and not isinstance(v, bool)
+        for v in presentes
+    )
+
+
+def _data(valores: list) -> bool:
+    presentes = [v for v in valores if v is not None]
+    return bool(presentes) and all(isinstance(v, (date, datetime)) for v in presentes)
+
+
+def _fmt(v) -> str:
+    if isinstance(v, float):
+        return f"{v:.2f}"
+    if isinstance(v, datetime):
+        return v.strftime("%Y-%m-%d %H:%M")
+    return str(v)
+
+
+def _linha(valores) -> str:
+    return " | ".join(_fmt(v) for v in valores)
+
+
+def resumir_linhas(colunas: list[str], rows: list) -> str:
+    """Agregados por coluna: soma/mín/máx das numéricas e período das datas."""
+    partes = []
+
+    for i, coluna in enumerate(colunas):
+        valores = [r[i] for r in rows]
+        presentes = [v for v in valores if v is not None]
+
+        if _numerica(coluna, valores):
+            partes.append(
+                f"{coluna}: soma {_fmt(sum(presentes))}, mín {_fmt(min(presentes))}, máx {_fmt(max(presentes))}"
+            )
+        elif _data(valores):
+            partes.append(f"{coluna}: de {_fmt(min(presentes))} a {_fmt(max(presentes))}")
+
+    return "; ".join(partes)
+
+
+def compactar_linhas(colunas: list[str], rows: list, max_tokens: int) -> tuple[str, int]:
+    """
+    Cabe tudo → tabela completa. Senão: resumo agregado + as primeiras
+    linhas (na ordem da consulta) que couberem + "... e mais N linhas".
+    Só trunca o texto se nem o resumo couber.
+    Retorna (texto, quantas linhas aparecem por extenso).
+    """
+    cabecalho = " | ".join(colunas) if colunas else ""
+    linhas = [_linha(r) for r in rows]
+
+    completo = "\n".join([cabecalho, *linhas]) if cabecalho else "\n".join(linhas)
+    if estimar_tokens(completo) <= max_tokens:
+        return completo, len(rows)
+
+    resumo = f"{len(rows)} linhas no total"
+    agregados = resumir_linhas(colunas, rows) if colunas else ""
+    if agregados:
+        resumo += f" — {agregados}"
+
+    # reserva para o cabeçalho, o resumo e o "e mais N linhas"
+    usados = estimar_tokens(resumo) + estimar_tokens(cabecalho) + 12
+    escolhidas = []
+
+    for linha in linhas:
+        custo = estimar_tokens(linha) + 1
+        if usados + custo > max_tokens:
+            break
+        escolhidas.append(linha)
+        usados += custo
+
+    restantes = len(linhas) - len(escolhidas)
+    texto = "\n".join(
+        [resumo]
+        + ([cabecalho] if cabecalho and escolhidas else [])
+        + escolhidas
+        + ([f"... e mais {restantes} linhas"] if restantes else [])
+    )
+
+    return truncar_para_tokens(texto, max_tokens), len(escolhidas)
+
+
+def secao_sql(sql_result: dict, max_tokens: int) -> tuple[str, str | None]:
+    """
+    Texto da seção DADOS DO SISTEMA e, se compactou, uma descrição
+    para o log ("312 linhas → 40").
+    """
+    if not sql_result.get("success"):
+        return truncar_para_tokens(f"(ERRO SQL) {sql_result.get('error')}", max_tokens), None
+
+    rows = sql_result.get("rows")
+
+    if isinstance(rows, str):
+        return truncar_para_tokens(rows, max_tokens), None
+
+    if not rows:
+        return "(nenhum dado retornado)", None
+
+    texto, mostradas = compactar_linhas(sql_result.get("colunas") or [], rows, max_tokens)
+
+    if sql_result.get("truncado"):
+        texto += f"\n(a consulta tinha mais linhas; só as primeiras {len(rows)} foram lidas)"
+
+    compactacao = f"{len(rows)} linhas → {mostradas}" if mostradas < len(rows) else None
+
+    return texto, compactacao
+
+
+# ================================================================
+# 🧱 MONTAGEM
+# ================================================================
+def montar_mensagens(contexto_rag: str, sql_result: dict, pergunta: str, contexto=None) -> list[dict]:
+    """
+    Mensagens do LLM final: instruções fixas (system) + seções variáveis
+    (user), cada uma dentro do seu orçamento. O que o RAG não usa do
+    orçamento dele passa para o SQL.
+    """
+    intent = sql_result.get("intent") if sql_result.get("success") else None
+    cliente_nome = sql_result.get("cliente_nome") if sql_result.get("success") else None
+
+    pergunta_txt = truncar_para_tokens(pergunta, PROMPT_TOKENS_PERGUNTA)
+    rag_txt = truncar_para_tokens(contexto_rag or "", PROMPT_TOKENS_RAG)
+
+    tokens_rag = estimar_tokens(rag_txt)
+    sql_txt, compactacao = secao_sql(sql_result, PROMPT_TOKENS_SQL + PROMPT_TOKENS_RAG - tokens_rag)
+
+    usuario = f"""===================== CONTEXTO RAG =====================
+{rag_txt}
+
+===================== INTENÇÃO DETECTADA ==============
+{intent}
+
+===================== CLIENTE DETECTADO ===============
+{cliente_nome}
+
+===================== DADOS DO SISTEMA (SQL) ==========
+{sql_txt}
+
+===================== PERGUNTA ORIGINAL ===============
+{pergunta_txt}"""
+
+    tokens = {
+        "sistema": TOKENS_SISTEMA,
+        "rag": tokens_rag,
+        "sql": estimar_tokens(sql_txt),
+        "pergunta": estimar_tokens(pergunta_txt),
+    }
+    tokens["total"] = TOKENS_SISTEMA + estimar_tokens(usuario)
+
+    log_info(
+        "Tokens por seção: "
+        + ", ".join(f"{k}={v}" for k, v in tokens.items())
+        + (f" | SQL compactado: {compactacao}" if compactacao else "")
+    )
+
+    if contexto is not None:
+        contexto.tokens_prompt = tokens
+
+    return [
+        {"role": "system", "content": INSTRUCOES_SISTEMA},
+        {"role": "user", "content": usuario},
+    ]
@@ -7,6 +7,10 @@ import traceback
 
 # IMPORTAÇÃO CORRETA
 from app.core.database_pdv import SessionPDV
+from app.core.busca_vetorial import ajustar_busca_vetorial
+from app.core.codec_vetores import matriz_float32, vetor_float32
+from app.core.perfil_vetores import sql_vizinhos
+from app.modules.assistente.kernel.indice_produtos import indice_produtos
 
 
 # ==================================================================
@@ -83,21 +87,30 @@ def recomendar_produtos_hibrido(db_ia: Session, cliente_id: int | None, limite:
             # ===============================================================
             # 3) Embeddings do IA
             # ===============================================================
-            log_info("Buscando embeddings no IA...")
-
-            try:
-                produtos_emb = db_ia.execute(text("""
-                    SELECT id, embedding
-                    FROM produtos_ia
-                    WHERE id = ANY(:lista)
-                """), {"lista": produtos_comprados}).fetchall()
-
-            except Exception:
-                log_error("Erro ao buscar embeddings.")
-                print(RED + traceback.format_exc() + RESET)
-                return recomendar_populares(db_pdv, limite)
-
-            if not produtos_emb:
+            vetores_comprados = indice_produtos.vetores(produtos_comprados)
+
+            if vetores_comprados is not None:
+                log_info("Embeddings lidos do índice local de produtos.")
+                embeddings = vetores_comprados
+            else:
+                log_info("Buscando embeddings no IA...")
+
+                try:
+                    produtos_emb = db_ia.execute(text("""
+                        SELECT id, embedding
+                        FROM produtos_ia
+                        WHERE id = ANY(:lista)
+                          AND embedding IS NOT NULL
+                    """), {"lista": produtos_comprados}).fetchall()
+
+                except Exception:
+                    log_error("Erro ao buscar embeddings.")
+                    print(RED + traceback.format_exc() + RESET)
+                    return recomendar_populares(db_pdv, limite)
+
+                embeddings = matriz_float32(p.embedding for p in produtos_emb)
+
+            if not len(embeddings):
                 log_warn("Nenhum embedding → fallback.")
                 return recomendar_populares(db_pdv, limite)
 
@@ -105,12 +118,7 @@ def recomendar_produtos_hibrido(db_ia: Session, cliente_id: int | None, limite:
             # 4) Embedding médio
             # ===============================================================
             try:
-                vetor_medio = np.mean([np.array(p.embedding) for p in produtos_emb], axis=0)
-                norma = np.linalg.norm(vetor_medio)
-                if norma:
-                    vetor_medio = vetor_medio / norma
-
-                vetor_literal = "[" + ",".join(f"{x:.6f}" for x in vetor_medio.tolist()) + "]"
+                vetor_medio = vetor_float32(np.mean(embeddings, axis=0), normalizar=True)
                 log_success("Embedding médio calculado.")
 
             except Exception:
@@ -121,27 +129,29 @@ def recomendar_produtos_hibrido(db_ia: Session, cliente_id: int | None, limite:
             # ===============================================================
             # 5) Similaridade
             # ===============================================================
-            log_info("Consultando similaridade via pgvector...")
-
-            try:
-                similares = db_ia.execute(text("""
-                    SELECT id, nome, descricao, preco,
-                           (1 - (embedding <#> :emb)) AS score,
-                           'similaridade_embeddings' AS motivo -- Adiciona o motivo para consistência
-                    FROM produtos_ia
-                    WHERE id != ALL(:comprados)  -- 🟢 CORREÇÃO 2: Uso de != ALL() para listas (SQL NOT IN fix)
-                    ORDER BY embedding <#> :emb
-                    LIMIT :limite
-                """), {
-                    "emb": vetor_literal,
-                    "comprados": produtos_comprados, # Passa a lista diretamente (sem tuple())
-                    "limite": limite
-                }).fetchall()
-
-            except Exception:
-                log_error("Erro ao buscar similares.")
-                print(RED + traceback.format_exc() + RESET)
-                similares = []
+            # índice em memória (mmap) primeiro; sem ele, pgvector
+            similares = indice_produtos.buscar(vetor_medio, limite, excluir=produtos_comprados)
+
+            if similares is None:
+                log_info("Consultando similaridade via pgvector...")
+
+                try:
+                    ajustar_busca_vetorial(db_ia, "produtos")
+                    # != ALL() para listas (NOT IN com lista não funciona)
+                    similares = db_ia.execute(sql_vizinhos(
+                        "produtos_ia", "id, nome, descricao, preco",
+                        filtro="id != ALL(:comprados)",
+                        extras=", 'similaridade_embeddings' AS motivo",
+                    ), {
+                        "emb": vetor_medio,
+                        "comprados": produtos_comprados, # Passa a lista diretamente (sem tuple())
+                        "k": limite
+                    }).fetchall()
+
+                except Exception:
+                    log_error("Erro ao buscar similares.")
+                    print(RED + traceback.format_exc() + RESET)
+                    similares = []
 
             if similares:
                 log_success(f"{len(similares)} produtos semelhantes retornados.")
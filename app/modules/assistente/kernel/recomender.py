@@ -1,9 +1,13 @@
 # app/modules/assistente/kernel/recomender.py
 
-import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.core.busca_vetorial import ajustar_busca_vetorial
+from app.core.codec_vetores import vetor_float32
+from app.core.perfil_vetores import sql_vizinhos
+from app.modules.assistente.kernel.indice_produtos import indice_produtos
+
 # ================================================================
 # ANSI LOG
 # ================================================================
@@ -30,24 +34,19 @@ def recomendar_por_embedding(db_ia: Session, embedding_vector, limite=5):
         return []
 
     try:
-        vetor = np.array(embedding_vector, dtype=float)
-        norma = np.linalg.norm(vetor)
-
-        if norma > 0:
-            vetor = vetor / norma
+        vetor = vetor_float32(embedding_vector, normalizar=True)
 
-        literal = "[" + ",".join(f"{x:.6f}" for x in vetor.tolist()) + "]"
+        # índice em memória (mmap) — sem ir ao banco
+        resultados = indice_produtos.buscar(vetor, limite)
+        if resultados is not None:
+            log_success(f"{len(resultados)} produtos recomendados (índice local).")
+            return resultados
 
         log_info("Consultando pgvector...")
+        ajustar_busca_vetorial(db_ia, "produtos")
         resultados = db_ia.execute(
-            text("""
-                SELECT id, nome, descricao, preco,
-                       (1 - (embedding <#> :emb)) AS score
-                FROM produtos_ia
-                ORDER BY embedding <#> :emb
-                LIMIT :k
-            """),
-            {"emb": literal, "k": limite}
+            sql_vizinhos("produtos_ia", "id, nome, descricao, preco"),
+            {"emb": vetor, "k": limite}
         ).fetchall()
 
         log_success(f"{len(resultados)} produtos recomendados.")
@@ -70,13 +69,7 @@ def recomendar_clientes_parecidos(db_ia: Session, embedding_vector, limite=5):
         return []
 
     try:
-        vetor = np.array(embedding_vector, dtype=float)
-        norma = np.linalg.norm(vetor)
-
-        if norma > 0:
-            vetor = vetor / norma
-
-        literal = "[" + ",".join(f"{x:.6f}" for x in vetor.tolist()) + "]"
+        vetor = vetor_float32(embedding_vector, normalizar=True)
 
         resultados = db_ia.execute(
             text("""
@@ -86,7 +79,7 @@ def recomendar_clientes_parecidos(db_ia: Session, embedding_vector, limite=5):
                 ORDER BY embedding <#> :emb
                 LIMIT :k
             """),
-            {"emb": literal, "k": limite}
+            {"emb": vetor, "k": limite}
         ).fetchall()
 
         log_success(f"{len(resultados)} clientes semelhantes encontrados.")
@@ -0,0 +1,348 @@
+# app/modules/assistente/kernel/roteador_intencao.py
+
+import os
+import re
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from app.core.openai_client import gerar_embeddings_lote
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[ROTEADOR][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[ROTEADOR][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[ROTEADOR][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[ROTEADOR][ERRO]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+ROTEADOR_ATIVO = os.getenv("ROTEADOR_INTENCAO_ATIVO", "1") == "1"
+
+# similaridade (cosseno) mínima com o centróide vencedor e distância
+# mínima para o segundo colocado — abaixo disso, decide o LLM
+ROTEADOR_MIN_SIMILARIDADE = float(os.getenv("ROTEADOR_MIN_SIMILARIDADE", "0.45"))
+ROTEADOR_MIN_MARGEM = float(os.getenv("ROTEADOR_MIN_MARGEM", "0.04"))
+
+# intenção que dispensa o SQL (saudação, pergunta geral) precisa de mais
+# margem: mandar uma pergunta sobre dados para lá perde a consulta ao PDV
+ROTEADOR_MIN_MARGEM_SEM_SQL = float(os.getenv("ROTEADOR_MIN_MARGEM_SEM_SQL", "0.08"))
+
+
+# ================================================================
+# 🧭 INTENÇÕES E ETAPAS DO PIPELINE QUE CADA UMA PRECISA
+# ================================================================
+INTENCOES_SQL = [
+    "dados_cliente",
+    "compras_cliente",
+    "endereco_cliente",
+    "telefones_cliente",
+    "produtos_cliente",
+    "status_pedido",
+    "dados_loja",          # números da loja inteira: vendas, mais vendidos, estoque
+]
+
+ETAPAS = {
+    **{i: {"rag", "sql"} for i in INTENCOES_SQL},
+    "saudacao": set(),            # só o LLM final
+    "pergunta_geral": {"rag"},    # memória da conversa, sem consulta ao PDV
+}
+
+# baixa confiança → pipeline completo; o agente SQL classifica via LLM
+ETAPAS_COMPLETAS = {"rag", "sql"}
+
+
+# ================================================================
+# 📏 REGRAS POR PALAVRA-CHAVE (alta precisão; só decidem sozinhas
+# quando exatamente uma intenção casa)
+# ================================================================
+REGRA_SAUDACAO = re.compile(
+    r"^\s*(oi+|ol[aá]|opa|bom dia|boa tarde|boa noite|e a[ií]|tudo bem|tudo bom|"
+    r"obrigad[oa]|valeu|at[eé] mais|tchau)([\s,!.?]+(tudo bem|tudo bom|obrigad[oa]|"
+    r"pessoal|assistente))*[\s,!.?]*$",
+    re.IGNORECASE
+)
+
+REGRAS = [
+    ("status_pedido", re.compile(
+        r"\bpedido\s*(n[º°o.]?\s*|#\s*)?\d+|\bstatus do pedido\b|\bsitua[cç][aã]o do pedido\b|"
+        r"\bpedido\b.*\b(entregue|enviado|saiu|chegou|cancelado|pendente)\b",
+        re.IGNORECASE
+    )),
+    ("telefones_cliente", re.compile(
+        r"\b(telefones?|celular(es)?|whats(app)?|n[uú]mero de contato)\b",
+        re.IGNORECASE
+    )),
+    ("endereco_cliente", re.compile(
+        r"\b(endere[cç]os?|onde .{0,20}\bmora\b|\bcep\b)",
+        re.IGNORECASE
+    )),
+    ("produtos_cliente", re.compile(
+        r"\b(quais|que) produtos\b|\bprodutos?\b.{0,30}\b(comprou|compra|costuma|leva|levou)\b",
+        re.IGNORECASE
+    )),
+    ("compras_cliente", re.compile(
+        r"\b(compras|hist[oó]rico de compras?|[uú]ltim[oa]s? compras?|quanto .{0,20}gastou)\b",
+        re.IGNORECASE
+    )),
+    ("dados_cliente", re.compile(
+        r"\b(cpf|e-?mail|cadastro|dados d[oae]s?)\b",
+        re.IGNORECASE
+    )),
+    ("dados_loja", re.compile(
+        r"\b(quanto (a loja |n[oó]s )?(vendemos|vendeu|faturamos|faturou)|faturamento|"
+        r"(mais|menos) vendid[oa]s?|ticket m[eé]dio|total de vendas|estoque|"
+        r"vendas (de |d[oa] )?(hoje|ontem|semana|m[eê]s|ano))\b",
+        re.IGNORECASE
+    )),
+]
+
+
+# ================================================================
+# 🎯 EXEMPLOS ROTULADOS → CENTRÓIDES
+# (não repetir aqui perguntas do conjunto de avaliação em benchmarks/)
+# ================================================================
+EXEMPLOS = {
+    "dados_cliente": [
+        "mostre os dados do cliente João Silva",
+        "qual o cpf da cliente Maria",
+        "informações cadastrais do cliente Pedro",
+        "me passa o email do cliente Carlos",
+        "quem é o cliente Roberto Souza",
+    ],
+    "compras_cliente": [
+        "quais foram as compras da Ana Paula",
+        "histórico de compras do cliente José",
+        "quanto o cliente Marcos já gastou com a gente",
+        "quando foi a última compra da Fernanda",
+        "o cliente Lucas comprou alguma coisa esse mês",
+    ],
+    "endereco_cliente": [
+        "qual o endereço do cliente Paulo",
+        "onde mora a cliente Juliana",
+        "me fala a rua e o bairro do cliente André",
+        "endereço de entrega da Camila",
+    ],
+    "telefones_cliente": [
+        "qual o telefone do cliente Ricardo",
+        "me passa o celular da Patrícia",
+        "tem o whatsapp do cliente Fábio",
+        "número para ligar para a cliente Beatriz",
+    ],
+    "produtos_cliente": [
+        "quais produtos o cliente Rafael costuma comprar",
+        "que produtos a Luciana levou",
+        "produtos preferidos do cliente Gustavo",
+        "o que a cliente Renata mais compra",
+    ],
+    "status_pedido": [
+        "qual o status do pedido 1234",
+        "o pedido 5520 já foi entregue",
+        "situação do pedido da cliente Aline",
+        "o pedido do Thiago saiu para entrega",
+    ],
+    "dados_loja": [
+        "quanto a loja vendeu no mês passado",
+        "total de vendas de ontem",
+        "top 5 produtos mais vendidos da semana",
+        "quantos pedidos entraram hoje",
+        "qual o faturamento do ano",
+        "quantos clientes novos cadastramos este mês",
+    ],
+    "saudacao": [
+        "bom dia",
+        "olá, tudo bem?",
+        "boa tarde pessoal",
+        "obrigado pela ajuda",
+        "oi assistente",
+    ],
+    "pergunta_geral": [
+        "como posso melhorar minhas vendas",
+        "o que você consegue fazer",
+        "me dá uma dica para abordar um cliente novo",
+        "qual a diferença entre os dois produtos que comentei antes",
+        "resuma o que conversamos",
+    ],
+}
+
+
+# ================================================================
+# 📊 CONTADORES (quantas chamadas de LLM o roteador evitou)
+# ================================================================
+_contadores = {"regra": 0, "centroide": 0, "llm": 0}
+_lock_contadores = threading.Lock()
+
+
+def estatisticas_roteador() -> dict:
+    with _lock_contadores:
+        total = sum(_contadores.values())
+        locais = _contadores["regra"] + _contadores["centroide"]
+        return {
+            **_contadores,
+            "total": total,
+            "taxa_local": round(locais / total, 4) if total else None,
+            "centroides_prontos": _centroides is not None,
+        }
+
+
+def _contar(fonte: str):
+    with _lock_contadores:
+        _contadores[fonte] += 1
+
+
+# ================================================================
+# 🧮 CENTRÓIDES (calculados uma vez por processo, embeddings em cache)
+# ================================================================
+_centroides: np.ndarray | None = None
+_rotulos: list[str] = []
+_lock_centroides = threading.Lock()
+
+# aquecimento em background: não segura requisições esperando a API
+_aquecendo = False
+_ultima_falha = 0.0
+ESPERA_APOS_FALHA_SEGUNDOS = 60
+
+
+def _normalizar(m: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(m, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return m / normas
+
+
+def garantir_centroides() -> bool:
+    """
+    Gera (uma vez) os centróides das intenções a partir de EXEMPLOS.
+    Os embeddings passam pelo cache persistente, então reinícios não
+    pagam de novo. Retorna False se não foi possível gerar.
+    """
+    global _centroides, _rotulos, _ultima_falha
+
+    if _centroides is not None:
+        return True
+
+    with _lock_centroides:
+        if _centroides is not None:
+            return True
+
+        try:
+            rotulos = list(EXEMPLOS)
+            textos = [t for r in rotulos for t in EXEMPLOS[r]]
+            vetores = _normalizar(np.asarray(gerar_embeddings_lote(textos), dtype=np.float32))
+
+            centroides, pos = [], 0
+            for r in rotulos:
+                n = len(EXEMPLOS[r])
+                centroides.append(vetores[pos:pos + n].mean(axis=0))
+                pos += n
+
+            _rotulos = rotulos
+            _centroides = _normalizar(np.vstack(centroides))
+            log_success(f"Centróides de {len(rotulos)} intenções prontos.")
+            return True
+
+        except Exception:
+            _ultima_falha = time.monotonic()
+            log_error("Falha ao gerar centróides — roteador usará só regras/LLM:")
+            print(RED + traceback.format_exc() + RESET)
+            return False
+
+
+def aquecer_centroides():
+    """Dispara garantir_centroides numa thread, se ainda não estão prontos."""
+    global _aquecendo
+
+    if _centroides is not None or _aquecendo:
+        return
+    if _ultima_falha and time.monotonic() - _ultima_falha < ESPERA_APOS_FALHA_SEGUNDOS:
+        return
+
+    _aquecendo = True
+
+    def rodar():
+        global _aquecendo
+        try:
+            garantir_centroides()
+        finally:
+            _aquecendo = False
+
+    threading.Thread(target=rodar, daemon=True, name="centroides-intencao").start()
+
+
+# ================================================================
+# 🚦 CLASSIFICAÇÃO
+# ================================================================
+def _por_regras(mensagem: str) -> str | None:
+    if REGRA_SAUDACAO.match(mensagem):
+        return "saudacao"
+
+    casaram = {intent for intent, regra in REGRAS if regra.search(mensagem)}
+    return casaram.pop() if len(casaram) == 1 else None
+
+
+def _por_centroide(embedding) -> tuple[str, float, float] | None:
+    if embedding is None or _centroides is None:
+        return None
+
+    v = np.asarray(embedding, dtype=np.float32)
+    norma = np.linalg.norm(v)
+    if not norma:
+        return None
+
+    sims = _centroides @ (v / norma)
+    ordem = np.argsort(sims)[::-1]
+    melhor, segundo = float(sims[ordem[0]]), float(sims[ordem[1]])
+    return _rotulos[ordem[0]], melhor, melhor - segundo
+
+
+def classificar_intencao(mensagem: str, embedding=None) -> dict:
+    """
+    Decide a intenção e as etapas do pipeline sem chamar o LLM:
+      1. regras por palavra-chave
+      2. centróide mais próximo (embedding da mensagem já calculado)
+      3. confiança baixa (ou margem curta para uma intenção sem SQL)
+         → intent=None, pipeline completo (o agente
+         SQL classifica via LLM, como antes)
+    Retorna {"intent", "fonte", "confianca", "etapas"}.
+    """
+    if not ROTEADOR_ATIVO:
+        return {"intent": None, "fonte": "llm", "confianca": 0.0, "etapas": set(ETAPAS_COMPLETAS)}
+
+    if _centroides is None:
+        aquecer_centroides()
+
+    intent = _por_regras(mensagem)
+    if intent:
+        _contar("regra")
+        return {"intent": intent, "fonte": "regra", "confianca": 1.0, "etapas": set(ETAPAS[intent])}
+
+    resultado = _por_centroide(embedding)
+    if resultado:
+        intent, similaridade, margem = resultado
+        margem_minima = ROTEADOR_MIN_MARGEM if "sql" in ETAPAS[intent] else ROTEADOR_MIN_MARGEM_SEM_SQL
+        if similaridade >= ROTEADOR_MIN_SIMILARIDADE and margem >= margem_minima:
+            _contar("centroide")
+            return {
+                "intent": intent,
+                "fonte": "centroide",
+                "confianca": round(similaridade, 4),
+                "etapas": set(ETAPAS[intent]),
+            }
+
+    _contar("llm")
+    return {
+        "intent": None,
+        "fonte": "llm",
+        "confianca": round(resultado[1], 4) if resultado else 0.0,
+        "etapas": set(ETAPAS_COMPLETAS),
+    }
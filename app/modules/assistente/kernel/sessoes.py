@@ -0,0 +1,213 @@
+# app/modules/assistente/kernel/sessoes.py
+
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[SESSOES][INFO]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+# sem mensagens por esse tempo → a próxima abre uma sessão nova
+SESSAO_INATIVIDADE_MINUTOS = float(os.getenv("SESSAO_INATIVIDADE_MINUTOS", "30"))
+
+# de quanto em quanto tempo a atividade vai para o banco (entre uma
+# gravação e outra a sessão é resolvida só pelo cache)
+SESSAO_GRAVAR_ATIVIDADE_SEGUNDOS = float(os.getenv("SESSAO_GRAVAR_ATIVIDADE_SEGUNDOS", "60"))
+
+SESSAO_CACHE_MAX = int(os.getenv("SESSAO_CACHE_MAX", "10000"))
+
+# Advisory lock (de transação) por vendedor: dois workers não abrem
+# duas sessões para a mesma conversa
+LOCK_SESSOES = 7_231_005
+
+INATIVIDADE_SEGUNDOS = SESSAO_INATIVIDADE_MINUTOS * 60
+
+
+# ================================================================
+# 🗄️ SQL (tabela sessoes_chat — migração 0007)
+# ================================================================
+SQL_LOCK_VENDEDOR = text("SELECT pg_advisory_xact_lock(:k, :v)")
+
+# sessão ativa mais recente do vendedor, já marcando a atividade
+SQL_RETOMAR = text("""
+    UPDATE sessoes_chat
+    SET ultima_atividade = NOW()
+    WHERE session_id = (
+        SELECT session_id
+        FROM sessoes_chat
+        WHERE vendedor_id = :v
+          AND ultima_atividade > NOW() - make_interval(secs => :inatividade)
+        ORDER BY ultima_atividade DESC
+        LIMIT 1
+    )
+    RETURNING session_id
+""")
+
+SQL_CRIAR = text("""
+    INSERT INTO sessoes_chat (session_id, vendedor_id)
+    VALUES (:s, :v)
+""")
+
+SQL_GRAVAR_ATIVIDADE = text("""
+    UPDATE sessoes_chat
+    SET ultima_atividade = NOW()
+    WHERE session_id = :s
+""")
+
+
+# ================================================================
+# 💾 CACHE (em memória, por vendedor)
+#
+# Caminho normal: a sessão do vendedor está no cache e teve atividade
+# há menos de SESSAO_INATIVIDADE_MINUTOS → devolve sem ir ao banco.
+# Só consulta sessoes_chat quando não conhece o vendedor ou quando,
+# pelo que este processo viu, a sessão expirou (outro worker pode ter
+# mantido a conversa ativa — o banco decide se retoma ou abre outra).
+# ================================================================
+class _Sessao:
+
+    __slots__ = ("session_id", "ultima_atividade", "gravada_em")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.ultima_atividade = time.time()
+        self.gravada_em = self.ultima_atividade
+
+
+class CacheSessoes:
+
+    def __init__(self):
+        self._sessoes: dict[int, _Sessao] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.criadas = 0
+        self.retomadas = 0
+
+    def usar(self, vendedor_id: int) -> tuple[str | None, bool]:
+        """
+        (session_id ativo ou None, se a atividade precisa ir ao banco).
+        None = resolver pelo banco (resolvida()).
+        """
+        agora = time.time()
+        with self._lock:
+            s = self._sessoes.get(vendedor_id)
+            if s is None or agora - s.ultima_atividade >= INATIVIDADE_SEGUNDOS:
+                self.misses += 1
+                return None, False
+
+            self.hits += 1
+            s.ultima_atividade = agora
+            gravar = agora - s.gravada_em >= SESSAO_GRAVAR_ATIVIDADE_SEGUNDOS
+            if gravar:
+                s.gravada_em = agora
+            return s.session_id, gravar
+
+    def resolvida(self, vendedor_id: int, session_id: str, criada: bool):
+        with self._lock:
+            if len(self._sessoes) >= SESSAO_CACHE_MAX and vendedor_id not in self._sessoes:
+                self._descartar_expiradas()
+            self._sessoes[vendedor_id] = _Sessao(session_id)
+            if criada:
+                self.criadas += 1
+            else:
+                self.retomadas += 1
+
+    def _descartar_expiradas(self):
+        limite = time.time() - INATIVIDADE_SEGUNDOS
+        for vid in [v for v, s in self._sessoes.items() if s.ultima_atividade < limite]:
+            del self._sessoes[vid]
+
+    def estatisticas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "vendedores": len(self._sessoes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "criadas": self.criadas,
+            "retomadas": self.retomadas,
+            "inatividade_minutos": SESSAO_INATIVIDADE_MINUTOS,
+        }
+
+
+cache_sessoes = CacheSessoes()
+
+
+# ================================================================
+# 🧩 RESOLUÇÃO DA SESSÃO (sync / async)
+#
+# Fazem commit próprio: o lock por vendedor não fica preso enquanto
+# a requisição gera o embedding da mensagem.
+# ================================================================
+def _parametros_retomar(vendedor_id: int) -> dict:
+    # a atividade no banco pode estar até SESSAO_GRAVAR_ATIVIDADE_SEGUNDOS
+    # atrasada: com a folga, um worker nunca encerra uma sessão que outro
+    # ainda considera ativa
+    return {"v": vendedor_id, "inatividade": INATIVIDADE_SEGUNDOS + SESSAO_GRAVAR_ATIVIDADE_SEGUNDOS}
+
+
+def _nova_sessao(vendedor_id: int) -> dict:
+    novo = str(uuid.uuid4())
+    log_info(f"Nova sessão {novo} (vendedor {vendedor_id}).")
+    return {"s": novo, "v": vendedor_id}
+
+
+def resolver_sessao(db_ia: Session, vendedor_id: int) -> str:
+    """session_id da conversa atual do vendedor (abre outra após a inatividade)."""
+    session_id, gravar = cache_sessoes.usar(vendedor_id)
+
+    if session_id is not None:
+        if gravar:
+            db_ia.execute(SQL_GRAVAR_ATIVIDADE, {"s": session_id})
+            db_ia.commit()
+        return session_id
+
+    db_ia.execute(SQL_LOCK_VENDEDOR, {"k": LOCK_SESSOES, "v": vendedor_id})
+    session_id = db_ia.execute(SQL_RETOMAR, _parametros_retomar(vendedor_id)).scalar()
+    criada = session_id is None
+    if criada:
+        params = _nova_sessao(vendedor_id)
+        db_ia.execute(SQL_CRIAR, params)
+        session_id = params["s"]
+    db_ia.commit()
+
+    cache_sessoes.resolvida(vendedor_id, session_id, criada)
+    return session_id
+
+
+async def resolver_sessao_async(db_ia: AsyncSession, vendedor_id: int) -> str:
+    session_id, gravar = cache_sessoes.usar(vendedor_id)
+
+    if session_id is not None:
+        if gravar:
+            await db_ia.execute(SQL_GRAVAR_ATIVIDADE, {"s": session_id})
+            await db_ia.commit()
+        return session_id
+
+    await db_ia.execute(SQL_LOCK_VENDEDOR, {"k": LOCK_SESSOES, "v": vendedor_id})
+    session_id = (await db_ia.execute(SQL_RETOMAR, _parametros_retomar(vendedor_id))).scalar()
+    criada = session_id is None
+    if criada:
+        params = _nova_sessao(vendedor_id)
+        await db_ia.execute(SQL_CRIAR, params)
+        session_id = params["s"]
+    await db_ia.commit()
+
+    cache_sessoes.resolvida(vendedor_id, session_id, criada)
+    return session_id
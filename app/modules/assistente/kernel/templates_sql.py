@@ -0,0 +1,412 @@
+# app/modules/assistente/kernel/templates_sql.py
+
+import re
+import threading
+import time
+import traceback
+
+import xxhash
+from sqlalchemy import text
+
+from app.core.database_ia import SessionIA
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[TEMPLATES-SQL][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[TEMPLATES-SQL][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[TEMPLATES-SQL][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[TEMPLATES-SQL][ERRO]{RESET} {msg}")
+
+
+# Templates aprovados no banco IA são relidos a cada N segundos
+RECARGA_APROVADOS_SEGUNDOS = 60
+
+# intenções "pega-tudo": uma SQL fixa não responde qualquer pergunta
+# que caia nelas, então nunca viram template
+INTENCOES_GENERICAS = {"outra", "desconhecida"}
+
+
+class TemplateInvalido(Exception):
+    """A SQL revisada não pode ser aprovada como template."""
+
+
+# ================================================================
+# 📚 CATÁLOGO — consultas revisadas, parametrizadas, por intenção
+# (texto fixo + binds: o asyncpg prepara no servidor uma vez por
+# conexão e reaproveita o plano)
+#
+# Cada variante: (nome, parâmetros obrigatórios, SQL). Vale a
+# primeira variante cujos parâmetros foram extraídos da pergunta.
+# ================================================================
+CATALOGO = {
+    "dados_cliente": [
+        ("dados_cliente_por_id", {"cliente_id"}, """
+            SELECT c.id, c.nome, c.cpf, c.email, c.telefone
+            FROM cliente c
+            WHERE c.id = :cliente_id
+        """),
+        ("dados_cliente_por_nome", {"nome"}, """
+            SELECT c.id, c.nome, c.cpf, c.email, c.telefone
+            FROM cliente c
+            WHERE c.nome ILIKE :nome
+            ORDER BY c.nome
+            LIMIT 5
+        """),
+    ],
+    "compras_cliente": [
+        ("compras_cliente_por_nome", {"nome"}, """
+            SELECT c.nome, p.id AS pedido_id, p.data_pedido, p.status,
+                   SUM(i.quantidade * i.valor_venda - COALESCE(i.desconto, 0)) AS total
+            FROM cliente c
+            JOIN pedido p ON p.id_cliente = c.id
+            LEFT JOIN itens_pedido i ON i.id_pedido = p.id
+            WHERE c.nome ILIKE :nome
+            GROUP BY c.nome, p.id, p.data_pedido, p.status
+            ORDER BY p.data_pedido DESC
+            LIMIT 20
+        """),
+    ],
+    "endereco_cliente": [
+        ("endereco_cliente_por_nome", {"nome"}, """
+            SELECT c.nome, e.logradouro, c.numero, c.complemento,
+                   e.bairro, e.cidade, e.uf, e.cep
+            FROM cliente c
+            LEFT JOIN endereco e ON e.id = c.endereco_id
+            WHERE c.nome ILIKE :nome
+            ORDER BY c.nome
+            LIMIT 5
+        """),
+    ],
+    "telefones_cliente": [
+        ("telefones_cliente_por_nome", {"nome"}, """
+            SELECT c.nome, c.telefone
+            FROM cliente c
+            WHERE c.nome ILIKE :nome
+            ORDER BY c.nome
+            LIMIT 5
+        """),
+    ],
+    "produtos_cliente": [
+        ("produtos_cliente_por_nome", {"nome"}, """
+            SELECT pr.nome AS produto, SUM(i.quantidade) AS quantidade,
+                   MAX(p.data_pedido) AS ultima_compra
+            FROM cliente c
+            JOIN pedido p ON p.id_cliente = c.id
+            JOIN itens_pedido i ON i.id_pedido = p.id
+            JOIN produto pr ON pr.id = i.id_produto
+            WHERE c.nome ILIKE :nome
+            GROUP BY pr.id, pr.nome
+            ORDER BY quantidade DESC
+            LIMIT 20
+        """),
+    ],
+    "status_pedido": [
+        ("status_pedido_por_id", {"pedido_id"}, """
+            SELECT p.id AS pedido_id, p.status, p.data_pedido, c.nome
+            FROM pedido p
+            LEFT JOIN cliente c ON c.id = p.id_cliente
+            WHERE p.id = :pedido_id
+        """),
+        ("status_pedido_por_nome", {"nome"}, """
+            SELECT p.id AS pedido_id, p.status, p.data_pedido, c.nome
+            FROM pedido p
+            JOIN cliente c ON c.id = p.id_cliente
+            WHERE c.nome ILIKE :nome
+            ORDER BY p.data_pedido DESC
+            LIMIT 5
+        """),
+    ],
+}
+
+
+# ================================================================
+# 🔎 EXTRAÇÃO DE PARÂMETROS DA PERGUNTA
+# ================================================================
+PADRAO_PEDIDO_ID = re.compile(r"\bpedido\s*(?:n[º°o.]?\s*|#\s*)?(\d+)", re.IGNORECASE)
+PADRAO_CLIENTE_ID = re.compile(r"\bcliente\s*(?:id\s*|#\s*|n[º°o.]?\s*|c[oó]digo\s*)(\d+)", re.IGNORECASE)
+
+# nome próprio: palavras com inicial maiúscula ("Maria da Silva")
+NOME_PROPRIO = r"[A-ZÀ-Ý][a-zà-ÿ]+(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ý][a-zà-ÿ]+)*"
+PADRAO_NOME_PROPRIO = re.compile(rf"(?<![\wÀ-ÿ])({NOME_PROPRIO})")
+
+# logo após "cliente": o nome próprio ou, digitado em minúsculas, uma palavra
+PADRAO_APOS_CLIENTE = re.compile(rf"\b[Cc]lientes?\s+({NOME_PROPRIO}|[a-zà-ÿ]+)")
+
+# logo após "da/do/de": só nome próprio ("da Camila", não "do mês")
+PADRAO_APOS_DE = re.compile(rf"\bd[aeo]s?\s+({NOME_PROPRIO})")
+PADRAO_FIM_NOME_PROPRIO = re.compile(r"[A-ZÀ-Ý][a-zà-ÿ]+\s+$")   # "Maria| da Silva"
+
+NAO_NOMES = {
+    "qual", "quais", "quem", "quando", "quanto", "como", "onde", "que", "o", "a", "os", "as",
+    "me", "mostre", "mostra", "preciso", "tem", "pedido", "status", "cliente", "dados",
+    "endereço", "endereco", "telefone", "celular", "compras", "produtos", "pdv", "situação",
+    "histórico", "informações", "email", "cpf", "oi", "olá", "bom", "boa",
+}
+
+MESES = {
+    "janeiro", "fevereiro", "março", "marco", "abril", "maio", "junho", "julho",
+    "agosto", "setembro", "outubro", "novembro", "dezembro",
+}
+
+# substantivos comuns que aparecem com maiúscula ou logo após "cliente"
+SUBSTANTIVOS_COMUNS = {
+    "loja", "filial", "unidade", "centro", "shopping", "matriz", "rua", "avenida",
+    "novo", "nova", "novos", "novas", "antigo", "antiga", "especial", "vip",
+    "hoje", "ontem", "semana", "mês", "mes", "ano", "dia",
+    "segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo",
+}
+
+
+def _parece_nome(candidato: str) -> bool:
+    primeira = candidato.split()[0].lower()
+    return (
+        len(primeira) > 2
+        and primeira not in NAO_NOMES
+        and primeira not in MESES
+        and primeira not in SUBSTANTIVOS_COMUNS
+    )
+
+
+def extrair_nome_busca(pergunta: str) -> str | None:
+    """
+    Nome do cliente para busca (ILIKE), em ordem de preferência:
+      1. o que vem logo após "cliente" ("cliente Marcos", "cliente rafael")
+      2. nome próprio logo após "da/do/de" ("compras da Ana Paula")
+      3. o maior nome próprio fora do início da frase
+    Meses ("Janeiro") e substantivos comuns ("Loja Centro") não contam.
+    """
+    for m in PADRAO_APOS_CLIENTE.finditer(pergunta):
+        if _parece_nome(m.group(1)):
+            return m.group(1)
+
+    for m in PADRAO_APOS_DE.finditer(pergunta):
+        dentro_de_nome = PADRAO_FIM_NOME_PROPRIO.search(pergunta[:m.start()])
+        if not dentro_de_nome and _parece_nome(m.group(1)):
+            return m.group(1)
+
+    candidatos = [
+        m.group(1) for m in PADRAO_NOME_PROPRIO.finditer(pergunta)
+        if m.start() > 0 and _parece_nome(m.group(1))
+    ]
+    return max(candidatos, key=len) if candidatos else None
+
+
+def extrair_parametros(pergunta: str) -> dict:
+    parametros = {}
+
+    if m := PADRAO_PEDIDO_ID.search(pergunta):
+        parametros["pedido_id"] = int(m.group(1))
+
+    if m := PADRAO_CLIENTE_ID.search(pergunta):
+        parametros["cliente_id"] = int(m.group(1))
+
+    if nome := extrair_nome_busca(pergunta):
+        parametros["nome"] = nome
+
+    return parametros
+
+
+# ================================================================
+# 🎯 ESCOLHA DO TEMPLATE
+# ================================================================
+PADRAO_BIND = re.compile(r"(?<!:):([a-z_]+)\b")
+
+
+def escolher_template(
+    intent: str | None,
+    pergunta: str,
+    parametros: dict | None = None,
+    usar_regex: bool = True
+) -> dict | None:
+    """
+    Retorna {"nome", "sql", "params", "nome_cliente"} ou None se a
+    pergunta está fora do catálogo (intenção desconhecida ou sem os
+    parâmetros que as variantes precisam). `parametros` (ex.: extraídos
+    pelo LLM) têm prioridade sobre os extraídos por regex; com
+    `usar_regex=False`, só eles valem.
+    """
+    if not intent:
+        return None
+
+    variantes = CATALOGO.get(intent, []) + _aprovados.get(intent, [])
+    if not variantes:
+        return None
+
+    extraidos = extrair_parametros(pergunta) if usar_regex else {}
+    extraidos.update({k: v for k, v in (parametros or {}).items() if v not in (None, "")})
+
+    for nome, obrigatorios, sql in variantes:
+        # variante sem parâmetros casaria com qualquer pergunta da intenção
+        if obrigatorios and obrigatorios <= extraidos.keys():
+            params = {k: extraidos[k] for k in obrigatorios}
+            if "nome" in params:
+                params["nome"] = f"%{params['nome']}%"
+
+            return {
+                "nome": nome,
+                "sql": sql,
+                "params": params,
+                "nome_cliente": extraidos.get("nome"),
+            }
+
+    return None
+
+
+# ================================================================
+# 🗂️ CACHE REVISÁVEL DE SQL GERADA PELO LLM (templates_sql_ia)
+#
+# Toda SQL gerada pelo LLM que executou com sucesso é registrada como
+# 'pendente'. Um revisor parametriza o texto (ex.: troca o nome por
+# :nome) e aprova — a partir daí ela entra no catálogo da intenção.
+# ================================================================
+SQL_REGISTRAR_GERADA = text("""
+    INSERT INTO templates_sql_ia (intent, sql_hash, sql_text, pergunta_exemplo)
+    VALUES (:intent, :hash, :sql, :pergunta)
+    ON CONFLICT (sql_hash) DO UPDATE
+    SET ocorrencias = templates_sql_ia.ocorrencias + 1,
+        ultimo_uso = NOW()
+""")
+
+SQL_APROVADOS = text("""
+    SELECT id, intent, sql_text
+    FROM templates_sql_ia
+    WHERE status = 'aprovado'
+    ORDER BY id
+""")
+
+
+PARAMETROS_CONHECIDOS = {"nome", "cliente_id", "pedido_id"}   # ver extrair_parametros
+
+
+def _hash_sql(sql: str) -> str:
+    return xxhash.xxh3_64_hexdigest(" ".join(sql.lower().split()).encode("utf-8"))
+
+
+def registrar_sql_gerada(intent: str | None, pergunta: str, sql_text: str):
+    try:
+        with SessionIA() as db:
+            db.execute(SQL_REGISTRAR_GERADA, {
+                "intent": intent or "desconhecida",
+                "hash": _hash_sql(sql_text),
+                "sql": sql_text,
+                "pergunta": pergunta[:500],
+            })
+            db.commit()
+
+    except Exception:
+        log_error("Falha ao registrar SQL gerada no cache de templates:")
+        print(RED + traceback.format_exc() + RESET)
+
+
+# intent → [(nome, parâmetros, sql)] dos templates aprovados
+_aprovados: dict[str, list] = {}
+_ultima_recarga = 0.0
+_recarregando = False
+
+
+def _recarregar_aprovados():
+    global _aprovados, _recarregando
+
+    try:
+        with SessionIA() as db:
+            rows = db.execute(SQL_APROVADOS).fetchall()
+
+        novos: dict[str, list] = {}
+        for r in rows:
+            params = set(PADRAO_BIND.findall(r.sql_text))
+            if not params or r.intent in INTENCOES_GENERICAS:
+                # aprovado antes da validação em revisar_template
+                log_warn(f"Template {r.id} ({r.intent}) ignorado: sem parâmetros ou intenção genérica.")
+                continue
+            novos.setdefault(r.intent, []).append((f"aprovado_{r.id}", params, r.sql_text))
+
+        _aprovados = novos
+
+    except Exception as e:
+        log_warn(f"Não foi possível recarregar templates aprovados: {e}")
+
+    finally:
+        _recarregando = False
+
+
+def atualizar_aprovados():
+    """
+    Recarrega os templates aprovados em background quando o cache
+    expira — a requisição usa o que já está carregado.
+    """
+    global _ultima_recarga, _recarregando
+
+    if _recarregando or time.monotonic() - _ultima_recarga < RECARGA_APROVADOS_SEGUNDOS:
+        return
+
+    _ultima_recarga = time.monotonic()
+    _recarregando = True
+    threading.Thread(target=_recarregar_aprovados, daemon=True, name="templates-sql").start()
+
+
+def listar_templates(status: str | None = None) -> list[dict]:
+    with SessionIA() as db:
+        rows = db.execute(text("""
+            SELECT id, intent, status, sql_text, pergunta_exemplo, ocorrencias,
+                   criado_em, ultimo_uso, revisado_em
+            FROM templates_sql_ia
+            WHERE (CAST(:status AS TEXT) IS NULL OR status = :status)
+            ORDER BY ocorrencias DESC, id
+            LIMIT 200
+        """), {"status": status}).mappings().all()
+
+    return [dict(r) for r in rows]
+
+
+def _validar_aprovacao(intent: str, sql_text: str):
+    if intent in INTENCOES_GENERICAS:
+        raise TemplateInvalido(f"A intenção '{intent}' é genérica demais para um template.")
+
+    params = set(PADRAO_BIND.findall(sql_text))
+    if not params:
+        raise TemplateInvalido(
+            "A SQL aprovada precisa de ao menos um parâmetro (:nome, :cliente_id ou :pedido_id)."
+        )
+
+    desconhecidos = params - PARAMETROS_CONHECIDOS
+    if desconhecidos:
+        raise TemplateInvalido(f"Parâmetros que a pergunta não fornece: {sorted(desconhecidos)}.")
+
+
+def revisar_template(template_id: int, status: str, sql_text: str | None = None) -> bool:
+    """
+    Aprova/rejeita uma SQL registrada. False se o id não existe;
+    TemplateInvalido se a aprovação deixaria um template que casa com
+    qualquer pergunta (sem binds ou de intenção genérica).
+    """
+    with SessionIA() as db:
+        if status == "aprovado":
+            atual = db.execute(
+                text("SELECT intent, sql_text FROM templates_sql_ia WHERE id = :id"),
+                {"id": template_id}
+            ).fetchone()
+            if atual is None:
+                return False
+            _validar_aprovacao(atual.intent, sql_text or atual.sql_text)
+
+        resultado = db.execute(text("""
+            UPDATE templates_sql_ia
+            SET status = :status,
+                sql_text = COALESCE(:sql, sql_text),
+                revisado_em = NOW()
+            WHERE id = :id
+        """), {"id": template_id, "status": status, "sql": sql_text})
+        db.commit()
+
+    # força a recarga na próxima pergunta
+    global _ultima_recarga
+    _ultima_recarga = 0.0
+
+    return resultado.rowcount > 0
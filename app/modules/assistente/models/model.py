@@ -14,12 +14,12 @@ class ChatMessage(BaseIA):
     __tablename__ = "chat_messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Text)
+    session_id = Column(Text)  # sessoes_chat; índice (session_id, created_at): migração 0007
     vendedor_id = Column(Integer, index=True)
     sender = Column(Text)  # vendedor | assistente
     message = Column(Text, nullable=False)
 
-    embedding = Column(Vector(1536), index=True)
+    embedding = Column(Vector(1536))  # índice HNSW: migração 0005
 
     created_at = Column(
         DateTime,
@@ -59,7 +59,11 @@ class ProdutoIA(BaseIA):
     preco = Column(Numeric)
     categoria_id = Column(Integer)
 
-    embedding = Column(Vector(1536), index=True)
+    embedding = Column(Vector(1536))  # índice HNSW: migração 0005
+
+    # detecção de mudanças no sync (ver pipeline/sync_pdv_ia.py)
+    fingerprint = Column(Text)   # nome + descricao + preco + categoria_id
+    texto_hash = Column(Text)    # texto efetivamente embeddado (+ modelo)
 
     atualizado_em = Column(
         DateTime,
@@ -0,0 +1,329 @@
+# app/modules/assistente/pipeline/fila_jobs.py
+
+import json
+import os
+import threading
+import time
+import traceback
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.database_ia import SessionIA
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[FILA][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[FILA][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[FILA][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[FILA][ERRO]{RESET} {msg}")
+
+
+# ================================================================
+# CONFIGURAÇÃO (via .env)
+# ================================================================
+FILA_WORKERS = int(os.getenv("FILA_WORKERS", "2"))
+FILA_POLL_SEGUNDOS = float(os.getenv("FILA_POLL_SEGUNDOS", "2"))
+FILA_MAX_TENTATIVAS = int(os.getenv("FILA_MAX_TENTATIVAS", "5"))
+FILA_BACKOFF_MAX_SEGUNDOS = int(os.getenv("FILA_BACKOFF_MAX_SEGUNDOS", "300"))
+
+# job "executando" há mais que isso = worker morreu no meio → volta à fila
+FILA_TIMEOUT_EXECUCAO_SEGUNDOS = int(os.getenv("FILA_TIMEOUT_EXECUCAO_SEGUNDOS", "600"))
+FILA_RETENCAO_HORAS = int(os.getenv("FILA_RETENCAO_HORAS", "24"))
+FILA_MANUTENCAO_SEGUNDOS = 60
+
+
+# ================================================================
+# SQL
+# ================================================================
+SQL_ENFILEIRAR = text("""
+    INSERT INTO fila_jobs_ia (tipo, chave_idempotencia, payload, max_tentativas)
+    VALUES (:tipo, :chave, CAST(:payload AS JSONB), :max_tentativas)
+    ON CONFLICT (chave_idempotencia) DO NOTHING
+""")
+
+# SKIP LOCKED: vários workers (e vários processos) disputam a fila
+# sem se bloquear e sem pegar o mesmo job
+SQL_PEGAR_JOB = text("""
+    UPDATE fila_jobs_ia
+    SET status = 'executando',
+        tentativas = tentativas + 1,
+        iniciado_em = NOW()
+    WHERE id = (
+        SELECT id FROM fila_jobs_ia
+        WHERE status = 'pendente' AND disponivel_em <= NOW()
+        ORDER BY disponivel_em, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, tipo, payload, tentativas, max_tentativas
+""")
+
+SQL_CONCLUIR = text("""
+    UPDATE fila_jobs_ia
+    SET status = 'concluido', concluido_em = NOW(), ultimo_erro = NULL
+    WHERE id = :id
+""")
+
+SQL_FALHAR = text("""
+    UPDATE fila_jobs_ia
+    SET status = CASE WHEN tentativas >= max_tentativas THEN 'erro' ELSE 'pendente' END,
+        ultimo_erro = :erro,
+        disponivel_em = NOW() + make_interval(secs => :espera)
+    WHERE id = :id
+""")
+
+SQL_RECUPERAR_TRAVADOS = text("""
+    UPDATE fila_jobs_ia
+    SET status = 'pendente', disponivel_em = NOW()
+    WHERE status = 'executando'
+      AND iniciado_em < NOW() - make_interval(secs => :timeout)
+""")
+
+SQL_LIMPAR_CONCLUIDOS = text("""
+    DELETE FROM fila_jobs_ia
+    WHERE status = 'concluido'
+      AND concluido_em < NOW() - make_interval(hours => :horas)
+""")
+
+SQL_METRICAS = text("""
+    SELECT
+        COUNT(*) FILTER (WHERE status = 'pendente')   AS pendentes,
+        COUNT(*) FILTER (WHERE status = 'executando') AS executando,
+        COUNT(*) FILTER (WHERE status = 'erro')       AS erros,
+        EXTRACT(EPOCH FROM NOW() - MIN(criado_em) FILTER (WHERE status = 'pendente')) AS lag_segundos
+    FROM fila_jobs_ia
+    WHERE status <> 'concluido'
+""")
+
+
+# ================================================================
+# 🧾 HANDLERS (tipo → função(db, payload))
+# ================================================================
+_handlers: dict = {}
+
+
+def handler_fila(tipo: str):
+    """
+    Registra a função que processa jobs de `tipo`. Ela recebe uma
+    Session do banco IA e o payload; o job só é marcado como concluído
+    no mesmo commit do trabalho que o handler deixar pendente na sessão.
+    """
+    def registrar(funcao):
+        _handlers[tipo] = funcao
+        return funcao
+    return registrar
+
+
+# ================================================================
+# ➕ ENFILEIRAR
+# ================================================================
+def _parametros(jobs: list[tuple[str, str, dict]]) -> list[dict]:
+    return [
+        {
+            "tipo": tipo,
+            "chave": chave,
+            "payload": json.dumps(payload, ensure_ascii=False, default=str),
+            "max_tentativas": FILA_MAX_TENTATIVAS,
+        }
+        for tipo, chave, payload in jobs
+    ]
+
+
+def enfileirar(db_ia: Session, jobs: list[tuple[str, str, dict]]):
+    """
+    jobs = [(tipo, chave_idempotencia, payload), ...]
+    Chave repetida é ignorada (o job já existe). Faz commit.
+    """
+    db_ia.execute(SQL_ENFILEIRAR, _parametros(jobs))
+    db_ia.commit()
+    _acordar.set()
+
+
+async def enfileirar_async(db_ia: AsyncSession, jobs: list[tuple[str, str, dict]]):
+    await db_ia.execute(SQL_ENFILEIRAR, _parametros(jobs))
+    await db_ia.commit()
+    _acordar.set()
+
+
+# ================================================================
+# 📊 MÉTRICAS
+# ================================================================
+class _Contadores:
+
+    def __init__(self):
+        self.processados = 0
+        self.falhas = 0
+        self.descartados = 0
+        self.duracao_total = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, duracao: float, ok: bool, descartado: bool = False):
+        with self._lock:
+            if ok:
+                self.processados += 1
+                self.duracao_total += duracao
+            else:
+                self.falhas += 1
+                if descartado:
+                    self.descartados += 1
+
+
+_contadores = _Contadores()
+
+
+def metricas_fila() -> dict:
+    """
+    Profundidade e atraso da fila (banco) + contadores deste processo.
+    """
+    dados = {
+        "workers": sum(1 for t in _workers if t.is_alive()),
+        "processados": _contadores.processados,
+        "falhas": _contadores.falhas,
+        "descartados": _contadores.descartados,
+        "duracao_media_ms": (
+            round(_contadores.duracao_total / _contadores.processados * 1000, 1)
+            if _contadores.processados else None
+        ),
+    }
+
+    try:
+        with SessionIA() as db:
+            row = db.execute(SQL_METRICAS).fetchone()
+
+        dados.update({
+            "pendentes": row.pendentes,
+            "executando": row.executando,
+            "erros": row.erros,
+            "lag_segundos": round(float(row.lag_segundos), 1) if row.lag_segundos is not None else 0.0,
+        })
+
+    except Exception as e:
+        log_error(f"Falha ao ler métricas da fila: {e}")
+
+    return dados
+
+
+# ================================================================
+# ▶️ WORKERS (threads do processo, sessões próprias)
+# ================================================================
+_workers: list[threading.Thread] = []
+_parar = threading.Event()
+_acordar = threading.Event()
+_ultima_manutencao = 0.0
+_lock_manutencao = threading.Lock()
+
+
+def _manutencao():
+    """Recupera jobs travados e apaga concluídos antigos (1x por minuto)."""
+    global _ultima_manutencao
+
+    with _lock_manutencao:
+        if time.monotonic() - _ultima_manutencao < FILA_MANUTENCAO_SEGUNDOS:
+            return
+        _ultima_manutencao = time.monotonic()
+
+    with SessionIA() as db:
+        recuperados = db.execute(
+            SQL_RECUPERAR_TRAVADOS, {"timeout": FILA_TIMEOUT_EXECUCAO_SEGUNDOS}
+        ).rowcount
+        db.execute(SQL_LIMPAR_CONCLUIDOS, {"horas": FILA_RETENCAO_HORAS})
+        db.commit()
+
+    if recuperados:
+        log_warn(f"{recuperados} job(s) travado(s) devolvido(s) à fila.")
+
+
+def _processar_um() -> bool:
+    """Pega e executa um job. Retorna False se a fila estava vazia."""
+
+    with SessionIA() as db:
+        job = db.execute(SQL_PEGAR_JOB).fetchone()
+        db.commit()
+
+    if not job:
+        return False
+
+    inicio = time.perf_counter()
+    handler = _handlers.get(job.tipo)
+
+    try:
+        if handler is None:
+            raise RuntimeError(f"Nenhum handler registrado para o tipo '{job.tipo}'")
+
+        with SessionIA() as db:
+            handler(db, job.payload)
+            db.execute(SQL_CONCLUIR, {"id": job.id})
+            db.commit()
+
+        _contadores.registrar(time.perf_counter() - inicio, ok=True)
+        return True
+
+    except Exception as e:
+        descartado = job.tentativas >= job.max_tentativas
+        espera = min(2 ** job.tentativas, FILA_BACKOFF_MAX_SEGUNDOS)
+
+        if descartado:
+            log_error(f"Job {job.id} ({job.tipo}) falhou na tentativa {job.tentativas} — desistindo: {e}")
+        else:
+            log_warn(f"Job {job.id} ({job.tipo}) falhou na tentativa {job.tentativas}, nova tentativa em {espera}s: {e}")
+        print(RED + traceback.format_exc() + RESET)
+
+        with SessionIA() as db:
+            db.execute(SQL_FALHAR, {"id": job.id, "erro": str(e)[:2000], "espera": espera})
+            db.commit()
+
+        _contadores.registrar(time.perf_counter() - inicio, ok=False, descartado=descartado)
+        return True
+
+
+def _loop_worker():
+    while not _parar.is_set():
+        try:
+            _manutencao()
+
+            if _processar_um():
+                continue
+
+        except Exception:
+            log_error("Erro no loop do worker da fila:")
+            print(RED + traceback.format_exc() + RESET)
+
+        # fila vazia (ou banco fora): espera novo job ou o próximo poll
+        _acordar.wait(FILA_POLL_SEGUNDOS)
+        _acordar.clear()
+
+
+def iniciar_workers(quantidade: int | None = None):
+    quantidade = FILA_WORKERS if quantidade is None else quantidade
+
+    if any(t.is_alive() for t in _workers):
+        return
+
+    _parar.clear()
+    _workers.clear()
+
+    for i in range(quantidade):
+        t = threading.Thread(target=_loop_worker, daemon=True, name=f"fila-ia-{i}")
+        t.start()
+        _workers.append(t)
+
+    log_success(f"{quantidade} worker(s) da fila iniciados.")
+
+
+def parar_workers(timeout: float = 10.0):
+    _parar.set()
+    _acordar.set()
+
+    for t in _workers:
+        t.join(timeout)
+
+    log_info("Workers da fila parados.")
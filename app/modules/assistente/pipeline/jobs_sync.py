@@ -0,0 +1,254 @@
+# app/modules/assistente/pipeline/jobs_sync.py
+
+import json
+import os
+import threading
+import traceback
+import uuid
+
+from sqlalchemy import text
+
+from app.core.database_ia import SessionIA, engine_ia
+from app.core.database_pdv import SessionPDV
+from app.modules.assistente.kernel.cache_respostas import cache_respostas
+from app.modules.assistente.kernel.indice_produtos import construir_indice_produtos
+from app.modules.assistente.pipeline.sync_pdv_ia import sincronizar_pdv_ia
+
+# ================================================================
+# ANSI COLORS
+# ================================================================
+RED    = "\033[91m"
+GREEN  = "\033[92m"
+YELLOW = "\033[93m"
+BLUE   = "\033[94m"
+RESET  = "\033[0m"
+
+def log_info(msg):    print(f"{BLUE}[JOB-SYNC][INFO]{RESET} {msg}")
+def log_warn(msg):    print(f"{YELLOW}[JOB-SYNC][WARN]{RESET} {msg}")
+def log_success(msg): print(f"{GREEN}[JOB-SYNC][OK]{RESET} {msg}")
+def log_error(msg):   print(f"{RED}[JOB-SYNC][ERRO]{RESET} {msg}")
+
+
+# Advisory lock no banco IA: impede syncs paralelos entre workers
+LOCK_SYNC = 7_231_002
+
+# Advisory lock (de transação) da criação de jobs: dois POSTs em workers
+# diferentes não abrem dois jobs
+LOCK_JOBS_SYNC = 7_231_006
+
+# Quantos jobs finalizados manter para consulta
+MAX_JOBS_HISTORICO = 20
+
+# Job aberto sem sinal de vida por esse tempo (worker reiniciado no meio
+# do sync) é dado como abandonado e não segura mais a fila
+JOB_SYNC_ABANDONO_SEGUNDOS = int(os.getenv("JOB_SYNC_ABANDONO_SEGUNDOS", "900"))
+
+
+# ================================================================
+# 🗄️ SQL (tabela jobs_sync_ia — migração 0009)
+# ================================================================
+SQL_LOCK_JOBS = text("SELECT pg_advisory_xact_lock(:k)")
+
+SQL_ABANDONAR = text("""
+    UPDATE jobs_sync_ia
+    SET status = 'erro', erro = 'Job abandonado (sem progresso do worker).', fim = NOW()
+    WHERE status IN ('pendente', 'executando')
+      AND atualizado_em < NOW() - make_interval(secs => :abandono)
+""")
+
+SQL_JOB_ABERTO = text("""
+    SELECT id FROM jobs_sync_ia
+    WHERE status IN ('pendente', 'executando')
+    ORDER BY criado_em DESC
+    LIMIT 1
+""")
+
+SQL_CRIAR = text("INSERT INTO jobs_sync_ia (id) VALUES (:id)")
+
+SQL_LIMPAR_HISTORICO = text("""
+    DELETE FROM jobs_sync_ia
+    WHERE fim IS NOT NULL
+      AND id NOT IN (
+          SELECT id FROM jobs_sync_ia
+          WHERE fim IS NOT NULL
+          ORDER BY criado_em DESC
+          LIMIT :manter
+      )
+""")
+
+# tempos calculados no banco: o status sai igual em qualquer worker
+SQL_OBTER = text("""
+    SELECT id, status, fase, total_fase, feitos_fase, feitos_total, resultado, erro,
+           EXTRACT(EPOCH FROM NOW() - inicio_fase)                 AS decorrido_fase,
+           EXTRACT(EPOCH FROM COALESCE(fim, NOW()) - criado_em)    AS duracao
+    FROM jobs_sync_ia
+    WHERE id = :id
+""")
+
+SQL_EXECUTANDO = text("""
+    UPDATE jobs_sync_ia SET status = 'executando', atualizado_em = NOW() WHERE id = :id
+""")
+
+SQL_INICIAR_FASE = text("""
+    UPDATE jobs_sync_ia
+    SET fase = :fase, total_fase = :total, feitos_fase = 0,
+        inicio_fase = NOW(), atualizado_em = NOW()
+    WHERE id = :id
+""")
+
+SQL_AVANCAR = text("""
+    UPDATE jobs_sync_ia
+    SET feitos_fase = feitos_fase + :linhas,
+        feitos_total = feitos_total + :linhas,
+        atualizado_em = NOW()
+    WHERE id = :id
+""")
+
+SQL_FINALIZAR = text("""
+    UPDATE jobs_sync_ia
+    SET status = :status, resultado = CAST(:resultado AS JSONB), erro = :erro,
+        fim = NOW(), atualizado_em = NOW()
+    WHERE id = :id
+""")
+
+
+def _gravar(sql, params: dict):
+    with engine_ia.begin() as conn:
+        conn.execute(sql, params)
+
+
+# ================================================================
+# 🧾 PROGRESSO DO JOB (cada mudança vai para jobs_sync_ia)
+# ================================================================
+class JobSync:
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+
+    # -------------------------------------------------------------
+    # Interface de progresso usada por sincronizar_pdv_ia
+    # -------------------------------------------------------------
+    def iniciar_fase(self, fase: str, total: int):
+        _gravar(SQL_INICIAR_FASE, {"id": self.id, "fase": fase, "total": total})
+        log_info(f"[{self.id}] Fase '{fase}' iniciada ({total} linhas).")
+
+    def avancar(self, linhas: int):
+        # um UPDATE por chunk do sync; uma falha aqui não derruba o sync
+        try:
+            _gravar(SQL_AVANCAR, {"id": self.id, "linhas": linhas})
+        except Exception as e:
+            log_warn(f"[{self.id}] Falha ao gravar progresso: {e}")
+
+
+def _para_dict(r) -> dict:
+    """Snapshot para o endpoint de status."""
+    throughput = None
+    eta = None
+
+    if r.status == "executando" and r.decorrido_fase:
+        decorrido = float(r.decorrido_fase)
+        if decorrido > 0 and r.feitos_fase:
+            throughput = r.feitos_fase / decorrido
+            eta = max(r.total_fase - r.feitos_fase, 0) / throughput
+
+    return {
+        "job_id": r.id,
+        "status": r.status,
+        "fase": r.fase,
+        "linhas_fase": r.feitos_fase,
+        "total_fase": r.total_fase,
+        "linhas_total": r.feitos_total,
+        "linhas_por_segundo": round(throughput, 1) if throughput else None,
+        "eta_segundos": round(eta, 1) if eta is not None else None,
+        "duracao_segundos": round(float(r.duracao), 1),
+        "resultado": r.resultado,
+        "erro": r.erro,
+    }
+
+
+# ================================================================
+# 🗂️ REGISTRO DE JOBS (jobs_sync_ia — compartilhado entre workers)
+# ================================================================
+def iniciar_sincronizacao() -> tuple[dict, bool]:
+    """
+    Dispara o sync em background e retorna (job, criado).
+    Se já existe um sync em andamento — em qualquer worker — retorna
+    esse job (criado=False) em vez de iniciar outro em paralelo.
+    """
+    with engine_ia.begin() as conn:
+        conn.execute(SQL_LOCK_JOBS, {"k": LOCK_JOBS_SYNC})
+        conn.execute(SQL_ABANDONAR, {"abandono": JOB_SYNC_ABANDONO_SEGUNDOS})
+
+        aberto = conn.execute(SQL_JOB_ABERTO).scalar()
+        if aberto is None:
+            job_id = str(uuid.uuid4())
+            conn.execute(SQL_CRIAR, {"id": job_id})
+            conn.execute(SQL_LIMPAR_HISTORICO, {"manter": MAX_JOBS_HISTORICO})
+
+    if aberto is not None:
+        log_warn(f"Sync já em andamento → reaproveitando job {aberto}")
+        return obter_job(aberto), False
+
+    threading.Thread(target=_executar, args=(JobSync(job_id),), daemon=True, name=f"sync-{job_id[:8]}").start()
+    log_info(f"Job de sync {job_id} criado.")
+    return obter_job(job_id), True
+
+
+def obter_job(job_id: str) -> dict | None:
+    with engine_ia.connect() as conn:
+        r = conn.execute(SQL_OBTER, {"id": job_id}).fetchone()
+    return _para_dict(r) if r else None
+
+
+# ================================================================
+# ▶️ EXECUÇÃO (thread própria + sessões próprias)
+# ================================================================
+def _executar(job: JobSync):
+    try:
+        _gravar(SQL_EXECUTANDO, {"id": job.id})
+
+        # Lock de sessão numa conexão dedicada (a sessão do sync faz commit
+        # por chunk e devolve a conexão ao pool) — outro worker do uvicorn
+        # pode estar sincronizando
+        with engine_ia.connect() as lock_conn:
+            obtido = lock_conn.execute(
+                text("SELECT pg_try_advisory_lock(:k)"), {"k": LOCK_SYNC}
+            ).scalar()
+            lock_conn.commit()
+
+            if not obtido:
+                raise RuntimeError("Sincronização já em andamento em outro processo.")
+
+            try:
+                with SessionPDV() as pdv_db, SessionIA() as ia_db:
+                    resultado = sincronizar_pdv_ia(pdv_db, ia_db, progresso=job)
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": LOCK_SYNC})
+                lock_conn.commit()
+
+        _gravar(SQL_FINALIZAR, {
+            "id": job.id,
+            "status": "concluido",
+            "resultado": json.dumps(resultado, ensure_ascii=False, default=str),
+            "erro": None,
+        })
+        log_success(f"Job {job.id} concluído: {resultado['mensagem']}")
+
+        # a base do RAG mudou: respostas guardadas podem estar desatualizadas
+        # (os outros workers veem o fim do job em jobs_sync_ia)
+        cache_respostas.invalidar()
+
+        # nova versão do índice local de produtos (os workers trocam sozinhos)
+        try:
+            construir_indice_produtos()
+        except Exception:
+            log_error("Falha ao reconstruir o índice de produtos (buscas seguem no Postgres):")
+            print(RED + traceback.format_exc() + RESET)
+
+    except Exception as e:
+        log_error(f"Job {job.id} falhou: {e}")
+        print(RED + traceback.format_exc() + RESET)
+        try:
+            _gravar(SQL_FINALIZAR, {"id": job.id, "status": "erro", "resultado": None, "erro": str(e)[:2000]})
+        except Exception:
+            log_error(f"Não foi possível gravar a falha do job {job.id} (será dado como abandonado).")
@@ -1,138 +1,217 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from openai import OpenAI
-import datetime
+import xxhash
+import os
 
-client = OpenAI()
+from app.core.openai_client import MODELO_EMBEDDING, gerar_embeddings_lote
+from app.modules.assistente.pipeline.upsert_lote import upsert_em_lote
 
 
 # ======================================================
-# 🟩 GERAÇÃO DE EMBEDDING
+# ⚙️ CONFIGURAÇÃO
 # ======================================================
-def gerar_embedding(texto: str):
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=texto
-    )
-    return response.data[0].embedding
+CHUNK_CLIENTES = int(os.getenv("SYNC_CHUNK_CLIENTES", "5000"))
+CHUNK_PRODUTOS = int(os.getenv("SYNC_CHUNK_PRODUTOS", "1000"))
+
+
+# ======================================================
+# 🟫 LEITURA EM STREAMING DO PDV (keyset pagination)
+# ======================================================
+def ler_em_chunks(pdv_db: Session, select: str, tamanho: int):
+    """
+    Gera a tabela do PDV em chunks ordenados por id:
+
+        <select> WHERE id > :ultimo ORDER BY id LIMIT :tamanho
+
+    Cada página é uma consulta curta (usa o índice da PK), então a
+    memória fica limitada ao tamanho do chunk e o primeiro chunk já
+    pode ser processado antes de o último ser lido.
+    """
+    ultimo = 0
+
+    while True:
+        parte = pdv_db.execute(
+            text(f"{select} WHERE id > :ultimo ORDER BY id LIMIT :tamanho"),
+            {"ultimo": ultimo, "tamanho": tamanho}
+        ).fetchall()
+
+        if not parte:
+            return
+
+        yield parte
+        ultimo = parte[-1].id
+
+
+def _somar(total: dict, parcial: dict):
+    for chave, valor in parcial.items():
+        total[chave] = total.get(chave, 0) + valor
 
 
 # ======================================================
 # 🟦 SYNC CLIENTES
 # ======================================================
-def sync_clientes(pdv_db: Session, ia_db: Session):
-    print("🔵 [SYNC] Carregando clientes do PDV...")
-
-    clientes = pdv_db.execute(text(
-        "SELECT id, nome, email, cpf, telefone FROM cliente"
-    )).fetchall()
-
-    total = 0
-
-    for c in clientes:
-        existe = ia_db.execute(text(
-            "SELECT id FROM clientes_ia WHERE id = :id"
-        ), {"id": c.id}).fetchone()
-
-        if existe:
-            ia_db.execute(text("""
-                UPDATE clientes_ia
-                SET nome=:nome, email=:email, cpf=:cpf, telefone=:telefone, atualizado_em=NOW()
-                WHERE id=:id
-            """), {
-                "id": c.id,
-                "nome": c.nome,
-                "email": c.email,
-                "cpf": c.cpf,
-                "telefone": c.telefone
-            })
-
-        else:
-            ia_db.execute(text("""
-                INSERT INTO clientes_ia (id, nome, email, cpf, telefone)
-                VALUES (:id, :nome, :email, :cpf, :telefone)
-            """), {
-                "id": c.id,
-                "nome": c.nome,
-                "email": c.email,
-                "cpf": c.cpf,
-                "telefone": c.telefone
-            })
-
-        total += 1
-
-    ia_db.commit()
-    return total
+def sync_clientes(pdv_db: Session, ia_db: Session, chunk: int = CHUNK_CLIENTES, progresso=None):
+    print("🔵 [SYNC] Lendo clientes do PDV em chunks...")
+
+    stats = {"inseridos": 0, "atualizados": 0, "inalterados": 0}
+
+    for parte in ler_em_chunks(
+        pdv_db, "SELECT id, nome, email, cpf, telefone FROM cliente", chunk
+    ):
+        _somar(stats, upsert_em_lote(
+            ia_db,
+            tabela="clientes_ia",
+            colunas=["id", "nome", "email", "cpf", "telefone"],
+            linhas=[(c.id, c.nome, c.email, c.cpf, c.telefone) for c in parte],
+            page_size=chunk
+        ))
+        ia_db.commit()
+
+        if progresso:
+            progresso.avancar(len(parte))
+
+    print(
+        f"🔵 [SYNC] Clientes: {stats['inseridos']} inseridos, "
+        f"{stats['atualizados']} atualizados, {stats['inalterados']} inalterados."
+    )
+    return stats
+
+
+# ======================================================
+# 🟨 DETECÇÃO DE MUDANÇAS (fingerprints por produto)
+# ======================================================
+def _hash(*partes) -> str:
+    bruto = "\x1f".join("" if p is None else str(p) for p in partes)
+    return xxhash.xxh3_64_hexdigest(bruto.encode("utf-8"))
+
+
+def texto_produto(p) -> str:
+    """Texto que vira embedding — mudar aqui força re-embedding via texto_hash."""
+    return f"{p.nome}. {p.descricao}"
+
+
+def fingerprint_produto(p) -> str:
+    return _hash(p.nome, p.descricao, p.preco, p.categoria_id)
+
+
+def hash_texto_produto(p) -> str:
+    return _hash(MODELO_EMBEDDING, texto_produto(p))
 
 
 # ======================================================
 # 🟦 SYNC PRODUTOS
 # ======================================================
-def sync_produtos(pdv_db: Session, ia_db: Session):
-    print("🔵 [SYNC] Carregando produtos do PDV...")
-
-    produtos = pdv_db.execute(text("""
-        SELECT id, nome, descricao, preco, categoria_id
-        FROM produto
-    """)).fetchall()
-
-    total = 0
-
-    for p in produtos:
-        texto = f"{p.nome}. {p.descricao}"
-        embedding = gerar_embedding(texto)
-
-        existe = ia_db.execute(text(
-            "SELECT id FROM produtos_ia WHERE id=:id"
-        ), {"id": p.id}).fetchone()
-
-        if existe:
-            ia_db.execute(text("""
-                UPDATE produtos_ia
-                SET nome=:nome, descricao=:descricao, preco=:preco, 
-                    categoria_id=:categoria_id, embedding=:embedding,
-                    atualizado_em=NOW()
-                WHERE id=:id
-            """), {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "preco": p.preco,
-                "categoria_id": p.categoria_id,
-                "embedding": embedding
-            })
-
-        else:
-            ia_db.execute(text("""
-                INSERT INTO produtos_ia (id, nome, descricao, preco, categoria_id, embedding)
-                VALUES (:id, :nome, :descricao, :preco, :categoria_id, :embedding)
-            """), {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "preco": p.preco,
-                "categoria_id": p.categoria_id,
-                "embedding": embedding
-            })
-
-        total += 1
-
-    ia_db.commit()
-    return total
+def sync_produtos(pdv_db: Session, ia_db: Session, chunk: int = CHUNK_PRODUTOS, progresso=None):
+    """
+    Sincroniza produto → produtos_ia comparando fingerprints:
+        - fingerprint igual          → ignorado
+        - só preço/categoria mudou   → UPDATE das colunas, sem API
+        - texto (nome/descrição) mudou ou produto novo → re-embedding
+    Pipeline por chunk (memória limitada pelo chunk, não pela tabela):
+        ler chunk do PDV → 1 SELECT de fingerprints → 1 lote de
+        embeddings → 1 upsert → commit
+    """
+    print("🔵 [SYNC] Lendo produtos do PDV em chunks...")
+
+    stats = {"inseridos": 0, "atualizados": 0, "inalterados": 0, "reembeddados": 0}
+
+    for parte in ler_em_chunks(
+        pdv_db, "SELECT id, nome, descricao, preco, categoria_id FROM produto", chunk
+    ):
+        existentes = {
+            r.id: r
+            for r in ia_db.execute(text("""
+                SELECT id, fingerprint, texto_hash, embedding IS NULL AS sem_embedding
+                FROM produtos_ia
+                WHERE id = ANY(:ids)
+            """), {"ids": [p.id for p in parte]})
+        }
+
+        a_gravar = []      # (produto, fingerprint, texto_hash, precisa_embedding)
+
+        for p in parte:
+            fp = fingerprint_produto(p)
+            th = hash_texto_produto(p)
+            atual = existentes.get(p.id)
+
+            if atual is None or atual.sem_embedding or atual.texto_hash != th:
+                a_gravar.append((p, fp, th, True))
+            elif atual.fingerprint != fp:
+                a_gravar.append((p, fp, th, False))
+            else:
+                stats["inalterados"] += 1
+
+        # Embeddings em lote só do que mudou de texto (ordem preservada)
+        textos = [texto_produto(p) for p, _, _, precisa in a_gravar if precisa]
+        embeddings = iter(gerar_embeddings_lote(textos))
+        stats["reembeddados"] += len(textos)
+
+        # Mudanças só de colunas (preço, categoria...) vão com embedding NULL
+        # e o COALESCE mantém o vetor atual — sem chamar a API
+        linhas = [
+            (
+                p.id, p.nome, p.descricao, p.preco, p.categoria_id,
+                next(embeddings) if precisa else None,
+                fp, th
+            )
+            for p, fp, th, precisa in a_gravar
+        ]
+
+        _somar(stats, upsert_em_lote(
+            ia_db,
+            tabela="produtos_ia",
+            colunas=["id", "nome", "descricao", "preco", "categoria_id",
+                     "embedding", "fingerprint", "texto_hash"],
+            linhas=linhas,
+            comparar=["fingerprint", "texto_hash"],
+            expressoes={"embedding": "COALESCE(EXCLUDED.embedding, produtos_ia.embedding)"},
+            condicao_extra="EXCLUDED.embedding IS NOT NULL",
+            page_size=chunk
+        ))
+        ia_db.commit()
+
+        if progresso:
+            progresso.avancar(len(parte))
+
+    print(
+        f"🔵 [SYNC] Produtos: {stats['inseridos']} inseridos, "
+        f"{stats['atualizados']} atualizados ({stats['reembeddados']} re-embeddados), "
+        f"{stats['inalterados']} inalterados."
+    )
+    return stats
 
 
 # ======================================================
 # 🟩 FUNÇÃO PRINCIPAL —
 # ======================================================
-def sincronizar_pdv_ia(pdv_db: Session, ia_db: Session):
+def sincronizar_pdv_ia(pdv_db: Session, ia_db: Session, progresso=None):
+    """
+    `progresso` (opcional) recebe iniciar_fase(fase, total) e
+    avancar(linhas) — usado pelos jobs em background (jobs_sync.py).
+    """
     print("\n===========================================")
     print("🔵 INICIANDO SINCRONIZAÇÃO COMPLETA PDV → IA")
     print("===========================================\n")
 
-    total_clientes = sync_clientes(pdv_db, ia_db)
-    total_produtos = sync_produtos(pdv_db, ia_db)
+    if progresso:
+        progresso.iniciar_fase("clientes", pdv_db.execute(text("SELECT COUNT(*) FROM cliente")).scalar())
+    stats_clientes = sync_clientes(pdv_db, ia_db, progresso=progresso)
 
-    msg = f"{total_clientes} clientes e {total_produtos} produtos sincronizados."
+    if progresso:
+        progresso.iniciar_fase("produtos", pdv_db.execute(text("SELECT COUNT(*) FROM produto")).scalar())
+    stats_produtos = sync_produtos(pdv_db, ia_db, progresso=progresso)
+
+    total_clientes = stats_clientes["inseridos"] + stats_clientes["atualizados"] + stats_clientes["inalterados"]
+    total_produtos = stats_produtos["inseridos"] + stats_produtos["atualizados"] + stats_produtos["inalterados"]
+
+    msg = (
+        f"{total_clientes} clientes e {total_produtos} produtos sincronizados "
+        f"({stats_produtos['reembeddados']} produtos re-embeddados)."
+    )
     print("🟢", msg)
 
-    return msg
+    return {
+        "mensagem": msg,
+        "clientes": stats_clientes,
+        "produtos": stats_produtos,
+    }
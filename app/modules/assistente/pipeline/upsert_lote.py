@@ -0,0 +1,88 @@
+# app/modules/assistente/pipeline/upsert_lote.py
+
+from sqlalchemy.orm import Session
+from psycopg2.extras import execute_values
+
+
+# ======================================================
+# 🟪 UPSERT EM LOTE (staging temporário + INSERT ... ON CONFLICT)
+# ======================================================
+def upsert_em_lote(
+    ia_db: Session,
+    tabela: str,
+    colunas: list[str],
+    linhas: list[tuple],
+    comparar: list[str] | None = None,
+    expressoes: dict[str, str] | None = None,
+    condicao_extra: str | None = None,
+    page_size: int = 1000,
+) -> dict:
+    """
+    Grava `linhas` em `tabela` com 3 comandos, independente do tamanho:
+
+        1) CREATE TEMP TABLE (LIKE tabela)
+        2) INSERT multi-row VALUES na tabela temporária
+        3) INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE
+           ... WHERE a linha realmente mudou
+
+    - `colunas` deve começar por "id" (chave do conflito)
+    - `comparar`: colunas usadas para decidir se a linha mudou
+      (padrão: todas menos o id)
+    - `expressoes`: SET customizado por coluna (ex.: COALESCE)
+    - `condicao_extra`: OR adicional no WHERE do DO UPDATE
+
+    Roda dentro da transação da sessão (não faz commit).
+    Retorna {"inseridos", "atualizados", "inalterados"}.
+    """
+    if not linhas:
+        return {"inseridos": 0, "atualizados": 0, "inalterados": 0}
+
+    comparar = comparar or colunas[1:]
+    expressoes = expressoes or {}
+    stage = f"_stage_{tabela}"
+    lista_colunas = ", ".join(colunas)
+
+    sets = ", ".join(
+        f"{c} = {expressoes.get(c, f'EXCLUDED.{c}')}"
+        for c in colunas[1:]
+    )
+
+    mudou = (
+        f"({', '.join(f'{tabela}.{c}' for c in comparar)}) "
+        f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in comparar)})"
+    )
+    if condicao_extra:
+        mudou = f"{mudou} OR {condicao_extra}"
+
+    conn = ia_db.connection().connection
+
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {tabela} INCLUDING DEFAULTS) ON COMMIT DROP")
+
+        execute_values(
+            cur,
+            f"INSERT INTO {stage} ({lista_colunas}) VALUES %s",
+            linhas,
+            page_size=page_size
+        )
+
+        cur.execute(f"""
+            INSERT INTO {tabela} ({lista_colunas})
+            SELECT {lista_colunas} FROM {stage}
+            ON CONFLICT (id) DO UPDATE
+               SET {sets}, atualizado_em = NOW()
+             WHERE {mudou}
+            RETURNING (xmax = 0) AS inserido
+        """)
+        retornadas = cur.fetchall()
+
+        # permite vários chunks na mesma transação
+        cur.execute(f"DROP TABLE {stage}")
+
+    inseridos = sum(1 for (inserido,) in retornadas if inserido)
+
+    return {
+        "inseridos": inseridos,
+        "atualizados": len(retornadas) - inseridos,
+        "inalterados": len(linhas) - len(retornadas),
+    }
@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import json
 
-from app.core.database_ia import get_db_ia
-from app.core.database_pdv import get_db_pdv  # 🔵 precisa existir
-from app.modules.assistente.schemas.schema import ChatRequest, ChatResponse
-from app.modules.assistente.services.service import processar_mensagem
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database_ia import get_db_ia_async
+from app.core.embedding_cache import cache_embeddings
+from app.modules.assistente.kernel.contexto import ContextoRequisicao
+from app.modules.assistente.kernel.roteador_intencao import estatisticas_roteador
+from app.modules.assistente.kernel.guardas_sql import metricas_guardas_sql
+from app.modules.assistente.kernel.cache_respostas import cache_respostas
+from app.modules.assistente.kernel.indice_produtos import indice_produtos
+from app.modules.assistente.kernel.sessoes import cache_sessoes
+from app.modules.assistente.kernel.templates_sql import TemplateInvalido, listar_templates, revisar_template
+from app.modules.assistente.schemas.schema import ChatRequest, ChatResponse, RevisaoTemplateSQL
+from app.modules.assistente.services.service import (
+    processar_mensagem_async,
+    processar_mensagem_stream_async,
+)
 
-# 🔵 pipeline de sincronização PDV → IA
-from app.modules.assistente.pipeline.sync_pdv_ia import sincronizar_pdv_ia  
+# 🔵 pipeline de sincronização PDV → IA (jobs em background)
+from app.modules.assistente.pipeline.jobs_sync import iniciar_sincronizacao, obter_job
+from app.modules.assistente.pipeline.fila_jobs import metricas_fila
 
 router = APIRouter(
     prefix="/assistente",
@@ -23,9 +37,10 @@ router = APIRouter(
     response_model=ChatResponse,
     summary="Envia uma mensagem ao assistente inteligente"
 )
-def chat(req: ChatRequest, db_ia: Session = Depends(get_db_ia)):
+async def chat(req: ChatRequest, db_ia: AsyncSession = Depends(get_db_ia_async)):
     """
-    Fluxo completo:
+    Fluxo completo (assíncrono — não ocupa o threadpool do Starlette
+    enquanto espera OpenAI/Postgres):
     1. Registrar mensagem → chat_messages
     2. RAG
     3. SQL Agent (consultas ao PDV)
@@ -40,18 +55,21 @@ def chat(req: ChatRequest, db_ia: Session = Depends(get_db_ia)):
     print(f"🟦 [ROUTER] Mensagem: {req.mensagem}")
     print("==========================================================")
 
+    contexto = ContextoRequisicao(req.vendedor_id, req.mensagem)
+
     try:
-        resposta = processar_mensagem(
+        resposta = await processar_mensagem_async(
             vendedor_id=req.vendedor_id,
             mensagem=req.mensagem,
-            db_ia=db_ia
+            db_ia=db_ia,
+            contexto=contexto
         )
 
         print("🟢 [ROUTER] Resposta gerada com sucesso.")
         print(f"🟢 [ROUTER] Resposta: {resposta}")
         print("==========================================================\n")
 
-        return ChatResponse(resposta=resposta)
+        return ChatResponse(resposta=resposta, tempos=contexto.tempos)
 
     except HTTPException:
         raise
@@ -66,41 +84,152 @@ def chat(req: ChatRequest, db_ia: Session = Depends(get_db_ia)):
 
 
 # =====================================================
-#  🔥 NOVA ROTA — SINCRONIZAÇÃO PDV → IA
+#  ROTA DO ASSISTENTE EM STREAMING (SSE)
+# =====================================================
+def _evento_sse(evento: str, dados: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/chat/stream",
+    summary="Envia uma mensagem ao assistente e recebe a resposta em streaming (SSE)"
+)
+async def chat_stream(req: ChatRequest):
+    """
+    Mesmo fluxo de /chat, mas a resposta final do LLM chega token a
+    token como Server-Sent Events:
+        event: token  → {"texto": "..."}
+        event: fim    → {"tempos": {...}}   (inclui ttft_ms)
+        event: erro   → {"detail": "..."}
+    A gravação da resposta completa e o agente sugestivo rodam depois
+    que o stream termina.
+    """
+
+    print("\n==========================================================")
+    print("🟦 [ROUTER] Requisição recebida na rota /assistente/chat/stream")
+    print(f"🟦 [ROUTER] Vendedor ID: {req.vendedor_id}")
+    print(f"🟦 [ROUTER] Mensagem: {req.mensagem}")
+    print("==========================================================")
+
+    contexto = ContextoRequisicao(req.vendedor_id, req.mensagem)
+
+    async def eventos():
+        try:
+            async for pedaco in processar_mensagem_stream_async(
+                vendedor_id=req.vendedor_id,
+                mensagem=req.mensagem,
+                contexto=contexto
+            ):
+                yield _evento_sse("token", {"texto": pedaco})
+
+            print(f"🟢 [ROUTER] Stream concluído. Tempos: {contexto.tempos}")
+            yield _evento_sse("fim", {"tempos": contexto.tempos})
+
+        except Exception as e:
+            print("❌ [ROUTER] Erro no stream:", e)
+            yield _evento_sse("erro", {"detail": f"Erro interno ao processar a mensagem: {str(e)}"})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",   # nginx não deve bufferizar o SSE
+        },
+    )
+
+
+# =====================================================
+#  🔥 SINCRONIZAÇÃO PDV → IA (job em background)
 # =====================================================
 @router.post(
     "/sincronizar",
-    summary="Sincroniza o banco PDV com o banco IA",
+    status_code=202,
+    summary="Dispara a sincronização do banco PDV com o banco IA",
 )
-def sincronizar(
-    db_ia: Session = Depends(get_db_ia),
-    db_pdv: Session = Depends(get_db_pdv)
-):
+def sincronizar():
     """
-    Executa a sincronização completa:
+    Inicia a sincronização completa em background e retorna o job_id:
         - Clientes → clientes_ia
         - Produtos → produtos_ia
         - Geração de Embeddings
         - Atualização de timestamps
+
+    Se já houver uma sincronização em andamento, retorna o job existente
+    (coalescido=True) em vez de iniciar outra em paralelo.
+    Acompanhe em GET /assistente/sincronizar/{job_id}.
     """
 
     print("\n==========================================================")
-    print("🟦 [ROUTER] Iniciando sincronização PDV → IA")
+    print("🟦 [ROUTER] Solicitação de sincronização PDV → IA")
     print("==========================================================")
 
+    job, criado = iniciar_sincronizacao()
+
+    print(f"🟢 [ROUTER] Job {job['job_id']} ({'novo' if criado else 'reaproveitado'})")
+    print("==========================================================\n")
+
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "coalescido": not criado,
+    }
+
+
+@router.get(
+    "/sincronizar/{job_id}",
+    summary="Status e progresso de uma sincronização PDV → IA",
+)
+def status_sincronizacao(job_id: str):
+    job = obter_job(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de sincronização não encontrado.")
+
+    return job
+
+
+# =====================================================
+#  TEMPLATES SQL — revisão das consultas geradas pelo LLM
+# =====================================================
+@router.get(
+    "/templates-sql",
+    summary="Lista o cache de SQL gerada pelo LLM (candidatas a template)",
+)
+def templates_sql(status: str | None = "pendente"):
+    return listar_templates(status)
+
+
+@router.post(
+    "/templates-sql/{template_id}/revisao",
+    summary="Aprova/rejeita uma SQL gerada — aprovadas entram no catálogo da intenção",
+)
+def revisar_template_sql(template_id: int, revisao: RevisaoTemplateSQL):
     try:
-        resultado = sincronizar_pdv_ia(db_pdv, db_ia)
+        revisado = revisar_template(template_id, revisao.status, revisao.sql_text)
+    except TemplateInvalido as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-        print("🟢 [ROUTER] Sincronização concluída com sucesso.")
-        print(f"🟢 [ROUTER] {resultado}")
-        print("==========================================================\n")
+    if not revisado:
+        raise HTTPException(status_code=404, detail="Template não encontrado.")
 
-        return {"status": "ok", "detalhe": resultado}
+    return {"id": template_id, "status": revisao.status}
 
-    except Exception as e:
-        print("❌ [ROUTER] Erro durante sincronização:", e)
-        print("==========================================================\n")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erro ao sincronizar dados: {str(e)}"
-        )
+
+# =====================================================
+#  MÉTRICAS DO ASSISTENTE
+# =====================================================
+@router.get(
+    "/metricas",
+    summary="Métricas internas do assistente (caches, filas, etc.)",
+)
+def metricas():
+    return {
+        "embeddings_cache": cache_embeddings.estatisticas(),
+        "fila_pos_resposta": metricas_fila(),
+        "roteador_intencao": estatisticas_roteador(),
+        "guardas_sql": metricas_guardas_sql(),
+        "cache_respostas": cache_respostas.estatisticas(),
+        "indice_produtos": indice_produtos.estatisticas(),
+        "sessoes": cache_sessoes.estatisticas(),
+    }
@@ -1,7 +1,7 @@
 # app/modules/assistente/schemas/schema.py
 
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Literal
 
 # ================================================================
 # ANSI LOGS
@@ -28,6 +28,7 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     resposta: str
+    tempos: Optional[Dict[str, float]] = None   # ms por etapa (rag, sql, llm...)
 
 
 # ================================================================
@@ -67,3 +68,56 @@ class RecomendacaoItem(BaseModel):
 class ListaRecomendacoes(BaseModel):
     cliente_id: Optional[int]
     recomendacoes: List[RecomendacaoItem]
+
+
+# ================================================================
+# 🔹 Revisão de templates SQL (cache de SQL gerada pelo LLM)
+# ================================================================
+class RevisaoTemplateSQL(BaseModel):
+    status: Literal["aprovado", "rejeitado", "pendente"]
+    sql_text: Optional[str] = None   # versão parametrizada (:nome, :pedido_id, :cliente_id)
+
+
+# ================================================================
+# 🔹 Saída estruturada do LLM no agente SQL (intenção + SQL)
+# ================================================================
+IntencaoSQL = Literal[
+    "dados_cliente",
+    "compras_cliente",
+    "endereco_cliente",
+    "telefones_cliente",
+    "produtos_cliente",
+    "status_pedido",
+    "dados_loja",
+    "outra",
+]
+
+
+class ParametrosSQL(BaseModel):
+    cliente_nome: Optional[str] = None
+    cliente_id: Optional[int] = None
+    pedido_id: Optional[int] = None
+
+
+class RespostaAgenteSQL(BaseModel):
+    intent: IntencaoSQL
+    parametros: ParametrosSQL
+    sql: str
+    confianca: float = Field(ge=0.0, le=1.0)
+
+    @field_validator("sql")
+    @classmethod
+    def validar_sql(cls, v: str) -> str:
+        v = v.strip().rstrip(";").strip()
+        baixo = v.lower()
+
+        if "```" in v:
+            raise ValueError("a SQL não pode conter blocos Markdown")
+        if ";" in v:
+            raise ValueError("a SQL deve ser um único comando (sem ';')")
+        if not (baixo.startswith("select") or baixo.startswith("with")):
+            raise ValueError("a SQL deve ser uma consulta SELECT (ou WITH ... SELECT)")
+        if "select *" in " ".join(baixo.split()):
+            raise ValueError("SELECT * é proibido; liste as colunas")
+
+        return v
@@ -1,16 +1,27 @@
 # app/modules/assistente/services/service.py
 
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import time
 import traceback
 import uuid
 
-from app.modules.assistente.kernel.agent_hibrido import agente_hibrido
-from app.modules.assistente.kernel.agent_rag import recuperar_contexto_rag
+from app.modules.assistente.kernel.agent_hibrido import (
+    agente_hibrido,
+    agente_hibrido_async,
+    agente_hibrido_stream_async,
+)
+from app.modules.assistente.kernel.agent_rag import recuperar_contexto_rag, recuperar_contexto_rag_async
+from app.modules.assistente.kernel.contexto import ContextoRequisicao
+from app.modules.assistente.kernel.sessoes import resolver_sessao, resolver_sessao_async
 from app.modules.assistente.services.service_sugestivo import executar_sugestivo
+from app.modules.assistente.kernel.agent_sugestivo import processar_resposta_sugestiva
 
-from app.modules.assistente.models.model import ChatMessage
-from app.core.openai_client import gerar_embedding
+from app.modules.assistente.models.model import ChatMessage, InteracaoCliente
+from app.modules.assistente.pipeline.fila_jobs import enfileirar, enfileirar_async, handler_fila
+from app.core.database_ia import SessionIA, SessionIAAsync
+from app.core.openai_client import gerar_embedding, gerar_embedding_async
 
 # ================================================================
 # ANSI COLORS
@@ -31,27 +42,12 @@ def log_error(msg):   print(f"{RED}[SERVICE][ERRO]{RESET} {msg}")
 # 🧩 Função interna — obtém ou cria um session_id
 # ================================================================
 def obter_ou_criar_session_id(db_ia: Session, vendedor_id: int) -> str:
+    # sessões: registro sessoes_chat + cache por vendedor (kernel/sessoes.py)
     try:
-        row = db_ia.execute(
-            text("""
-                SELECT session_id
-                FROM chat_messages
-                WHERE vendedor_id = :v
-                ORDER BY created_at DESC
-                LIMIT 1
-            """),
-            {"v": vendedor_id}
-        ).fetchone()
-
-        if row and row.session_id:
-            log_info(f"Reutilizando session_id existente: {row.session_id}")
-            return row.session_id
-
-        novo = str(uuid.uuid4())
-        log_info(f"Criando novo session_id: {novo}")
-        return novo
+        return resolver_sessao(db_ia, vendedor_id)
 
     except Exception:
+        db_ia.rollback()
         log_error("Erro ao obter/criar session_id:")
         print(RED + traceback.format_exc() + RESET)
         return str(uuid.uuid4())
@@ -68,12 +64,16 @@ def processar_mensagem(
 ):
     log_info("Iniciando processamento da mensagem...")
 
+    contexto = ContextoRequisicao(vendedor_id, mensagem, cliente_id)
+
     # Criar ou recuperar session_id
     session_id = obter_ou_criar_session_id(db_ia, vendedor_id)
+    contexto.session_id = session_id
 
     # 1️⃣ Registrar a mensagem recebida
     try:
         emb = gerar_embedding(mensagem)
+        contexto.embedding = emb
         msg_reg = ChatMessage(
             session_id=session_id,
             vendedor_id=vendedor_id,
@@ -84,6 +84,7 @@ def processar_mensagem(
         db_ia.add(msg_reg)
         db_ia.commit()
         db_ia.refresh(msg_reg)
+        contexto.chat_message_id = msg_reg.id
 
         log_success(f"Mensagem registrada (ID={msg_reg.id}, session={session_id})")
 
@@ -101,7 +102,8 @@ def processar_mensagem(
             db_ia=db_ia,
             vendedor_id=vendedor_id,
             pergunta=mensagem,
-            recuperar_contexto_rag=recuperar_contexto_rag
+            recuperar_contexto_rag=recuperar_contexto_rag,
+            contexto=contexto
         )
 
         log_success("Resposta híbrida gerada com sucesso.")
@@ -150,4 +152,291 @@ def processar_mensagem(
         log_error("Falha ao executar agente sugestivo:")
         print(RED + traceback.format_exc() + RESET)
 
+    # 5️⃣ Resumo da sessão (e outros jobs do contexto) — na fila
+    if contexto.jobs_pos_resposta:
+        try:
+            enfileirar(db_ia, contexto.jobs_pos_resposta)
+        except Exception as e:
+            db_ia.rollback()
+            log_warn(f"Falha ao enfileirar jobs da sessão: {e}")
+
+    return resposta_final
+
+
+# ================================================================
+# SERVIÇO PRINCIPAL — VERSÃO ASSÍNCRONA (rota /assistente/chat)
+# ================================================================
+async def obter_ou_criar_session_id_async(db_ia: AsyncSession, vendedor_id: int) -> str:
+    try:
+        return await resolver_sessao_async(db_ia, vendedor_id)
+
+    except Exception:
+        await db_ia.rollback()
+        log_error("Erro ao obter/criar session_id (async):")
+        print(RED + traceback.format_exc() + RESET)
+        return str(uuid.uuid4())
+
+
+def _executar_sugestivo_sync(**kwargs):
+    # o agente sugestivo (e o recomendador) são síncronos:
+    # rodam numa thread com sessão própria
+    with SessionIA() as db_sync:
+        executar_sugestivo(db_ia=db_sync, **kwargs)
+
+
+async def _registrar_mensagem_async(db_ia: AsyncSession, contexto: ContextoRequisicao):
+    """
+    Etapa 1 do fluxo async: grava a mensagem do vendedor e deixa
+    session_id, embedding e chat_message_id no contexto.
+    """
+    contexto.session_id = await obter_ou_criar_session_id_async(db_ia, contexto.vendedor_id)
+
+    try:
+        inicio = time.perf_counter()
+        contexto.embedding = await gerar_embedding_async(contexto.mensagem)
+        contexto.marcar("embedding_ms", inicio)
+
+        msg_reg = ChatMessage(
+            session_id=contexto.session_id,
+            vendedor_id=contexto.vendedor_id,
+            sender="vendedor",
+            message=contexto.mensagem,
+            embedding=contexto.embedding
+        )
+        db_ia.add(msg_reg)
+        await db_ia.commit()   # id já vem do INSERT ... RETURNING
+        contexto.chat_message_id = msg_reg.id
+
+        log_success(f"Mensagem registrada (ID={msg_reg.id}, session={contexto.session_id})")
+
+    except Exception:
+        await db_ia.rollback()
+        log_error("Falha ao registrar a mensagem:")
+        print(RED + traceback.format_exc() + RESET)
+        raise Exception("Erro ao registrar mensagem")
+
+
+# ================================================================
+# PÓS-RESPOSTA — fila durável (fila_jobs_ia) fora do caminho crítico
+# ================================================================
+@handler_fila("persistir_resposta")
+def _job_persistir_resposta(db_ia: Session, payload: dict):
+    # sem commit: o worker conclui o job no mesmo commit do INSERT,
+    # então uma nova tentativa nunca duplica a resposta
+    db_ia.add(ChatMessage(
+        session_id=payload["session_id"],
+        vendedor_id=payload["vendedor_id"],
+        sender="assistente",
+        message=payload["resposta"],
+        embedding=gerar_embedding(payload["resposta"])
+    ))
+    db_ia.flush()
+
+
+@handler_fila("sugestivo")
+def _job_sugestivo(db_ia: Session, payload: dict):
+    # sem commit: preferência, recomendações e a interação
+    # "resposta_llm" (gravada por último) entram no mesmo commit que
+    # conclui o job — se a interação existe, o resto também existe.
+    # Erros sobem para o worker (nova tentativa com backoff).
+    ja_feito = db_ia.query(InteracaoCliente.id).filter(
+        InteracaoCliente.chat_message_id == payload["chat_message_id"],
+        InteracaoCliente.tipo == "resposta_llm"
+    ).first()
+
+    if ja_feito:
+        log_warn(f"Sugestivo da mensagem {payload['chat_message_id']} já executado — ignorando.")
+        return
+
+    processar_resposta_sugestiva(db_ia=db_ia, commit=False, **payload)
+
+
+async def _finalizar_resposta_async(
+    db_ia: AsyncSession,
+    contexto: ContextoRequisicao,
+    resposta_final: str
+):
+    """
+    Etapas 3 e 4: enfileira a gravação da resposta e o agente sugestivo
+    (chave de idempotência = id da mensagem do vendedor), junto com os
+    jobs do contexto (ex.: resumo da sessão), e retorna. Se a fila
+    estiver indisponível, executa tudo em linha (menos esses jobs — a
+    próxima mensagem da sessão pede o resumo de novo).
+    """
+    mid = contexto.chat_message_id
+
+    try:
+        await enfileirar_async(db_ia, [
+            ("persistir_resposta", f"persistir_resposta:{mid}", {
+                "session_id": contexto.session_id,
+                "vendedor_id": contexto.vendedor_id,
+                "resposta": resposta_final,
+            }),
+            ("sugestivo", f"sugestivo:{mid}", {
+                "vendedor_id": contexto.vendedor_id,
+                "pergunta": contexto.mensagem,
+                "resposta_llm": resposta_final,
+                "chat_message_id": mid,
+                "cliente_id": contexto.cliente_id,
+            }),
+            *contexto.jobs_pos_resposta,
+        ])
+        log_success(f"Pós-resposta da mensagem {mid} enfileirado.")
+
+    except Exception:
+        await db_ia.rollback()
+        log_error("Falha ao enfileirar pós-resposta — executando em linha:")
+        print(RED + traceback.format_exc() + RESET)
+        await _finalizar_resposta_inline_async(db_ia, contexto, resposta_final)
+
+
+async def _finalizar_resposta_inline_async(
+    db_ia: AsyncSession,
+    contexto: ContextoRequisicao,
+    resposta_final: str
+):
+    """
+    Fallback: grava a resposta e roda o sugestivo dentro da requisição.
+    Falhas aqui são registradas, nunca propagadas.
+    """
+    # 3️⃣ Registrar resposta do assistente
+    try:
+        emb_resp = await gerar_embedding_async(resposta_final)
+
+        msg_assist = ChatMessage(
+            session_id=contexto.session_id,
+            vendedor_id=contexto.vendedor_id,
+            sender="assistente",
+            message=resposta_final,
+            embedding=emb_resp
+        )
+        db_ia.add(msg_assist)
+        await db_ia.commit()
+
+        log_success(f"Resposta do assistente registrada (ID={msg_assist.id})")
+
+    except Exception:
+        await db_ia.rollback()
+        log_error("Erro ao registrar resposta do assistente:")
+        print(RED + traceback.format_exc() + RESET)
+
+    # 4️⃣ Agente Sugestivo
+    try:
+        await asyncio.to_thread(
+            _executar_sugestivo_sync,
+            vendedor_id=contexto.vendedor_id,
+            pergunta=contexto.mensagem,
+            resposta_llm=resposta_final,
+            chat_message_id=contexto.chat_message_id,
+            cliente_id=contexto.cliente_id
+        )
+
+        log_success("Agente sugestivo executado.")
+
+    except Exception:
+        log_error("Falha ao executar agente sugestivo:")
+        print(RED + traceback.format_exc() + RESET)
+
+
+async def processar_mensagem_async(
+    vendedor_id: int,
+    mensagem: str,
+    db_ia: AsyncSession,
+    cliente_id: int | None = None,
+    contexto: ContextoRequisicao | None = None
+):
+    log_info("Iniciando processamento da mensagem (async)...")
+
+    contexto = contexto or ContextoRequisicao(vendedor_id, mensagem, cliente_id)
+
+    # 1️⃣ Registrar a mensagem recebida
+    await _registrar_mensagem_async(db_ia, contexto)
+
+    # 2️⃣ Agente Híbrido
+    try:
+        resposta_final = await agente_hibrido_async(
+            db_ia=db_ia,
+            vendedor_id=vendedor_id,
+            pergunta=mensagem,
+            recuperar_contexto_rag=recuperar_contexto_rag_async,
+            contexto=contexto
+        )
+
+        log_success("Resposta híbrida gerada com sucesso.")
+
+    except Exception:
+        log_error("Erro dentro do agente híbrido:")
+        print(RED + traceback.format_exc() + RESET)
+        resposta_final = "Não consegui gerar uma resposta agora."
+
+    # 3️⃣ 4️⃣ Resposta + sugestivo
+    await _finalizar_resposta_async(db_ia, contexto, resposta_final)
+
     return resposta_final
+
+
+# ================================================================
+# SERVIÇO EM STREAMING (rota /assistente/chat/stream)
+# ================================================================
+# Referências das finalizações em andamento (o loop só guarda weakrefs)
+_finalizacoes_pendentes: set[asyncio.Task] = set()
+
+
+async def _finalizar_em_sessao_propria(**kwargs):
+    async with SessionIAAsync() as db_ia:
+        await _finalizar_resposta_async(db_ia=db_ia, **kwargs)
+
+
+async def processar_mensagem_stream_async(
+    vendedor_id: int,
+    mensagem: str,
+    cliente_id: int | None = None,
+    contexto: ContextoRequisicao | None = None
+):
+    """
+    Gerador assíncrono com os pedaços da resposta. Usa sessão própria
+    (o gerador vive além da dependência da rota). Quando o stream
+    termina — ou o cliente desconecta — a resposta acumulada é gravada
+    e o sugestivo roda numa task separada, fora do ciclo da conexão.
+    """
+    log_info("Iniciando processamento da mensagem (stream)...")
+
+    contexto = contexto or ContextoRequisicao(vendedor_id, mensagem, cliente_id)
+    partes: list[str] = []
+
+    async with SessionIAAsync() as db_ia:
+
+        # 1️⃣ Registrar a mensagem recebida
+        await _registrar_mensagem_async(db_ia, contexto)
+
+        # 2️⃣ Agente Híbrido (streaming)
+        try:
+            async for pedaco in agente_hibrido_stream_async(
+                db_ia=db_ia,
+                vendedor_id=vendedor_id,
+                pergunta=mensagem,
+                recuperar_contexto_rag=recuperar_contexto_rag_async,
+                contexto=contexto
+            ):
+                partes.append(pedaco)
+                yield pedaco
+
+            log_success("Resposta híbrida transmitida com sucesso.")
+
+        except Exception:
+            log_error("Erro dentro do agente híbrido (stream):")
+            print(RED + traceback.format_exc() + RESET)
+            if not partes:
+                partes.append("Não consegui gerar uma resposta agora.")
+                yield partes[0]
+
+        finally:
+            # 3️⃣ 4️⃣ Resposta + sugestivo — task desacoplada da conexão
+            resposta_final = "".join(partes)
+            if resposta_final:
+                tarefa = asyncio.create_task(_finalizar_em_sessao_propria(
+                    contexto=contexto,
+                    resposta_final=resposta_final
+                ))
+                _finalizacoes_pendentes.add(tarefa)
+                tarefa.add_done_callback(_finalizacoes_pendentes.discard)
@@ -0,0 +1,74 @@
+"""
+Benchmark: embeddings do sync de produtos — um request por produto
+(comportamento antigo do sync_produtos) vs gerar_embeddings_lote
+sequencial vs gerar_embeddings_lote com N requests em voo.
+
+    python -m benchmarks.bench_embeddings_lote --produtos 2000 --latencia-ms 30 --paralelismo 4
+
+Roda contra um servidor fake local (benchmarks/fake_openai.py), com
+o cache de embeddings desligado para medir apenas o transporte.
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.fake_openai import ServidorEmbeddingsFake
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", type=int, default=2000)
+    parser.add_argument("--latencia-ms", type=float, default=30.0)
+    parser.add_argument("--paralelismo", type=int, default=4)
+    args = parser.parse_args()
+
+    servidor = ServidorEmbeddingsFake(latencia_ms=args.latencia_ms).iniciar()
+
+    # Precisa estar no ambiente ANTES de importar o openai_client
+    os.environ["OPENAI_BASE_URL"] = servidor.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ.setdefault("DATABASE_URL_IA", "postgresql://fake@localhost/fake")
+    os.environ["EMBEDDING_CACHE_PERSISTENTE"] = "0"
+    os.environ["EMBEDDING_CACHE_MAX_ITENS"] = "0"
+
+    from app.core.openai_client import gerar_embedding, gerar_embeddings_lote
+
+    textos = [
+        f"Produto {i}. Descrição sintética do produto número {i} para benchmark."
+        for i in range(args.produtos)
+    ]
+
+    print(f"\n🔵 {args.produtos} produtos | latência fake {args.latencia_ms} ms/request\n")
+
+    inicio = time.perf_counter()
+    for t in textos:
+        gerar_embedding(t)
+    antes = time.perf_counter() - inicio
+    requests_antes = servidor.requests
+
+    inicio = time.perf_counter()
+    vetores = gerar_embeddings_lote(textos, paralelismo=1)
+    depois = time.perf_counter() - inicio
+    requests_depois = servidor.requests - requests_antes
+
+    inicio = time.perf_counter()
+    vetores_par = gerar_embeddings_lote(textos, paralelismo=args.paralelismo)
+    paralelo = time.perf_counter() - inicio
+    requests_paralelo = servidor.requests - requests_antes - requests_depois
+
+    assert len(vetores) == len(textos)
+    assert vetores == vetores_par, "ordem/conteúdo diferente entre sequencial e paralelo"
+
+    print(f"{'modo':<28}{'requests':>10}{'tempo (s)':>12}{'produtos/s':>14}")
+    print(f"{'1 request por produto':<28}{requests_antes:>10}{antes:>12.2f}{args.produtos / antes:>14.1f}")
+    print(f"{'gerar_embeddings_lote':<28}{requests_depois:>10}{depois:>12.2f}{args.produtos / depois:>14.1f}")
+    modo = f"lote, {args.paralelismo} em voo"
+    print(f"{modo:<28}{requests_paralelo:>10}{paralelo:>12.2f}{args.produtos / paralelo:>14.1f}")
+    print(f"\n🟢 Speedup lote: {antes / depois:.1f}x | lote paralelo: {antes / paralelo:.1f}x\n")
+
+    servidor.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Recall × latência dos índices aproximados do pgvector contra a busca
+exata, com o mesmo operador das consultas do assistente (<#>).
+
+    BENCH_DATABASE_URL=postgresql://.../ia_scratch \\
+    python -m benchmarks.bench_indices_vetoriais --linhas 100000 1000000 --ivfflat
+
+- Banco: Postgres + pgvector de TESTE (cria e apaga a tabela
+  bench_vetores; as tabelas do assistente não são tocadas)
+- Vetores sintéticos normalizados, em grupos (como embeddings reais:
+  vizinhos próximos existem), 1536 dimensões por padrão
+- Exata: sem índice (seq scan) — é a referência do recall
+- HNSW (m=16, ef_construction=64, igual à migração 0005) varrendo
+  hnsw.ef_search; com --ivfflat, IVFFlat varrendo ivfflat.probes
+
+Saída: por configuração, recall@k médio e latência p50/p95 (ms).
+Use o resultado para escolher RAG_HNSW_EF_SEARCH / PRODUTOS_HNSW_EF_SEARCH.
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+TABELA = "bench_vetores"
+
+
+def gerar_vetores(rng, centros: np.ndarray, n: int, ruido: float) -> np.ndarray:
+    grupos = rng.integers(0, len(centros), size=n)
+    v = centros[grupos] + rng.normal(0, ruido, size=(n, centros.shape[1])).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def literal(v: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in v) + "]"
+
+
+def copy_binario(ids: np.ndarray, vetores: np.ndarray) -> io.BytesIO:
+    """
+    COPY ... (FORMAT BINARY): por linha, nº de campos, id (int4) e o
+    vetor no formato binário do pgvector (dim int2, 0 int2, float4[]).
+    Montado com numpy — texto "[0.1,...]" para 1M × 1536 é lento demais.
+    """
+    n, dim = vetores.shape
+    linha = np.dtype([
+        ("campos", ">i2"),
+        ("len_id", ">i4"), ("id", ">i4"),
+        ("len_vetor", ">i4"), ("dim", ">i2"), ("zero", ">i2"), ("valores", ">f4", (dim,)),
+    ])
+    dados = np.empty(n, dtype=linha)
+    dados["campos"] = 2
+    dados["len_id"] = 4
+    dados["id"] = ids
+    dados["len_vetor"] = 4 + 4 * dim
+    dados["dim"] = dim
+    dados["zero"] = 0
+    dados["valores"] = vetores
+
+    buf = io.BytesIO()
+    buf.write(b"PGCOPY\n\xff\r\n\x00" + (0).to_bytes(4, "big") + (0).to_bytes(4, "big"))
+    buf.write(dados.tobytes())
+    buf.write((-1).to_bytes(2, "big", signed=True))
+    buf.seek(0)
+    return buf
+
+
+def carregar(conn_dbapi, rng, centros, linhas: int, dim: int, ruido: float, lote: int = 10_000):
+    cur = conn_dbapi.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {TABELA}")
+    cur.execute(f"CREATE TABLE {TABELA} (id INTEGER PRIMARY KEY, embedding vector({dim}))")
+
+    for inicio in range(0, linhas, lote):
+        bloco = gerar_vetores(rng, centros, min(lote, linhas - inicio), ruido)
+        ids = np.arange(inicio, inicio + len(bloco))
+        cur.copy_expert(f"COPY {TABELA} (id, embedding) FROM STDIN (FORMAT BINARY)", copy_binario(ids, bloco))
+        print(f"\r  carregando {min(inicio + lote, linhas):,}/{linhas:,}", end="", flush=True)
+
+    print()
+    cur.execute(f"ANALYZE {TABELA}")
+    conn_dbapi.commit()
+
+
+def buscar(cur, consultas: list[str], k: int) -> tuple[list[set], list[float]]:
+    ids, tempos = [], []
+    for q in consultas:
+        t0 = time.perf_counter()
+        cur.execute(
+            f"SELECT id FROM {TABELA} ORDER BY embedding <#> %s::vector LIMIT %s",
+            (q, k)
+        )
+        ids.append({r[0] for r in cur.fetchall()})
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return ids, tempos
+
+
+def resumo(nome: str, ids: list[set], exatos: list[set], tempos: list[float], k: int):
+    recall = np.mean([len(a & b) / k for a, b in zip(ids, exatos)])
+    p50, p95 = np.percentile(tempos, [50, 95])
+    print(f"  {nome:<28} recall@{k}={recall:.3f}   p50={p50:7.2f} ms   p95={p95:7.2f} ms")
+
+
+def medir(conn_dbapi, linhas: int, args, rng):
+    print(f"\n=== {linhas:,} linhas, {args.dim} dimensões ===")
+    centros = rng.normal(0, 1, size=(args.grupos, args.dim)).astype(np.float32)
+
+    carregar(conn_dbapi, rng, centros, linhas, args.dim, args.ruido)
+    consultas = [literal(v) for v in gerar_vetores(rng, centros, args.consultas, args.ruido)]
+
+    cur = conn_dbapi.cursor()
+    cur.execute("SET max_parallel_workers_per_gather = 0")
+
+    # aquecimento + referência exata (sem índice vetorial)
+    buscar(cur, consultas[:5], args.k)
+    exatos, tempos = buscar(cur, consultas, args.k)
+    resumo("exata (seq scan)", exatos, exatos, tempos, args.k)
+
+    t0 = time.perf_counter()
+    cur.execute(
+        f"CREATE INDEX bench_vetores_hnsw ON {TABELA} "
+        "USING hnsw (embedding vector_ip_ops) WITH (m = 16, ef_construction = 64)"
+    )
+    conn_dbapi.commit()
+    print(f"  índice HNSW criado em {time.perf_counter() - t0:.1f} s")
+
+    for ef in args.ef_search:
+        cur.execute(f"SET hnsw.ef_search = {int(ef)}")
+        buscar(cur, consultas[:5], args.k)
+        ids, tempos = buscar(cur, consultas, args.k)
+        resumo(f"hnsw ef_search={ef}", ids, exatos, tempos, args.k)
+
+    if args.ivfflat:
+        cur.execute("DROP INDEX bench_vetores_hnsw")
+        listas = max(10, linhas // 1000) if linhas <= 1_000_000 else int(np.sqrt(linhas))
+
+        t0 = time.perf_counter()
+        cur.execute(
+            f"CREATE INDEX bench_vetores_ivfflat ON {TABELA} "
+            f"USING ivfflat (embedding vector_ip_ops) WITH (lists = {listas})"
+        )
+        conn_dbapi.commit()
+        print(f"  índice IVFFlat ({listas} listas) criado em {time.perf_counter() - t0:.1f} s")
+
+        for probes in args.probes:
+            cur.execute(f"SET ivfflat.probes = {int(probes)}")
+            buscar(cur, consultas[:5], args.k)
+            ids, tempos = buscar(cur, consultas, args.k)
+            resumo(f"ivfflat probes={probes}", ids, exatos, tempos, args.k)
+
+    conn_dbapi.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--grupos", type=int, default=500)
+    parser.add_argument("--ruido", type=float, default=0.05)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--ivfflat", action="store_true")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20, 50])
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--manter", action="store_true", help="não apaga bench_vetores no fim")
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        sys.exit("❌ Defina BENCH_DATABASE_URL apontando para um banco Postgres + pgvector de TESTE.")
+
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+    rng = np.random.default_rng(42)
+    conn_dbapi = engine.raw_connection()
+
+    try:
+        cur = conn_dbapi.cursor()
+        cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+        conn_dbapi.commit()
+
+        for linhas in args.linhas:
+            medir(conn_dbapi, linhas, args, rng)
+
+    finally:
+        if not args.manter:
+            conn_dbapi.rollback()
+            conn_dbapi.cursor().execute(f"DROP TABLE IF EXISTS {TABELA}")
+            conn_dbapi.commit()
+        conn_dbapi.close()
+
+
+if __name__ == "__main__":
+    main()
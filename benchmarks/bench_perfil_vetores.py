@@ -0,0 +1,177 @@
+"""
+Perfis de armazenamento de vetores (app/core/perfil_vetores.py) com
+os NOSSOS embeddings: tamanho do índice, latência e recall@k contra
+a busca exata no vetor completo (vector(1536), <#>).
+
+    BENCH_DATABASE_URL=postgresql://.../ia \\
+    python -m benchmarks.bench_perfil_vetores --tabela chat_messages --linhas 200000 \\
+        --perfis vector1536 halfvec1536 halfvec512 vector512 bit1536 bit512
+
+- Lê os embeddings da tabela indicada (só leitura) e copia para a
+  tabela de rascunho bench_perfis, que é apagada no fim
+- As consultas são embeddings reais separados antes da cópia (não
+  estão na tabela — a própria linha não conta como vizinho)
+- Cada perfil: coluna derivada + HNSW, mesma consulta em duas fases
+  do assistente (primeira passada na coluna do perfil, k × fator
+  candidatos, reordenação exata pelo vetor completo)
+
+Requer pgvector >= 0.7.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+TABELA = "bench_perfis"
+DIMENSOES_COMPLETAS = 1536
+
+
+def expressoes(perfil: str, fonte: str) -> tuple[str, str, str, str]:
+    """(tipo da coluna, expressão derivada, opclass, operador) do perfil."""
+    m = re.fullmatch(r"(vector|halfvec|bit)(\d+)", perfil)
+    if not m:
+        raise ValueError(f"perfil inválido: {perfil} (ex.: halfvec512, bit1536)")
+    tipo, dim = m.group(1), int(m.group(2))
+
+    reduzida = fonte if dim == DIMENSOES_COMPLETAS else f"l2_normalize(subvector({fonte}, 1, {dim}))"
+
+    if tipo == "bit":
+        return f"bit({dim})", f"binary_quantize({reduzida})::bit({dim})", "bit_hamming_ops", "<~>"
+    return f"{tipo}({dim})", f"({reduzida})::{tipo}({dim})", f"{tipo}_ip_ops", "<#>"
+
+
+def carregar(cur, tabela: str, linhas: int, consultas: int) -> list:
+    print(f"  lendo até {linhas:,} embeddings de {tabela}...")
+    cur.execute(f"DROP TABLE IF EXISTS {TABELA}")
+    cur.execute(f"""
+        CREATE TABLE {TABELA} AS
+        SELECT id, embedding FROM {tabela}
+        WHERE embedding IS NOT NULL
+        ORDER BY id DESC
+        LIMIT %s
+    """, (linhas + consultas,))
+
+    cur.execute(f"SELECT id, embedding FROM {TABELA} ORDER BY random() LIMIT %s", (consultas,))
+    amostra = cur.fetchall()
+    cur.execute(f"DELETE FROM {TABELA} WHERE id = ANY(%s)", ([r[0] for r in amostra],))
+    cur.execute(f"ALTER TABLE {TABELA} ADD PRIMARY KEY (id)")
+    cur.execute(f"SELECT COUNT(*) FROM {TABELA}")
+    print(f"  {cur.fetchone()[0]:,} linhas na base, {len(amostra)} consultas separadas")
+
+    return [r[1] for r in amostra]
+
+
+def buscar(cur, sql: str, consultas: list, k: int) -> tuple[list[set], list[float]]:
+    ids, tempos = [], []
+    for q in consultas:
+        t0 = time.perf_counter()
+        cur.execute(sql, {"emb": q, "k": k})
+        ids.append({r[0] for r in cur.fetchall()})
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return ids, tempos
+
+
+def tamanho_mb(cur, relacao: str) -> float:
+    cur.execute("SELECT pg_relation_size(%s::regclass)", (relacao,))
+    return cur.fetchone()[0] / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tabela", default="chat_messages", choices=["chat_messages", "produtos_ia"])
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fator", type=int, default=8, help="candidatos = k × fator")
+    parser.add_argument("--ef-search", type=int, default=80)
+    parser.add_argument(
+        "--perfis", nargs="+",
+        default=["vector1536", "halfvec1536", "halfvec512", "vector512", "bit1536", "bit512"]
+    )
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        sys.exit("❌ Defina BENCH_DATABASE_URL apontando para o banco IA (só leitura nas tabelas do assistente).")
+
+    from pgvector.psycopg2 import register_vector
+    from sqlalchemy import create_engine
+
+    conn = create_engine(url).raw_connection()
+    register_vector(conn.dbapi_connection)
+    cur = conn.cursor()
+
+    try:
+        cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+        cur.execute("SET max_parallel_workers_per_gather = 0")
+        cur.execute(f"SET hnsw.ef_search = {int(args.ef_search)}")
+
+        consultas = carregar(cur, args.tabela, args.linhas, args.consultas)
+        conn.commit()
+
+        cur.execute(f"SELECT pg_relation_size('{TABELA}')")
+        print(f"  tabela: {cur.fetchone()[0] / 1024 / 1024:.1f} MB (vetor completo)\n")
+
+        # referência: exata no vetor completo (sem índice)
+        exata = f"SELECT id FROM {TABELA} ORDER BY embedding <#> %(emb)s::vector LIMIT %(k)s"
+        buscar(cur, exata, consultas[:5], args.k)
+        exatos, tempos = buscar(cur, exata, consultas, args.k)
+
+        print(f"  {'perfil':<14} {'índice MB':>10} {'criação s':>10} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+        p50, p95 = np.percentile(tempos, [50, 95])
+        print(f"  {'exata':<14} {'-':>10} {'-':>10} {1.0:>10.3f} {p50:>8.2f} {p95:>8.2f}")
+
+        for perfil in args.perfis:
+            tipo, expr, opclass, operador = expressoes(perfil, "embedding")
+            col = f"e_{perfil}"
+
+            cur.execute(f"ALTER TABLE {TABELA} ADD COLUMN {col} {tipo}")
+            cur.execute(f"UPDATE {TABELA} SET {col} = {expr}")
+            conn.commit()
+
+            t0 = time.perf_counter()
+            cur.execute(f"CREATE INDEX ix_{col} ON {TABELA} USING hnsw ({col} {opclass})")
+            conn.commit()
+            criacao = time.perf_counter() - t0
+
+            _, expr_q, _, _ = expressoes(perfil, "%(emb)s::vector")
+            sql = f"""
+                WITH candidatos AS (
+                    SELECT id, embedding FROM {TABELA}
+                    ORDER BY {col} {operador} {expr_q}
+                    LIMIT %(k)s * {int(args.fator)}
+                )
+                SELECT id FROM candidatos
+                ORDER BY embedding <#> %(emb)s::vector
+                LIMIT %(k)s
+            """
+
+            buscar(cur, sql, consultas[:5], args.k)
+            ids, tempos = buscar(cur, sql, consultas, args.k)
+            recall = np.mean([len(a & b) / args.k for a, b in zip(ids, exatos)])
+            p50, p95 = np.percentile(tempos, [50, 95])
+
+            print(
+                f"  {perfil:<14} {tamanho_mb(cur, f'ix_{col}'):>10.1f} {criacao:>10.1f} "
+                f"{recall:>10.3f} {p50:>8.2f} {p95:>8.2f}"
+            )
+
+            # um índice por vez: o próximo perfil não disputa memória com este
+            cur.execute(f"DROP INDEX ix_{col}")
+            cur.execute(f"ALTER TABLE {TABELA} DROP COLUMN {col}")
+            conn.commit()
+
+    finally:
+        conn.rollback()
+        cur.execute(f"DROP TABLE IF EXISTS {TABELA}")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Verificação de memória do sync_produtos com uma tabela sintética grande.
+
+    DATABASE_URL_IA=postgresql://.../ia_scratch \\
+    python -m benchmarks.bench_sync_memoria --produtos 200000 --chunk 1000 --teto-mb 64
+
+- PDV: tabela `produto` sintética num SQLite temporário (a leitura
+  em chunks usa SQL portável)
+- Embeddings: servidor fake local (benchmarks/fake_openai.py)
+- IA: banco Postgres + pgvector de TESTE (a tabela produtos_ia é limpa!)
+
+Mede o pico de alocações Python (tracemalloc) durante o sync e sai
+com código 1 se passar do teto — o pico deve depender do chunk, não
+do número de produtos.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_openai import ServidorEmbeddingsFake
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=1000)
+    parser.add_argument("--teto-mb", type=float, default=64.0)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL_IA"):
+        sys.exit("❌ Defina DATABASE_URL_IA apontando para um banco IA de TESTE.")
+
+    servidor = ServidorEmbeddingsFake(latencia_ms=5, latencia_por_item_ms=0).iniciar()
+    os.environ["OPENAI_BASE_URL"] = servidor.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["EMBEDDING_CACHE_PERSISTENTE"] = "0"
+    os.environ["EMBEDDING_CACHE_MAX_ITENS"] = "0"
+
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.database_ia import SessionIA, engine_ia
+    from app.core.migracoes_ia import aplicar_migracoes
+    from app.modules.assistente.models.model import ProdutoIA
+    from app.modules.assistente.pipeline.sync_pdv_ia import sync_produtos
+
+    # ---------------------------------------------------------
+    # IA de teste: tabela limpa + migrações
+    # ---------------------------------------------------------
+    with engine_ia.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    ProdutoIA.__table__.create(bind=engine_ia, checkfirst=True)
+    aplicar_migracoes()
+    with engine_ia.begin() as conn:
+        conn.execute(text("TRUNCATE produtos_ia CASCADE"))
+
+    # ---------------------------------------------------------
+    # PDV sintético
+    # ---------------------------------------------------------
+    arquivo = os.path.join(tempfile.mkdtemp(), "pdv_sintetico.db")
+    engine_pdv = create_engine(f"sqlite:///{arquivo}")
+
+    with engine_pdv.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE produto (
+                id INTEGER PRIMARY KEY, nome TEXT, descricao TEXT,
+                preco NUMERIC, categoria_id INTEGER
+            )
+        """))
+        conn.execute(
+            text("INSERT INTO produto VALUES (:id, :nome, :descricao, :preco, :categoria_id)"),
+            [
+                {
+                    "id": i,
+                    "nome": f"Produto {i}",
+                    "descricao": f"Descrição sintética do produto {i}",
+                    "preco": i % 500 + 0.99,
+                    "categoria_id": i % 20,
+                }
+                for i in range(1, args.produtos + 1)
+            ]
+        )
+
+    print(f"\n🔵 {args.produtos} produtos sintéticos | chunk={args.chunk} | teto={args.teto_mb} MB\n")
+
+    pdv_db = sessionmaker(bind=engine_pdv)()
+    ia_db = SessionIA()
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+
+    stats = sync_produtos(pdv_db, ia_db, chunk=args.chunk)
+
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pdv_db.close()
+    ia_db.close()
+    servidor.parar()
+
+    pico_mb = pico / 1024 / 1024
+    print(f"\n📌 Estatísticas: {stats}")
+    print(f"📌 Tempo: {duracao:.1f} s ({args.produtos / duracao:.0f} produtos/s)")
+    print(f"📌 Pico de memória Python: {pico_mb:.1f} MB")
+
+    if pico_mb > args.teto_mb:
+        print(f"❌ Pico acima do teto de {args.teto_mb} MB")
+        sys.exit(1)
+
+    print("🟢 Dentro do teto de memória.\n")
+
+
+if __name__ == "__main__":
+    main()
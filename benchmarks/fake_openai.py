@@ -0,0 +1,204 @@
+"""
+Servidor HTTP local que imita os endpoints /v1/embeddings e
+/v1/chat/completions da OpenAI.
+
+Usado pelos benchmarks para medir o pipeline sem custo nem rede:
+os vetores são determinísticos (derivados do hash do texto) e cada
+request espera uma latência fixa + um custo por entrada.
+
+Também pode rodar sozinho, para testes de carga contra o uvicorn:
+
+    python -m benchmarks.fake_openai --porta 8099 --latencia-chat-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn app.main:app
+"""
+
+import argparse
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import xxhash
+
+DIMENSOES = 1536
+
+
+def vetor_fake(texto: str, dimensoes: int = DIMENSOES) -> np.ndarray:
+    rng = np.random.default_rng(xxhash.xxh64_intdigest(texto.encode("utf-8")))
+    return rng.standard_normal(dimensoes).astype(np.float32)
+
+
+def resposta_chat_fake(prompt: str, formato: dict | None = None) -> str:
+    # respostas mínimas para cada etapa do pipeline do assistente
+    if formato and formato.get("type") == "json_schema":
+        # agente SQL (Structured Outputs): JSON no formato pedido
+        return json.dumps({
+            "intent": "dados_cliente",
+            "parametros": {"cliente_nome": None, "cliente_id": None, "pedido_id": None},
+            "sql": "SELECT 1 AS ok",
+            "confianca": 0.9,
+        })
+    return (
+        "Resposta fake do assistente, gerada palavra por palavra para "
+        "simular o streaming do modelo de chat."
+    )
+
+
+class ServidorEmbeddingsFake:
+
+    def __init__(
+        self,
+        latencia_ms: float = 30.0,
+        latencia_por_item_ms: float = 0.05,
+        latencia_chat_ms: float = 300.0,
+        porta: int = 0,
+    ):
+        self.latencia = latencia_ms / 1000
+        self.latencia_por_item = latencia_por_item_ms / 1000
+        self.latencia_chat = latencia_chat_ms / 1000
+        self.requests = 0
+        self.itens = 0
+        self.requests_chat = 0
+
+        servidor_fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, payload: dict):
+                resposta = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(resposta)))
+                self.end_headers()
+                self.wfile.write(resposta)
+
+            def do_POST(self):
+                tamanho = int(self.headers.get("Content-Length", 0))
+                corpo = json.loads(self.rfile.read(tamanho))
+
+                if self.path.endswith("/chat/completions"):
+                    self._chat(corpo)
+                else:
+                    self._embeddings(corpo)
+
+            def _chat(self, corpo: dict):
+                servidor_fake.requests_chat += 1
+                prompt = corpo["messages"][-1]["content"]
+                texto = resposta_chat_fake(prompt, corpo.get("response_format"))
+
+                if corpo.get("stream"):
+                    self._chat_stream(corpo, texto)
+                    return
+
+                time.sleep(servidor_fake.latencia_chat)
+
+                self._responder({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": corpo.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": texto},
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+            def _chat_stream(self, corpo: dict, texto: str):
+                # primeiro token após 1/5 da latência; o resto distribuído
+                # entre as palavras — o tempo total fica igual ao sem stream
+                palavras = texto.split(" ")
+                time.sleep(servidor_fake.latencia_chat / 5)
+                intervalo = servidor_fake.latencia_chat * 4 / 5 / max(len(palavras), 1)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+
+                def enviar(delta: dict, fim: str | None = None):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": corpo.get("model"),
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": fim}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+
+                for i, palavra in enumerate(palavras):
+                    if i:
+                        time.sleep(intervalo)
+                    enviar({"content": palavra if i == 0 else " " + palavra})
+
+                enviar({}, fim="stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _embeddings(self, corpo: dict):
+                entradas = corpo["input"]
+                if isinstance(entradas, str):
+                    entradas = [entradas]
+
+                servidor_fake.requests += 1
+                servidor_fake.itens += len(entradas)
+                time.sleep(servidor_fake.latencia + servidor_fake.latencia_por_item * len(entradas))
+
+                dimensoes = corpo.get("dimensions") or DIMENSOES
+                base64_ = corpo.get("encoding_format") == "base64"
+
+                dados = []
+                for i, texto in enumerate(entradas):
+                    vetor = vetor_fake(texto, dimensoes)
+                    dados.append({
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": (
+                            base64.b64encode(vetor.tobytes()).decode()
+                            if base64_ else vetor.tolist()
+                        ),
+                    })
+
+                self._responder({
+                    "object": "list",
+                    "data": dados,
+                    "model": corpo.get("model"),
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                })
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, porta = self._httpd.server_address
+        return f"http://{host}:{porta}/v1"
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._httpd.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--latencia-ms", type=float, default=30.0)
+    parser.add_argument("--latencia-chat-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    servidor = ServidorEmbeddingsFake(
+        latencia_ms=args.latencia_ms,
+        latencia_chat_ms=args.latencia_chat_ms,
+        porta=args.porta,
+    )
+    print(f"🟢 OpenAI fake em {servidor.base_url} (Ctrl+C para sair)")
+    servidor._httpd.serve_forever()
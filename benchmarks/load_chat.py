@@ -0,0 +1,141 @@
+"""
+Teste de carga do POST /assistente/chat.
+
+    # 1) OpenAI fake (latência realista de chat)
+    python -m benchmarks.fake_openai --porta 8099 --latencia-chat-ms 300
+
+    # 2) API apontando para o fake
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn app.main:app --port 8000
+
+    # 3) carga
+    python -m benchmarks.load_chat --url http://127.0.0.1:8000 --concorrencias 10,40,100,200
+
+    # 3b) mesma carga em /assistente/chat/stream (mede também o TTFT)
+    python -m benchmarks.load_chat --stream
+
+Para cada nível de concorrência, N usuários virtuais enviam mensagens
+em sequência. Reporta throughput, latências e a concorrência efetiva
+(lei de Little: throughput × latência média) — com a rota síncrona
+ela satura no tamanho do threadpool do Starlette (~40).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def usuario(cliente: httpx.AsyncClient, url: str, vendedor_id: int, mensagens: int, latencias: list, erros: list):
+    for i in range(mensagens):
+        inicio = time.perf_counter()
+        try:
+            resp = await cliente.post(
+                f"{url}/assistente/chat",
+                json={"vendedor_id": vendedor_id, "mensagem": f"dados de cliente {i}"},
+            )
+            resp.raise_for_status()
+            latencias.append(time.perf_counter() - inicio)
+        except Exception as e:
+            erros.append(str(e))
+
+
+async def usuario_stream(
+    cliente: httpx.AsyncClient, url: str, vendedor_id: int, mensagens: int,
+    latencias: list, erros: list, ttfts: list
+):
+    for i in range(mensagens):
+        inicio = time.perf_counter()
+        primeiro = None
+        try:
+            async with cliente.stream(
+                "POST",
+                f"{url}/assistente/chat/stream",
+                json={"vendedor_id": vendedor_id, "mensagem": f"dados de cliente {i}"},
+            ) as resp:
+                resp.raise_for_status()
+                async for linha in resp.aiter_lines():
+                    if primeiro is None and linha == "event: token":
+                        primeiro = time.perf_counter() - inicio
+                    if linha == "event: erro":
+                        raise RuntimeError("evento de erro no stream")
+
+            latencias.append(time.perf_counter() - inicio)
+            if primeiro is not None:
+                ttfts.append(primeiro)
+        except Exception as e:
+            erros.append(str(e))
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenadas = sorted(valores)
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))] if ordenadas else 0
+
+
+async def rodar_nivel(url: str, concorrencia: int, mensagens: int, vendedores: int, stream: bool = False) -> dict:
+    latencias: list[float] = []
+    erros: list[str] = []
+    ttfts: list[float] = []
+
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(timeout=120, limits=limites) as cliente:
+        inicio = time.perf_counter()
+        if stream:
+            tarefas = [
+                usuario_stream(cliente, url, u % vendedores + 1, mensagens, latencias, erros, ttfts)
+                for u in range(concorrencia)
+            ]
+        else:
+            tarefas = [
+                usuario(cliente, url, u % vendedores + 1, mensagens, latencias, erros)
+                for u in range(concorrencia)
+            ]
+        await asyncio.gather(*tarefas)
+        duracao = time.perf_counter() - inicio
+
+    throughput = len(latencias) / duracao if duracao else 0
+    media = statistics.mean(latencias) if latencias else 0
+
+    return {
+        "concorrencia": concorrencia,
+        "ok": len(latencias),
+        "erros": len(erros),
+        "req_s": throughput,
+        "p50": _percentil(latencias, 0.50),
+        "p95": _percentil(latencias, 0.95),
+        "em_voo": throughput * media,
+        "ttft_p50": _percentil(ttfts, 0.50),
+        "ttft_p95": _percentil(ttfts, 0.95),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concorrencias", default="10,40,100,200")
+    parser.add_argument("--mensagens", type=int, default=5, help="mensagens por usuário")
+    parser.add_argument("--vendedores", type=int, default=50)
+    parser.add_argument("--stream", action="store_true", help="usa /assistente/chat/stream e mede TTFT")
+    args = parser.parse_args()
+
+    cabecalho = f"\n{'usuários':>9}{'ok':>7}{'erros':>7}{'req/s':>9}{'p50 (s)':>10}{'p95 (s)':>10}{'em voo':>9}"
+    if args.stream:
+        cabecalho += f"{'ttft p50':>10}{'ttft p95':>10}"
+    print(cabecalho)
+
+    for nivel in [int(c) for c in args.concorrencias.split(",")]:
+        r = await rodar_nivel(args.url, nivel, args.mensagens, args.vendedores, stream=args.stream)
+        linha = (
+            f"{r['concorrencia']:>9}{r['ok']:>7}{r['erros']:>7}{r['req_s']:>9.1f}"
+            f"{r['p50']:>10.2f}{r['p95']:>10.2f}{r['em_voo']:>9.1f}"
+        )
+        if args.stream:
+            linha += f"{r['ttft_p50']:>10.2f}{r['ttft_p95']:>10.2f}"
+        print(linha)
+
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
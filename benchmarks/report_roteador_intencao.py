@@ -0,0 +1,127 @@
+"""
+Relatório do roteador de intenção local (kernel/roteador_intencao.py)
+contra o conjunto rotulado benchmarks/dados/perguntas_intencao.jsonl.
+
+    # com a API real (embeddings reais → centróides significativos)
+    python -m benchmarks.report_roteador_intencao
+
+    # comparando com a chamada estruturada do agente SQL (intenção + SQL)
+    python -m benchmarks.report_roteador_intencao --comparar-llm
+
+    # sem rede: servidor fake (vetores aleatórios — mede só as regras)
+    python -m benchmarks.report_roteador_intencao --fake
+
+Reporta acurácia geral e por fonte (regra / centróide), quantas
+perguntas o roteador decidiu sem LLM (= chamadas de LLM evitadas),
+latência da decisão local e os erros.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+ARQUIVO = Path(__file__).parent / "dados" / "perguntas_intencao.jsonl"
+
+
+def _pct(valores: list[float], p: float) -> float:
+    ordenadas = sorted(valores)
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))] if ordenadas else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fake", action="store_true", help="usa o servidor OpenAI fake local")
+    parser.add_argument("--comparar-llm", action="store_true", help="mede também a classificação via LLM")
+    args = parser.parse_args()
+
+    if args.fake:
+        from benchmarks.fake_openai import ServidorEmbeddingsFake
+        servidor = ServidorEmbeddingsFake(latencia_ms=5, latencia_chat_ms=300).iniciar()
+        os.environ["OPENAI_BASE_URL"] = servidor.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+    os.environ.setdefault("DATABASE_URL_IA", "postgresql://fake@localhost/fake")
+    os.environ.setdefault("DATABASE_URL_SISTEMA", "postgresql://fake@localhost/fake")
+    os.environ["EMBEDDING_CACHE_PERSISTENTE"] = "0"
+
+    from app.core.openai_client import gerar_embeddings_lote
+    from app.modules.assistente.kernel import roteador_intencao as roteador
+    from app.modules.assistente.kernel.agent_sql import extrair_nome_cliente, gerar_sql_estruturada, prompt_sistema_sql
+    from app.modules.assistente.kernel.catalogo_esquema import carregar_catalogo
+
+    casos = [json.loads(l) for l in ARQUIVO.read_text(encoding="utf-8").splitlines() if l.strip()]
+    perguntas = [c["pergunta"] for c in casos]
+
+    # embeddings já existem no fluxo real (gravação da mensagem) — fora da medição
+    embeddings = gerar_embeddings_lote(perguntas)
+    roteador.garantir_centroides()
+
+    print(f"\n🔵 {len(casos)} perguntas rotuladas | limiares: similaridade ≥ "
+          f"{roteador.ROTEADOR_MIN_SIMILARIDADE}, margem ≥ {roteador.ROTEADOR_MIN_MARGEM}\n")
+
+    latencias = []
+    por_fonte = Counter()
+    acertos_fonte = Counter()
+    erros = []
+
+    for caso, emb in zip(casos, embeddings):
+        inicio = time.perf_counter()
+        rota = roteador.classificar_intencao(caso["pergunta"], emb)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        por_fonte[rota["fonte"]] += 1
+        if rota["fonte"] == "llm":
+            continue
+
+        if rota["intent"] == caso["intent"]:
+            acertos_fonte[rota["fonte"]] += 1
+        else:
+            erros.append((caso["pergunta"], caso["intent"], rota["intent"], rota["fonte"], rota["confianca"]))
+
+    locais = por_fonte["regra"] + por_fonte["centroide"]
+    acertos = acertos_fonte["regra"] + acertos_fonte["centroide"]
+
+    print(f"{'fonte':<12}{'decididas':>10}{'acertos':>10}{'acurácia':>10}")
+    for fonte in ("regra", "centroide"):
+        n = por_fonte[fonte]
+        print(f"{fonte:<12}{n:>10}{acertos_fonte[fonte]:>10}{(acertos_fonte[fonte] / n if n else 0):>10.1%}")
+    print(f"{'local':<12}{locais:>10}{acertos:>10}{(acertos / locais if locais else 0):>10.1%}")
+    print(f"{'→ LLM':<12}{por_fonte['llm']:>10}")
+
+    print(f"\n📌 Chamadas de LLM de intenção evitadas: {locais}/{len(casos)} ({locais / len(casos):.1%})")
+    print(f"📌 Latência da decisão local: p50 {_pct(latencias, 0.5):.3f} ms | "
+          f"p95 {_pct(latencias, 0.95):.3f} ms | máx {max(latencias):.3f} ms")
+
+    if erros:
+        print("\n🟠 Erros do roteador local:")
+        for pergunta, esperado, obtido, fonte, conf in erros:
+            print(f"   - \"{pergunta}\" → {obtido} ({fonte}, {conf}) | esperado: {esperado}")
+
+    if args.comparar_llm:
+        # o agente SQL só conhece as 6 intenções SQL (+ "outra")
+        casos_sql = [c for c in casos if c["intent"] in roteador.INTENCOES_SQL]
+        latencias_llm, acertos_llm = [], 0
+        prompt_sistema = prompt_sistema_sql(carregar_catalogo())
+
+        for caso in casos_sql:
+            inicio = time.perf_counter()
+            resp = gerar_sql_estruturada(prompt_sistema, caso["pergunta"], None, extrair_nome_cliente(caso["pergunta"]))
+            latencias_llm.append((time.perf_counter() - inicio) * 1000)
+            acertos_llm += resp.intent == caso["intent"]
+
+        print(f"\n📌 LLM (só intenções SQL, {len(casos_sql)} perguntas): acurácia "
+              f"{acertos_llm / len(casos_sql):.1%} | p50 {statistics.median(latencias_llm):.0f} ms | "
+              f"p95 {_pct(latencias_llm, 0.95):.0f} ms")
+
+    print()
+
+    if args.fake:
+        servidor.parar()
+
+
+if __name__ == "__main__":
+    main()